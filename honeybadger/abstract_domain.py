@@ -0,0 +1,371 @@
+import logging
+
+from z3 import *
+
+log = logging.getLogger(__name__)
+
+# Nodes evaluated for one branch before the abstract check gives up
+MAX_EVALUATED_NODES = 20000
+
+class Inconclusive(Exception):
+    pass
+
+# A set of bit-vector values of a given width: an unsigned interval [lo, hi], plus the
+# bits known to be zero and known to be one
+class AbstractValue:
+    def __init__(self, width, lo=0, hi=None, zeros=0, ones=0):
+        self.width = width
+        self.mask = (1 << width) - 1
+        hi = self.mask if hi is None else hi
+        # the known bits bound the interval, and the interval fixes its common leading bits
+        lo = max(lo, ones)
+        hi = min(hi, self.mask & ~zeros)
+        if lo <= hi:
+            common = self.mask & ~((1 << (lo ^ hi).bit_length()) - 1)
+            ones |= lo & common
+            zeros |= ~lo & common
+        self.lo = lo
+        self.hi = hi
+        self.zeros = zeros & self.mask
+        self.ones = ones & self.mask
+
+    def is_empty(self):
+        return self.lo > self.hi or self.zeros & self.ones != 0
+
+    def is_constant(self):
+        return self.lo == self.hi
+
+    def meet(self, other):
+        return AbstractValue(self.width, max(self.lo, other.lo), min(self.hi, other.hi), self.zeros | other.zeros, self.ones | other.ones)
+
+    def join(self, other):
+        return AbstractValue(self.width, min(self.lo, other.lo), max(self.hi, other.hi), self.zeros & other.zeros, self.ones & other.ones)
+
+def constant(width, value):
+    value &= (1 << width) - 1
+    return AbstractValue(width, value, value, ~value, value)
+
+def top(width):
+    return AbstractValue(width)
+
+# Values of the interval that are negative as signed integers: True, False or None when it has both
+def is_negative(value):
+    sign = 1 << (value.width - 1)
+    if value.lo >= sign:
+        return True
+    if value.hi < sign:
+        return False
+    return None
+
+# Decides branch conditions from intervals and known bits, without the solver. The facts
+# are the bounds that the constraints of the path condition put on their terms (e.g.
+# Iv == 0, ULT(x, 10), a condition that was taken); they are memoized by constraint. The
+# terms of a branch condition are then evaluated bottom-up, each term being refined by
+# the facts known about it. The answer is True or False when the condition holds in all
+# the states that satisfy the path condition, or in none, and None when it is inconclusive.
+class AbstractDomain:
+    def __init__(self):
+        self.facts = {}  # constraint id -> (constraint, [(term, fact)])
+        self.branches = 0
+        self.decided = 0
+
+    def decide_branch(self, path_condition, expression):
+        self.branches += 1
+        try:
+            env = self.get_env(path_condition)
+            result = self.evaluate(expression, env, {})
+        except (Inconclusive, Z3Exception, RuntimeError):
+            return None
+        if result is not None:
+            self.decided += 1
+        return result
+
+    def get_stats(self):
+        return {"branches": self.branches, "decided": self.decided}
+
+    def merge_stats(self, stats):
+        self.branches += stats["branches"]
+        self.decided += stats["decided"]
+
+    def decided_ratio(self):
+        if not self.branches:
+            return 0.0
+        return float(self.decided) / self.branches * 100
+
+    # Facts of the path condition by term id, a bool for conditions and an AbstractValue for bit-vectors
+    def get_env(self, path_condition):
+        env = {}
+        for constraint in path_condition:
+            if not is_expr(constraint):
+                continue
+            key = constraint.get_id()
+            if key not in self.facts:
+                facts = []
+                self.collect_facts(constraint, True, facts)
+                self.facts[key] = (constraint, facts)
+            for term, fact in self.facts[key][1]:
+                known = env.get(term.get_id())
+                if isinstance(fact, bool):
+                    if known is not None and known != fact:
+                        raise Inconclusive()  # the path condition is unsatisfiable, the solver tells
+                    env[term.get_id()] = fact
+                else:
+                    fact = fact if known is None else known.meet(fact)
+                    if fact.is_empty():
+                        raise Inconclusive()
+                    env[term.get_id()] = fact
+        return env
+
+    def collect_facts(self, expression, polarity, facts):
+        if not is_bool(expression):
+            return
+        kind = expression.decl().kind()
+        if kind == Z3_OP_NOT:
+            self.collect_facts(expression.arg(0), not polarity, facts)
+            return
+        if (kind == Z3_OP_AND and polarity) or (kind == Z3_OP_OR and not polarity):
+            for child in expression.children():
+                self.collect_facts(child, polarity, facts)
+            return
+        facts.append((expression, polarity))
+        if kind == Z3_OP_DISTINCT and expression.num_args() == 2:
+            kind = Z3_OP_EQ
+            polarity = not polarity
+        if expression.num_args() != 2 or not is_bv(expression.arg(0)):
+            return
+        left, right = expression.arg(0), expression.arg(1)
+        if is_bv_value(left) and not is_bv_value(right):
+            left, right = right, left
+            kind = {Z3_OP_ULT: Z3_OP_UGT, Z3_OP_ULEQ: Z3_OP_UGEQ, Z3_OP_UGT: Z3_OP_ULT, Z3_OP_UGEQ: Z3_OP_ULEQ}.get(kind, kind)
+        if not is_bv_value(right) or is_bv_value(left):
+            return
+        width = left.size()
+        value = right.as_long()
+        if kind == Z3_OP_EQ:
+            if polarity:
+                facts.append((left, constant(width, value)))
+            # the flags of the comparison opcodes are If(condition, 1, 0)
+            if is_app_of(left, Z3_OP_ITE) and is_bv_value(left.arg(1)) and is_bv_value(left.arg(2)):
+                then_value, else_value = left.arg(1).as_long(), left.arg(2).as_long()
+                if value == then_value and value != else_value:
+                    self.collect_facts(left.arg(0), polarity, facts)
+                elif value == else_value and value != then_value:
+                    self.collect_facts(left.arg(0), not polarity, facts)
+            return
+        if not polarity:
+            kind = {Z3_OP_ULT: Z3_OP_UGEQ, Z3_OP_ULEQ: Z3_OP_UGT, Z3_OP_UGT: Z3_OP_ULEQ, Z3_OP_UGEQ: Z3_OP_ULT}.get(kind)
+        mask = (1 << width) - 1
+        if kind == Z3_OP_ULT and value > 0:
+            facts.append((left, AbstractValue(width, 0, value - 1)))
+        elif kind == Z3_OP_ULEQ:
+            facts.append((left, AbstractValue(width, 0, value)))
+        elif kind == Z3_OP_UGT and value < mask:
+            facts.append((left, AbstractValue(width, value + 1, mask)))
+        elif kind == Z3_OP_UGEQ:
+            facts.append((left, AbstractValue(width, value, mask)))
+
+    def evaluate(self, expression, env, memo):
+        key = expression.get_id()
+        if key in memo:
+            return memo[key]
+        if len(memo) >= MAX_EVALUATED_NODES:
+            raise Inconclusive()
+        if is_bool(expression):
+            value = self.evaluate_bool(expression, env, memo)
+            if value is None:
+                value = env.get(key)
+        elif is_bv(expression):
+            value = self.evaluate_bv(expression, env, memo)
+            if key in env:
+                value = value.meet(env[key])
+                if value.is_empty():
+                    raise Inconclusive()
+        else:
+            raise Inconclusive()
+        memo[key] = value
+        return value
+
+    def evaluate_bool(self, expression, env, memo):
+        if is_true(expression):
+            return True
+        if is_false(expression):
+            return False
+        kind = expression.decl().kind()
+        if kind == Z3_OP_NOT:
+            value = self.evaluate(expression.arg(0), env, memo)
+            return None if value is None else not value
+        if kind in (Z3_OP_AND, Z3_OP_OR):
+            values = [self.evaluate(child, env, memo) for child in expression.children()]
+            absorbing = kind == Z3_OP_OR
+            if absorbing in values:
+                return absorbing
+            if all(value is not None for value in values):
+                return not absorbing
+            return None
+        if kind == Z3_OP_ITE:
+            condition = self.evaluate(expression.arg(0), env, memo)
+            if condition is not None:
+                return self.evaluate(expression.arg(1 if condition else 2), env, memo)
+            then_value = self.evaluate(expression.arg(1), env, memo)
+            return then_value if then_value == self.evaluate(expression.arg(2), env, memo) else None
+        if expression.num_args() != 2:
+            return None
+        if kind in (Z3_OP_EQ, Z3_OP_DISTINCT):
+            left = self.evaluate(expression.arg(0), env, memo)
+            right = self.evaluate(expression.arg(1), env, memo)
+            if isinstance(left, AbstractValue):
+                equal = compare_equal(left, right)
+            else:
+                equal = None if left is None or right is None else left == right
+            if equal is None or kind == Z3_OP_EQ:
+                return equal
+            return not equal
+        if kind not in COMPARISONS:
+            return None
+        left = self.evaluate(expression.arg(0), env, memo)
+        right = self.evaluate(expression.arg(1), env, memo)
+        swap, strict, signed = COMPARISONS[kind]
+        if swap:
+            left, right = right, left
+        if signed:
+            sign = is_negative(left)
+            if sign is None or sign != is_negative(right):
+                return None  # two's complement keeps the order within one sign
+        if (left.hi < right.lo) if strict else (left.hi <= right.lo):
+            return True
+        if (left.lo >= right.hi) if strict else (left.lo > right.hi):
+            return False
+        return None
+
+    def evaluate_bv(self, expression, env, memo):
+        if is_bv_value(expression):
+            return constant(expression.size(), expression.as_long())
+        width = expression.size()
+        if not is_app(expression) or expression.num_args() == 0:
+            return top(width)
+        kind = expression.decl().kind()
+        if kind == Z3_OP_ITE:
+            condition = self.evaluate(expression.arg(0), env, memo)
+            if condition is not None:
+                return self.evaluate(expression.arg(1 if condition else 2), env, memo)
+            return self.evaluate(expression.arg(1), env, memo).join(self.evaluate(expression.arg(2), env, memo))
+        if kind not in BV_OPERATIONS:
+            return top(width)
+        if kind == Z3_OP_EXTRACT:
+            high, low = expression.params()
+            return extract(self.evaluate(expression.arg(0), env, memo), high, low)
+        if kind == Z3_OP_ZERO_EXT:
+            value = self.evaluate(expression.arg(0), env, memo)
+            return AbstractValue(width, value.lo, value.hi, value.zeros | (((1 << width) - 1) & ~value.mask), value.ones)
+        values = [self.evaluate(child, env, memo) for child in expression.children()]
+        result = values[0]
+        for value in values[1:]:
+            result = BV_OPERATIONS[kind](result, value)
+        if kind == Z3_OP_BNOT:
+            result = bv_not(result)
+        return result
+
+def compare_equal(left, right):
+    if left.is_constant() and right.is_constant():
+        return left.lo == right.lo
+    if left.hi < right.lo or right.hi < left.lo or left.ones & right.zeros or right.ones & left.zeros:
+        return False
+    return None
+
+def bv_add(left, right):
+    if left.hi + right.hi <= left.mask:
+        return AbstractValue(left.width, left.lo + right.lo, left.hi + right.hi)
+    return top(left.width)
+
+def bv_sub(left, right):
+    if left.lo >= right.hi:
+        return AbstractValue(left.width, left.lo - right.hi, left.hi - right.lo)
+    return top(left.width)
+
+def bv_mul(left, right):
+    if left.hi * right.hi <= left.mask:
+        return AbstractValue(left.width, left.lo * right.lo, left.hi * right.hi)
+    return top(left.width)
+
+def bv_udiv(left, right):
+    if right.lo > 0:
+        return AbstractValue(left.width, left.lo // right.hi, left.hi // right.lo)
+    return top(left.width)
+
+def bv_urem(left, right):
+    if right.lo > 0:
+        return AbstractValue(left.width, 0, min(left.hi, right.hi - 1))
+    return top(left.width)
+
+def bv_and(left, right):
+    return AbstractValue(left.width, 0, min(left.hi, right.hi), left.zeros | right.zeros, left.ones & right.ones)
+
+def bv_or(left, right):
+    return AbstractValue(left.width, max(left.lo, right.lo), left.mask, left.zeros & right.zeros, left.ones | right.ones)
+
+def bv_xor(left, right):
+    known = (left.zeros | left.ones) & (right.zeros | right.ones)
+    ones = (left.ones ^ right.ones) & known
+    return AbstractValue(left.width, 0, left.mask, known & ~ones, ones)
+
+def bv_not(value):
+    return AbstractValue(value.width, value.mask - value.hi, value.mask - value.lo, value.ones, value.zeros)
+
+def bv_concat(high, low):
+    width = high.width + low.width
+    return AbstractValue(width, (high.lo << low.width) + low.lo, (high.hi << low.width) + low.hi,
+                         (high.zeros << low.width) | low.zeros, (high.ones << low.width) | low.ones)
+
+# A shift by the width or more gives 0, like bvshl and bvlshr
+def bv_shl(value, shift):
+    if shift.lo >= value.width:
+        return constant(value.width, 0)
+    if shift.is_constant() and value.hi << shift.lo <= value.mask:
+        return AbstractValue(value.width, value.lo << shift.lo, value.hi << shift.lo)
+    return top(value.width)
+
+def bv_lshr(value, shift):
+    if shift.lo >= value.width:
+        return constant(value.width, 0)
+    if shift.is_constant():
+        return AbstractValue(value.width, value.lo >> shift.lo, value.hi >> shift.lo)
+    return top(value.width)
+
+def extract(value, high, low):
+    width = high - low + 1
+    mask = (1 << width) - 1
+    if low == 0 and value.hi <= mask:
+        return AbstractValue(width, value.lo, value.hi, value.zeros & mask, value.ones & mask)
+    return AbstractValue(width, 0, mask, (value.zeros >> low) & mask, (value.ones >> low) & mask)
+
+# (swap the operands, strict, signed) of each comparison
+COMPARISONS = {
+    Z3_OP_ULT:  (False, True, False),
+    Z3_OP_ULEQ: (False, False, False),
+    Z3_OP_UGT:  (True, True, False),
+    Z3_OP_UGEQ: (True, False, False),
+    Z3_OP_SLT:  (False, True, True),
+    Z3_OP_SLEQ: (False, False, True),
+    Z3_OP_SGT:  (True, True, True),
+    Z3_OP_SGEQ: (True, False, True)
+}
+
+# Abstract transfer function of each bit-vector operation, folded over its operands
+BV_OPERATIONS = {
+    Z3_OP_BADD:    bv_add,
+    Z3_OP_BSUB:    bv_sub,
+    Z3_OP_BMUL:    bv_mul,
+    Z3_OP_BUDIV:   bv_udiv,
+    Z3_OP_BUDIV_I: bv_udiv,
+    Z3_OP_BUREM:   bv_urem,
+    Z3_OP_BUREM_I: bv_urem,
+    Z3_OP_BAND:    bv_and,
+    Z3_OP_BOR:     bv_or,
+    Z3_OP_BXOR:    bv_xor,
+    Z3_OP_BNOT:    None,
+    Z3_OP_CONCAT:  bv_concat,
+    Z3_OP_BSHL:    bv_shl,
+    Z3_OP_BLSHR:   bv_lshr,
+    Z3_OP_EXTRACT: None,
+    Z3_OP_ZERO_EXT: None
+}
@@ -0,0 +1,139 @@
+import math
+import time
+import logging
+import threading
+
+from z3 import *
+
+import global_params
+
+from query_capture import get_call_site
+from portfolio import PortfolioSolver
+
+log = logging.getLogger(__name__)
+
+# Functions whose unknown results can change the verdict of a heuristic. Their queries
+# get a budget that grows with the number of unknown results they produced, the other
+# sites (e.g. branch feasibility checks, where unknown only keeps a path alive) get a
+# timeout derived from their observed latency.
+VERDICT_SITES = ("detect_", "check_if_path_conditions_depend_on_storage")
+
+# Running latency statistics per query site and constraint size, from which the timeout
+# of the next query of the same site and size is chosen
+class TimeoutPolicy:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (site, size class) -> [queries, unknown results, total time (s), max time of an answered query (s)]
+        self.stats = {}
+
+    def timeout(self, site, size):
+        with self.lock:
+            stats = self.stats.get((site, size_class(size)))
+            unknown = sum(entry[1] for key, entry in self.stats.items() if key[0] == site)
+        if is_verdict_site(site):
+            budget = global_params.TIMEOUT * 2 ** unknown
+            return int(min(budget, global_params.ADAPTIVE_MAX_TIMEOUT))
+        if stats is None or stats[0] < global_params.ADAPTIVE_WARMUP:
+            return global_params.TIMEOUT
+        timeout = global_params.ADAPTIVE_FACTOR * stats[3] * 1000
+        return int(min(max(timeout, global_params.ADAPTIVE_MIN_TIMEOUT), global_params.TIMEOUT))
+
+    def record(self, site, size, elapsed, result):
+        with self.lock:
+            stats = self.stats.setdefault((site, size_class(size)), [0, 0, 0.0, 0.0])
+            stats[0] += 1
+            stats[2] += elapsed
+            if result == unknown:
+                stats[1] += 1
+            else:
+                stats[3] = max(stats[3], elapsed)
+
+    def get_stats(self):
+        with self.lock:
+            return dict((key, list(entry)) for key, entry in self.stats.items())
+
+    def merge_stats(self, other):
+        with self.lock:
+            for key, entry in other.items():
+                stats = self.stats.setdefault(key, [0, 0, 0.0, 0.0])
+                stats[0] += entry[0]
+                stats[1] += entry[1]
+                stats[2] += entry[2]
+                stats[3] = max(stats[3], entry[3])
+
+    # Statistics of a forked worker, without what it inherited
+    def diff_stats(self, inherited):
+        stats = {}
+        for key, entry in self.get_stats().items():
+            base = inherited.get(key, [0, 0, 0.0, 0.0])
+            stats[key] = [entry[0] - base[0], entry[1] - base[1], entry[2] - base[2], entry[3]]
+        return stats
+
+    # Queries, unknown results and time of each site
+    def get_report(self):
+        report = {}
+        for (site, size), entry in self.get_stats().items():
+            site_report = report.setdefault(site, {"queries": 0, "unknown": 0, "time": 0.0})
+            site_report["queries"] += entry[0]
+            site_report["unknown"] += entry[1]
+            site_report["time"] += entry[2]
+        for site in report:
+            report[site]["time"] = round(report[site]["time"], 3)
+        return report
+
+# Solver that sets the timeout of each query from the statistics of its site and records
+# how long it took. It shares the native solver of the solver it wraps.
+class AdaptiveSolver(Solver):
+    def __init__(self, solver):
+        Solver.__init__(self, solver.solver, solver.ctx)
+        self.base = solver
+        self.site = None  # call site of the query, when it was issued by another thread
+        self.last_timeout = None  # timeout given to the last query
+
+    # Timeout the next check of the current assertions gets from the policy
+    def effective_timeout(self):
+        site = self.site or get_call_site()
+        return get_timeout_policy().timeout(site.split(":")[0], self._size())
+
+    def _size(self):
+        return sum(assertion.num_args() if is_and(assertion) else 1 for assertion in self.assertions())
+
+    def check(self, *assumptions):
+        site = self.site or get_call_site()
+        if hasattr(self.base, "site"):
+            self.base.site = site
+        size = self._size()
+        policy = get_timeout_policy()
+        timeout = policy.timeout(site.split(":")[0], size)
+        self.last_timeout = timeout
+        if isinstance(self.base, PortfolioSolver):
+            self.base.budget = timeout
+        else:
+            self.base.set("timeout", timeout)
+        start = time.time()
+        try:
+            result = self.base.check(*assumptions)
+        finally:
+            if not isinstance(self.base, PortfolioSolver):
+                self.base.set("timeout", global_params.TIMEOUT)
+        policy.record(site.split(":")[0], size, time.time() - start, result)
+        return result
+
+    def model(self):
+        return self.base.model()
+
+def size_class(size):
+    return min(int(math.log(max(size, 1), 4)), 4)
+
+def is_verdict_site(site):
+    return any(site.startswith(prefix) for prefix in VERDICT_SITES)
+
+_timeout_policy = None
+
+# The policy of the process, created on first use
+def get_timeout_policy():
+    global _timeout_policy
+
+    if _timeout_policy is None:
+        _timeout_policy = TimeoutPolicy()
+    return _timeout_policy
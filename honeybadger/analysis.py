@@ -1,14 +1,21 @@
 import logging
 import math
+import collections
 from opcodes import *
 from z3 import *
 from z3.z3util import *
 from vargenerator import *
 from utils import *
+from expr_cache import simplify_expr
+from solver_factory import make_solver
 import global_params
 
 log = logging.getLogger(__name__)
 
+# Opcodes whose cost depends on their operands or on the state
+DYNAMIC_GAS_OPCODES = set(["LOG0", "LOG1", "LOG2", "LOG3", "LOG4", "EXP", "EXTCODECOPY", "CALLDATACOPY", "CODECOPY",
+                           "SSTORE", "SUICIDE", "CALL", "CALLCODE", "DELEGATECALL"])
+
 # THIS IS TO DEFINE A SKELETON FOR ANALYSIS
 # FOR NEW TYPE OF ANALYSIS: add necessary details to the skeleton functions
 cur_file = ""
@@ -21,8 +28,10 @@ def set_cur_file(c_file):
 
 def init_analysis():
     analysis = {
-        "gas": 0,
+        "gas": 0,        # lower bound of the gas used by the path
+        "gas_max": 0,    # upper bound of the gas used by the path
         "gas_mem": 0,
+        "mem_words": 0,
         "money_flow": [("Is", "Ia", "Iv")],  # (source, destination, amount)
         "sload": [],
         "sstore": {},
@@ -76,8 +85,7 @@ def check_reentrancy_bug(path_conditions_and_vars, stack, global_state):
     #if global_params.DEBUG_MODE:
     #    log.info("=>>>>>> New PC: " + str(new_path_condition))
 
-    solver = Solver()
-    solver.set("timeout", global_params.TIMEOUT)
+    solver = make_solver()
     solver.add(path_condition)
     solver.add(new_path_condition)
     # 2300 is the outgas used by transfer and send.
@@ -94,23 +102,26 @@ def check_reentrancy_bug(path_conditions_and_vars, stack, global_state):
         reported = True
     return ret_val
 
-def calculate_gas(opcode, stack, mem, global_state, analysis, solver):
-    gas_increment = get_ins_cost(opcode) # base cost
-    gas_memory = analysis["gas_mem"]
+# The static cost of the instructions is charged once per block (see BasicBlock.get_static_gas),
+# this only computes the part of the cost that depends on the state of the evm, as an interval
+# [low, high]. Without refine, symbolic operands give the widest interval.
+def calculate_gas(opcode, stack, mem, global_state, analysis, solver, refine):
+    gas_low = 0
+    gas_high = 0
     # In some opcodes, gas cost is not only depend on opcode itself but also current state of evm
     # For symbolic variables, we only add base cost part for simplicity
     if opcode in ("LOG0", "LOG1", "LOG2", "LOG3", "LOG4") and len(stack) > 1:
         if isinstance(stack[1], (int, long)):
-            gas_increment += GCOST["Glogdata"] * stack[1]
+            gas_low = gas_high = GCOST["Glogdata"] * stack[1]
     elif opcode == "EXP" and len(stack) > 1:
         if isinstance(stack[1], (int, long)) and stack[1] > 0:
-            gas_increment += GCOST["Gexpbyte"] * (1 + math.floor(math.log(stack[1], 256)))
+            gas_low = gas_high = GCOST["Gexpbyte"] * (1 + math.floor(math.log(stack[1], 256)))
     elif opcode == "EXTCODECOPY" and len(stack) > 2:
         if isinstance(stack[2], (int, long)):
-            gas_increment += GCOST["Gcopy"] * math.ceil(stack[2] / 32)
+            gas_low = gas_high = GCOST["Gcopy"] * math.ceil(stack[2] / 32)
     elif opcode in ("CALLDATACOPY", "CODECOPY") and len(stack) > 3:
         if isinstance(stack[3], (int, long)):
-            gas_increment += GCOST["Gcopy"] * math.ceil(stack[3] / 32)
+            gas_low = gas_high = GCOST["Gcopy"] * math.ceil(stack[3] / 32)
     elif opcode == "SSTORE" and len(stack) > 1:
         if isinstance(stack[1], (int, long)):
             try:
@@ -120,14 +131,17 @@ def calculate_gas(opcode, stack, mem, global_state, analysis, solver):
                     storage_value = global_state["Ia"][str(stack[0])]
                 # when we change storage value from zero to non-zero
                 if storage_value == 0 and stack[1] != 0:
-                    gas_increment += GCOST["Gsset"]
+                    gas_low = gas_high = GCOST["Gsset"]
                 else:
-                    gas_increment += GCOST["Gsreset"]
+                    gas_low = gas_high = GCOST["Gsreset"]
             except: # when storage address at considered key is empty
                 if stack[1] != 0:
-                    gas_increment += GCOST["Gsset"]
+                    gas_low = gas_high = GCOST["Gsset"]
                 elif stack[1] == 0:
-                    gas_increment += GCOST["Gsreset"]
+                    gas_low = gas_high = GCOST["Gsreset"]
+        elif not refine:
+            gas_low = GCOST["Gsreset"]
+            gas_high = GCOST["Gsset"]
         else:
             try:
                 try:
@@ -137,9 +151,9 @@ def calculate_gas(opcode, stack, mem, global_state, analysis, solver):
                 solver.push()
                 solver.add(Not( And(storage_value == 0, stack[1] != 0) ))
                 if solver.check() == unsat:
-                    gas_increment += GCOST["Gsset"]
+                    gas_low = gas_high = GCOST["Gsset"]
                 else:
-                    gas_increment += GCOST["Gsreset"]
+                    gas_low = gas_high = GCOST["Gsreset"]
                 solver.pop()
             except Exception as e:
                 if str(e) == "canceled":
@@ -148,68 +162,139 @@ def calculate_gas(opcode, stack, mem, global_state, analysis, solver):
                 solver.add(Not( stack[1] != 0 ))
                 try:
                     if solver.check() == unsat:
-                        gas_increment += GCOST["Gsset"]
+                        gas_low = gas_high = GCOST["Gsset"]
                     else:
-                        gas_increment += GCOST["Gsreset"]
+                        gas_low = gas_high = GCOST["Gsreset"]
                 except:
-                    gas_increment += GCOST["Gsset"]
+                    gas_low = gas_high = GCOST["Gsset"]
                 solver.pop()
     elif opcode == "SUICIDE" and len(stack) > 1:
         if isinstance(stack[1], (int, long)):
             address = stack[1] % 2**160
             if address not in global_state:
-                gas_increment += GCOST["Gnewaccount"]
+                gas_low = gas_high = GCOST["Gnewaccount"]
         else:
             address = str(stack[1])
             if address not in global_state:
-                gas_increment += GCOST["Gnewaccount"]
+                gas_low = gas_high = GCOST["Gnewaccount"]
     elif opcode in ("CALL", "CALLCODE", "DELEGATECALL") and len(stack) > 2:
         # Not fully correct yet
-        gas_increment += GCOST["Gcall"]
+        gas_low = gas_high = GCOST["Gcall"]
         if isinstance(stack[2], (int, long)):
             if stack[2] != 0:
-                gas_increment += GCOST["Gcallvalue"]
+                gas_low = gas_high = GCOST["Gcall"] + GCOST["Gcallvalue"]
+        elif not refine:
+            gas_high += GCOST["Gcallvalue"]
         else:
             solver.push()
             solver.add(Not (stack[2] != 0))
             if check_solver(solver) == unsat:
-                gas_increment += GCOST["Gcallvalue"]
+                gas_low = gas_high = GCOST["Gcall"] + GCOST["Gcallvalue"]
             solver.pop()
     elif opcode == "SHA3" and isinstance(stack[1], (int, long)):
         pass # Not handle
 
+    return (gas_low, gas_high)
 
-    #Calculate gas memory, add it to total gas used
-    length = len(mem.keys()) # number of memory words
-    new_gas_memory = GCOST["Gmemory"] * length + (length ** 2) // 512
-    gas_increment += new_gas_memory - gas_memory
+# Memory gas only changes when the number of memory words changes
+def update_memory_gas(analysis, mem):
+    length = len(mem) # number of memory words
+    if length != analysis["mem_words"]:
+        new_gas_memory = GCOST["Gmemory"] * length + (length ** 2) // 512
+        analysis["gas"] += new_gas_memory - analysis["gas_mem"]
+        analysis["gas_max"] += new_gas_memory - analysis["gas_mem"]
+        analysis["gas_mem"] = new_gas_memory
+        analysis["mem_words"] = length
 
-    return (gas_increment, new_gas_memory)
+# Charges the static cost of the instructions of a block, when the block is entered
+def charge_block_gas(analysis, block):
+    if "gas" in enabled_passes:
+        analysis["gas"] += block.get_static_gas()
+        analysis["gas_max"] += block.get_static_gas()
 
-def update_analysis(analysis, opcode, stack, mem, global_state, path_conditions_and_vars, solver):
-    gas_increment, gas_memory = calculate_gas(opcode, stack, mem, global_state, analysis, solver)
-    analysis["gas"] += gas_increment
-    analysis["gas_mem"] = gas_memory
+# Analysis passes run by update_analysis before an instruction is executed. Each pass
+# declares the opcodes it needs (None = every instruction) and only the enabled passes
+# are invoked. A pass without a function only records that symExec should do some work.
+analysis_passes = collections.OrderedDict()
+enabled_passes = set()
+passes_by_opcode = {}
+passes_on_every_instruction = []
+
+def register_analysis_pass(name, opcodes, function):
+    analysis_passes[name] = (opcodes, function)
+
+def enable_analysis_passes(names):
+    global passes_on_every_instruction
+
+    for name in names:
+        if name not in analysis_passes:
+            raise ValueError("Unknown analysis pass: " + name)
+    enabled_passes.clear()
+    enabled_passes.update(names)
+    passes_by_opcode.clear()
+    passes_on_every_instruction = []
+    for name, (opcodes, function) in analysis_passes.items():
+        if name not in enabled_passes or function is None:
+            continue
+        if opcodes is None:
+            passes_on_every_instruction.append(function)
+        else:
+            for opcode in opcodes:
+                passes_by_opcode.setdefault(opcode, []).append(function)
+
+def is_pass_enabled(name):
+    return name in enabled_passes
 
+# The solver only refines the cost of an instruction when its interval could take the upper
+# bound of the gas of the path over GAS_LIMIT, the only use of the gas
+def gas_pass(analysis, opcode, stack, mem, global_state, path_conditions_and_vars, solver):
+    if opcode in DYNAMIC_GAS_OPCODES:
+        gas_low, gas_high = calculate_gas(opcode, stack, mem, global_state, analysis, solver, False)
+        if global_params.GAS_SOLVER_REFINEMENT and gas_low != gas_high \
+        and analysis["gas_max"] + gas_high > global_params.GAS_LIMIT:
+            gas_low, gas_high = calculate_gas(opcode, stack, mem, global_state, analysis, solver, True)
+        analysis["gas"] += gas_low
+        analysis["gas_max"] += gas_high
+    update_memory_gas(analysis, mem)
+
+def reentrancy_pass(analysis, opcode, stack, mem, global_state, path_conditions_and_vars, solver):
+    if isReal(stack[2]) and stack[2] == 0:
+        return
+    reentrancy_result = check_reentrancy_bug(path_conditions_and_vars, stack, global_state)
+    analysis["reentrancy_bug"].append(reentrancy_result)
+    analysis["money_concurrency_bug"].append(global_state["pc"])
+
+def money_flow_pass(analysis, opcode, stack, mem, global_state, path_conditions_and_vars, solver):
     if opcode == "CALL":
         recipient = stack[1]
         transfer_amount = stack[2]
         if isReal(transfer_amount) and transfer_amount == 0:
             return
         if isSymbolic(recipient):
-            recipient = simplify(recipient)
-
-        reentrancy_result = check_reentrancy_bug(path_conditions_and_vars, stack, global_state)
-        analysis["reentrancy_bug"].append(reentrancy_result)
-
-        analysis["money_concurrency_bug"].append(global_state["pc"])
+            recipient = simplify_expr(recipient)
         analysis["money_flow"].append( ("Ia", str(recipient), str(transfer_amount)))
     elif opcode == "SUICIDE":
         recipient = stack[0]
         if not isinstance(recipient, (int, long)):
-            recipient = simplify(recipient)
+            recipient = simplify_expr(recipient)
         analysis["money_flow"].append(("Ia", str(recipient), "all_remaining"))
 
+register_analysis_pass("gas", None, gas_pass)
+register_analysis_pass("reentrancy", ["CALL"], reentrancy_pass)
+register_analysis_pass("money_flow", ["CALL", "SUICIDE"], money_flow_pass)
+# time dependency bookkeeping of the path conditions added by CALL (done by symExec)
+register_analysis_pass("time_dependency", ["CALL"], None)
+# records of the calls, storage writes and selfdestructs used by the honeypot heuristics (done by symExec)
+register_analysis_pass("honeypot", [], None)
+
+ANALYSIS_PASSES = analysis_passes.keys()
+
+def update_analysis(analysis, opcode, stack, mem, global_state, path_conditions_and_vars, solver):
+    for function in passes_on_every_instruction:
+        function(analysis, opcode, stack, mem, global_state, path_conditions_and_vars, solver)
+    for function in passes_by_opcode.get(opcode, []):
+        function(analysis, opcode, stack, mem, global_state, path_conditions_and_vars, solver)
+
 # Check if it is possible to execute a path after a previous path
 # Previous path has prev_pc (previous path condition) and set global state variables as in gstate (only storage values)
 # Current path has curr_pc
@@ -226,8 +311,7 @@ def is_feasible(prev_pc, gstate, curr_pc):
         var = gen.gen_owner_store_var(storage_address)
         if var in vars_mapping:
             new_pc.append(vars_mapping[var] == gstate[storage_address])
-    solver = Solver()
-    solver.set("timeout", global_params.TIMEOUT)
+    solver = make_solver()
     solver.add(new_pc)
     if solver.check() == unsat:
         return False
@@ -269,8 +353,7 @@ def is_diff(flow1, flow2):
             tx_cd = Or(Not(flow1[i][0] == flow2[i][0]),
                        Not(flow1[i][1] == flow2[i][1]),
                        Not(flow1[i][2] == flow2[i][2]))
-            solver = Solver()
-            solver.set("timeout", global_params.TIMEOUT)
+            solver = make_solver()
             solver.add(tx_cd)
 
             if solver.check() == sat:
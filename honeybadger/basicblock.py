@@ -1,9 +1,12 @@
+from opcodes import get_ins_cost
+
 class BasicBlock:
     def __init__(self, start_address, end_address):
         self.start = start_address
         self.end = end_address
         self.instructions = []  # each instruction is a string
         self.jump_target = 0
+        self.static_gas = 0  # sum of the base costs of the instructions
 
     def get_start_address(self):
         return self.start
@@ -13,10 +16,14 @@ class BasicBlock:
 
     def add_instruction(self, instruction):
         self.instructions.append(instruction)
+        self.static_gas += get_ins_cost(instruction.split(' ')[0])
 
     def get_instructions(self):
         return self.instructions
 
+    def get_static_gas(self):
+        return self.static_gas
+
     def set_block_type(self, type):
         self.type = type
 
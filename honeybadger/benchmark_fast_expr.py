@@ -0,0 +1,49 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Compares the expressions built by the handlers of the hot opcodes through the z3.py
+# operators with the fast_expr builders on the z3 C API: time per instruction and
+# whether both give the same simplified expression.
+#
+# Usage: python benchmark_fast_expr.py [iterations]
+
+import sys
+import time
+
+from z3 import *
+from fast_expr import bv_var, bv_add, bv_and, bv_eq, bv_ult, bool_to_bv
+
+MASK = 2**160 - 1
+
+HANDLERS = [
+    ("ADD",     lambda x, y: x + BitVecVal(4, 256),
+                lambda x, y: bv_add(x, 4)),
+    ("AND",     lambda x, y: x & MASK,
+                lambda x, y: bv_and(x, MASK)),
+    ("EQ",      lambda x, y: If(x == y, BitVecVal(1, 256), BitVecVal(0, 256)),
+                lambda x, y: bool_to_bv(bv_eq(x, y))),
+    ("ISZERO",  lambda x, y: If(x == 0, BitVecVal(1, 256), BitVecVal(0, 256)),
+                lambda x, y: bool_to_bv(bv_eq(x, 0))),
+    ("LT",      lambda x, y: If(ULT(x, y), BitVecVal(1, 256), BitVecVal(0, 256)),
+                lambda x, y: bool_to_bv(bv_ult(x, y))),
+    ("BALANCE", lambda x, y: BitVec("balance_Ia", 256),
+                lambda x, y: bv_var("balance_Ia")),
+]
+
+def measure(handler, x, y, iterations):
+    start = time.time()
+    for _ in xrange(iterations):
+        handler(x, y)
+    return (time.time() - start) / iterations * 10**6
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    x = BitVec("Id_1", 256)
+    y = BitVec("Ia_store_0", 256)
+
+    print('%-8s %14s %14s %8s %6s' % ('Opcode', 'z3.py (us)', 'fast (us)', 'Speedup', 'Same'))
+    for opcode, wrapper, fast in HANDLERS:
+        same = eq(simplify(wrapper(x, y)), simplify(fast(x, y)))
+        wrapper_time = measure(wrapper, x, y, iterations)
+        fast_time = measure(fast, x, y, iterations)
+        print('%-8s %14.2f %14.2f %7.1fx %6s' % (opcode, wrapper_time, fast_time, wrapper_time / fast_time, same))
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Compares the dictionary model of memory and storage with the Z3 array backend
+# (--symbolic-arrays) on a directory of bytecode contracts: number of explored paths,
+# code coverage and runtime of each contract.
+#
+# Usage: python benchmark_memory_model.py [contracts directory] [global timeout]
+
+import os
+import sys
+import json
+import time
+import shlex
+import subprocess
+
+import global_params
+
+MODELS = [("dict", ""), ("arrays", " --symbolic-arrays")]
+
+def run(contract, options, global_timeout):
+    result_file = os.path.join(global_params.RESULTS_DIR, os.path.basename(contract).replace('.bin', '.json'))
+    if os.path.isfile(result_file):
+        os.remove(result_file)
+    cmd = 'python honeybadger.py -s '+contract+' -b -j -glt '+str(global_timeout)+options
+    start = time.time()
+    subprocess.call(shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    elapsed = time.time() - start
+    if not os.path.isfile(result_file):
+        return None
+    with open(result_file) as f:
+        results = json.load(f)
+    os.remove(result_file)
+    return {
+        "paths": int(results["execution_paths"] or 0),
+        "coverage": float(results["evm_code_coverage"] or 0),
+        "time": elapsed,
+        "solver_time": float(results.get("solver_time", 0)),
+        "timeout": results["timeout"]
+    }
+
+if __name__ == "__main__":
+    contracts_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join("..", "contracts")
+    global_timeout = int(sys.argv[2]) if len(sys.argv) > 2 else global_params.GLOBAL_TIMEOUT
+
+    if not os.path.isdir(global_params.RESULTS_DIR):
+        os.makedirs(global_params.RESULTS_DIR)
+
+    totals = dict((model, {"paths": 0, "coverage": 0.0, "time": 0.0, "timeouts": 0, "contracts": 0}) for model, _ in MODELS)
+    print('%-40s %-8s %8s %10s %10s' % ('Contract', 'Model', 'Paths', 'Coverage', 'Time (s)'))
+    for file in sorted(os.listdir(contracts_dir)):
+        if not file.endswith(".bin"):
+            continue
+        contract = os.path.join(contracts_dir, file)
+        for model, options in MODELS:
+            result = run(contract, options, global_timeout)
+            if not result:
+                print('%-40s %-8s %8s' % (file, model, 'failed'))
+                continue
+            print('%-40s %-8s %8d %9.1f%% %10.2f%s' % (file, model, result["paths"], result["coverage"], result["time"], ' (timeout)' if result["timeout"] else ''))
+            totals[model]["paths"] += result["paths"]
+            totals[model]["coverage"] += result["coverage"]
+            totals[model]["time"] += result["time"]
+            totals[model]["timeouts"] += 1 if result["timeout"] else 0
+            totals[model]["contracts"] += 1
+
+    print('')
+    for model, _ in MODELS:
+        total = totals[model]
+        if total["contracts"]:
+            print('%-8s %d contracts, %d paths, %.1f%% average coverage, %.2f s, %d timeouts' % (model, total["contracts"], total["paths"], total["coverage"] / total["contracts"], total["time"], total["timeouts"]))
@@ -0,0 +1,58 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Measures the solver time saved by the bit-width narrowing of the queries
+# (--narrow-widths) on a directory of bytecode contracts, e.g. the honeypot corpus.
+#
+# On the three bytecode contracts of datasets/honeypots (global timeout 600 s) both
+# modes explore the same 243 paths and 942 of the 1082 queries of PrivateBank-Logger
+# are narrowed, but the solver time only goes from 42.91 s to 42.44 s (1.1%), which
+# is within the noise between two runs.
+#
+# Usage: python benchmark_narrowing.py [contracts directory] [global timeout]
+
+import os
+import sys
+
+import global_params
+
+from benchmark_memory_model import run
+
+MODES = [("256-bit", ""), ("narrowed", " --narrow-widths")]
+
+if __name__ == "__main__":
+    contracts_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join("..", "contracts")
+    global_timeout = int(sys.argv[2]) if len(sys.argv) > 2 else global_params.GLOBAL_TIMEOUT
+
+    if not os.path.isdir(global_params.RESULTS_DIR):
+        os.makedirs(global_params.RESULTS_DIR)
+
+    totals = dict((mode, {"solver_time": 0.0, "time": 0.0, "paths": 0}) for mode, _ in MODES)
+    contracts = 0
+    print('%-40s %-9s %8s %14s %10s' % ('Contract', 'Mode', 'Paths', 'Solver (s)', 'Time (s)'))
+    for file in sorted(os.listdir(contracts_dir)):
+        if not file.endswith(".bin"):
+            continue
+        contract = os.path.join(contracts_dir, file)
+        results = dict((mode, run(contract, options, global_timeout)) for mode, options in MODES)
+        for mode, _ in MODES:
+            result = results[mode]
+            if not result:
+                print('%-40s %-9s %8s' % (file, mode, 'failed'))
+                continue
+            print('%-40s %-9s %8d %14.2f %10.2f%s' % (file, mode, result["paths"], result["solver_time"], result["time"], ' (timeout)' if result["timeout"] else ''))
+        # only contracts analyzed in both modes are compared
+        if all(results.values()):
+            contracts += 1
+            for mode, _ in MODES:
+                totals[mode]["solver_time"] += results[mode]["solver_time"]
+                totals[mode]["time"] += results[mode]["time"]
+                totals[mode]["paths"] += results[mode]["paths"]
+
+    print('')
+    for mode, _ in MODES:
+        print('%-9s %d contracts, %d paths, %.2f s in the solver, %.2f s in total' % (mode, contracts, totals[mode]["paths"], totals[mode]["solver_time"], totals[mode]["time"]))
+    baseline = totals[MODES[0][0]]["solver_time"]
+    if baseline:
+        saved = baseline - totals[MODES[1][0]]["solver_time"]
+        print('Solver time saved: %.2f s (%.1f%%)' % (saved, saved / baseline * 100))
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Compares solver configurations on a set of captured queries: a directory of SMT-LIB2
+# files, each holding one query (see --capture-queries). Prints the total time and the
+# number of sat, unsat and unknown results of each configuration, and the queries on
+# which they disagree.
+#
+# Usage: python benchmark_solver.py [queries directory] [timeout in ms]
+
+import os
+import sys
+import time
+
+from z3 import *
+
+import global_params
+
+from solver_factory import make_solver
+
+# (name, solver configuration, tactics)
+CONFIGURATIONS = [
+    ("default",            "default", None),
+    ("qf_bv",              "qf_bv",   None),
+    ("tactic",             "tactic",  ["simplify", "solve-eqs", "bit-blast", "sat"]),
+    ("tactic-uncnstr",     "tactic",  ["simplify", "solve-eqs", "elim-uncnstr", "bit-blast", "sat"]),
+    ("tactic-propagate",   "tactic",  ["simplify", "propagate-values", "solve-eqs", "bit-blast", "sat"]),
+]
+
+def check(query, configuration, tactics):
+    solver = make_solver(configuration=configuration, tactics=tactics)
+    solver.add(query)
+    start = time.time()
+    try:
+        result = str(solver.check())
+    except Z3Exception:
+        result = "unknown"
+    return result, time.time() - start
+
+if __name__ == "__main__":
+    queries_dir = sys.argv[1] if len(sys.argv) > 1 else "queries"
+    if len(sys.argv) > 2:
+        global_params.TIMEOUT = int(sys.argv[2])
+
+    files = sorted(file for file in os.listdir(queries_dir) if file.endswith(".smt2"))
+    totals = dict((name, {"time": 0.0, "sat": 0, "unsat": 0, "unknown": 0}) for name, _, _ in CONFIGURATIONS)
+    disagreements = []
+    for file in files:
+        query = parse_smt2_file(os.path.join(queries_dir, file))
+        results = set()
+        for name, configuration, tactics in CONFIGURATIONS:
+            result, elapsed = check(query, configuration, tactics)
+            totals[name]["time"] += elapsed
+            totals[name][result] += 1
+            if result != "unknown":
+                results.add(result)
+        if len(results) > 1:
+            disagreements.append(file)
+
+    print('%d queries, timeout %d ms' % (len(files), global_params.TIMEOUT))
+    print('%-18s %10s %8s %8s %8s %8s' % ('Configuration', 'Time (s)', 'Speedup', 'sat', 'unsat', 'unknown'))
+    baseline = totals[CONFIGURATIONS[0][0]]["time"]
+    for name, _, _ in CONFIGURATIONS:
+        total = totals[name]
+        speedup = baseline / total["time"] if total["time"] else 0.0
+        print('%-18s %10.2f %7.1fx %8d %8d %8d' % (name, total["time"], speedup, total["sat"], total["unsat"], total["unknown"]))
+    for file in disagreements:
+        print('Configurations disagree on ' + file)
@@ -0,0 +1,102 @@
+import copy
+import time
+import logging
+
+log = logging.getLogger(__name__)
+
+# Splits the global time budget (and optionally a total path budget) between the
+# public functions of a contract. A function receives its share of what is left
+# when the search starts exploring it, so the budget a function does not use is
+# automatically handed on to the functions explored after it. A function is charged
+# for the time spent executing its blocks, which keeps the accounting fair when the
+# search strategy interleaves functions. Code outside of the functions (dispatcher,
+# fallback) is only bound by the global timeout.
+class BudgetScheduler:
+    def __init__(self, signatures, deadline, path_budget=0):
+        self.pending = set(signatures)  # dispatcher functions that have not been started yet
+        self.deadline = deadline
+        self.path_budget = path_budget
+        self.paths = 0
+        self.stats = {}
+        self.inherited = {}
+
+    def _entry(self, signature):
+        if signature not in self.stats:
+            self.stats[signature] = {"time": 0.0, "time_budget": 0.0, "paths": 0, "path_budget": 0, "blocks": {}, "exhausted": False}
+        return self.stats[signature]
+
+    # Assigns the budget of a function the first time one of its blocks is explored
+    def start(self, signature):
+        if signature is None or signature in self.stats:
+            return
+        shares = len(self.pending | set([signature]))
+        self.pending.discard(signature)
+        entry = self._entry(signature)
+        entry["time_budget"] = max(self.deadline - time.time(), 0) / float(shares)
+        if self.path_budget:
+            entry["path_budget"] = max(self.path_budget - self.paths, 0) / shares
+
+    # True when the function ran out of time or paths
+    def exhausted(self, signature):
+        if signature is None or signature not in self.stats:
+            return False
+        entry = self.stats[signature]
+        if entry["time"] >= entry["time_budget"] or \
+        (self.path_budget and entry["paths"] >= entry["path_budget"]):
+            entry["exhausted"] = True
+            return True
+        return False
+
+    def charge(self, signature, seconds):
+        self._entry(signature)["time"] += seconds
+
+    def visit(self, signature, block, size):
+        self._entry(signature)["blocks"][block] = size
+
+    def count_path(self, signature):
+        self.paths += 1
+        self._entry(signature)["paths"] += 1
+
+    # A forked worker keeps the budgets it inherited but only reports what it used itself
+    def fork(self):
+        self.inherited = copy.deepcopy(self.stats)
+
+    def get_worker_stats(self):
+        stats = {}
+        for signature, entry in self.stats.items():
+            inherited = self.inherited.get(signature, {"time": 0.0, "paths": 0})
+            stats[signature] = dict(entry)
+            stats[signature]["time"] = entry["time"] - inherited["time"]
+            stats[signature]["paths"] = entry["paths"] - inherited["paths"]
+        return stats
+
+    def merge_stats(self, stats):
+        for signature in stats:
+            if signature not in self.stats:
+                self.pending.discard(signature)
+            entry = self._entry(signature)
+            entry["time_budget"] = max(entry["time_budget"], stats[signature]["time_budget"])
+            entry["path_budget"] = max(entry["path_budget"], stats[signature]["path_budget"])
+            entry["time"] += stats[signature]["time"]
+            entry["paths"] += stats[signature]["paths"]
+            entry["blocks"].update(stats[signature]["blocks"])
+            entry["exhausted"] = entry["exhausted"] or stats[signature]["exhausted"]
+            self.paths += stats[signature]["paths"]
+
+    # Time, paths and covered instructions per function, the code outside of the functions is reported as "fallback"
+    def report(self):
+        report = {}
+        for signature, entry in self.stats.items():
+            if signature is None:
+                method = "fallback"
+            else:
+                method = "{0:#0{1}x}".format(signature, 10)
+            report[method] = {
+                "time": str(round(entry["time"], 2)),
+                "time_budget": str(round(entry["time_budget"], 2)),
+                "paths": entry["paths"],
+                "path_budget": entry["path_budget"],
+                "covered_instructions": sum(entry["blocks"].values()),
+                "exhausted": entry["exhausted"]
+            }
+        return report
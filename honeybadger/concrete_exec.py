@@ -0,0 +1,576 @@
+import json
+import time
+import logging
+import binascii
+
+from opcodes import opcodes, get_opcode, get_ins_cost, GCOST
+
+log = logging.getLogger(__name__)
+
+STACK_LIMIT = 1024
+
+MASK256 = 2**256 - 1
+
+# Opcodes of the table that are not executed by the EVM, and names that are replaced by
+# the ones symExec reads after change_format
+PSEUDO_OPCODES = ["SLOADEXT", "SSTOREEXT", "SLOADBYTESEXT", "SSTOREBYTESEXT", "BREAKPOINT", "RNGSEED", "SSIZEEXT",
+                  "SLOADBYTES", "SSTOREBYTES", "SSIZE", "STATEROOT", "TXEXECGAS", "CALLSTATIC", "INVALID", "---END---"]
+
+# Opcodes missing from the table: value -> (name, base cost)
+EXTRA_OPCODES = {0x1b: ("SHL", GCOST["Gverylow"]), 0x1c: ("SHR", GCOST["Gverylow"]), 0x1d: ("SAR", GCOST["Gverylow"]),
+                 0xfa: ("STATICCALL", GCOST["Gcall"])}
+
+# Instruction names by opcode value, as they appear in the disassembly read by symExec
+OPCODE_NAMES = dict((value, name) for name, (value, _, _) in opcodes.items() if name not in PSEUDO_OPCODES)
+OPCODE_NAMES.update((value, name) for value, (name, _) in EXTRA_OPCODES.items())
+for i in range(32):
+    OPCODE_NAMES[0x60 + i] = "PUSH" + str(i + 1)
+for i in range(16):
+    OPCODE_NAMES[0x80 + i] = "DUP" + str(i + 1)
+    OPCODE_NAMES[0x90 + i] = "SWAP" + str(i + 1)
+
+# Opcodes that end the transaction without an exception, the others revert its changes
+SUCCESS_OPCODES = ["STOP", "RETURN", "SUICIDE"]
+
+def _signed(value):
+    return value - 2**256 if value >= 2**255 else value
+
+def _sdiv(a, b):
+    if b == 0:
+        return 0
+    quotient = abs(_signed(a)) // abs(_signed(b))
+    return -quotient if (_signed(a) < 0) != (_signed(b) < 0) else quotient
+
+def _smod(a, b):
+    if b == 0:
+        return 0
+    remainder = abs(_signed(a)) % abs(_signed(b))
+    return -remainder if _signed(a) < 0 else remainder
+
+def _signextend(b, x):
+    if b >= 31:
+        return x
+    bit = b * 8 + 7
+    mask = (1 << (bit + 1)) - 1
+    return x | (MASK256 - mask) if (x >> bit) & 1 else x & mask
+
+# Opcodes that pop their operands, the top of the stack first, and push one result:
+# (operands, function). Results are reduced modulo 2^256 by the caller.
+OPERATIONS = {
+    "ADD":        (2, lambda a, b: a + b),
+    "MUL":        (2, lambda a, b: a * b),
+    "SUB":        (2, lambda a, b: a - b),
+    "DIV":        (2, lambda a, b: a // b if b else 0),
+    "SDIV":       (2, _sdiv),
+    "MOD":        (2, lambda a, b: a % b if b else 0),
+    "SMOD":       (2, _smod),
+    "ADDMOD":     (3, lambda a, b, n: (a + b) % n if n else 0),
+    "MULMOD":     (3, lambda a, b, n: (a * b) % n if n else 0),
+    "EXP":        (2, lambda a, b: pow(a, b, 2**256)),
+    "SIGNEXTEND": (2, _signextend),
+    "LT":         (2, lambda a, b: int(a < b)),
+    "GT":         (2, lambda a, b: int(a > b)),
+    "SLT":        (2, lambda a, b: int(_signed(a) < _signed(b))),
+    "SGT":        (2, lambda a, b: int(_signed(a) > _signed(b))),
+    "EQ":         (2, lambda a, b: int(a == b)),
+    "ISZERO":     (1, lambda a: int(a == 0)),
+    "AND":        (2, lambda a, b: a & b),
+    "OR":         (2, lambda a, b: a | b),
+    "XOR":        (2, lambda a, b: a ^ b),
+    "NOT":        (1, lambda a: MASK256 - a),
+    "BYTE":       (2, lambda i, x: (x >> (8 * (31 - i))) & 0xff if i < 32 else 0),
+    "SHL":        (2, lambda shift, x: x << shift if shift < 256 else 0),
+    "SHR":        (2, lambda shift, x: x >> shift if shift < 256 else 0),
+    "SAR":        (2, lambda shift, x: _signed(x) >> min(shift, 255))
+}
+
+# Disassembles bytecode into instructions in the format of symExec: pc -> "PUSH1 0x60 "
+def disassemble(bytecode):
+    if bytecode.startswith("0x"):
+        bytecode = bytecode[2:]
+    code = bytearray(binascii.unhexlify(bytecode))
+    instructions = {}
+    pc = 0
+    while pc < len(code):
+        name = OPCODE_NAMES.get(code[pc], "INVALID")
+        if name.startswith("PUSH"):
+            size = int(name[4:])
+            argument = code[pc + 1:pc + 1 + size]
+            argument += bytearray(size - len(argument))  # push data past the end of the code is zero
+            instructions[pc] = name + " 0x" + binascii.hexlify(argument).decode() + " "
+            pc += 1 + size
+        else:
+            instructions[pc] = name + " "
+            pc += 1
+    return instructions
+
+# Bytecode of instructions in the format of symExec
+def assemble(instructions):
+    code = bytearray()
+    for pc in sorted(instructions):
+        parts = instructions[pc].split()
+        if pc > len(code):
+            code += bytearray(pc - len(code))
+        value = [value for value, (name, _) in EXTRA_OPCODES.items() if name == parts[0]]
+        value = value[0] if value else get_opcode(parts[0])[0]
+        code.append(int(value, 16) if isinstance(value, str) else value)
+        if parts[0].startswith("PUSH"):
+            code += bytearray(binascii.unhexlify("%0*x" % (2 * int(parts[0][4:]), int(parts[1], 16))))
+    return bytes(code)
+
+# Start of each basic block, as collect_vertices splits them
+def get_block_starts(instructions):
+    starts = set([0])
+    previous = None
+    for pc in sorted(instructions):
+        name = instructions[pc].split()[0]
+        if name == "JUMPDEST" or previous in ("JUMP", "JUMPI"):
+            starts.add(pc)
+        previous = name
+    return starts
+
+def _int(value):
+    if value is None or value in ("", "0x"):
+        return 0
+    if isinstance(value, (int, long)):
+        return value
+    return int(value, 16)
+
+def _bytes(value):
+    if not value:
+        return b""
+    if value.startswith("0x"):
+        value = value[2:]
+    return binascii.unhexlify(value)
+
+# Input states of a state file: a single state, a list of states or an object of named
+# states (e.g. a file of VM tests). Returns a list of (name, state).
+def load_states(file_name):
+    with open(file_name) as f:
+        states = json.load(f)
+    if isinstance(states, list):
+        return [(str(i), state) for i, state in enumerate(states)]
+    if "exec" in states or "Ia" in states:
+        return [(file_name, states)]
+    return sorted(states.items())
+
+# A complete input state from the format of state.json, extended with the fields of the
+# VM tests: exec.data (calldata), exec.caller, env.currentTimestamp and the accounts of
+# pre (balance, code and storage). The storage of the contract can also be given as
+# Ia.storage. A missing field is zero, as for an empty account.
+def parse_state(state):
+    environment = state.get("env", {})
+    transaction = state.get("exec", {})
+    accounts = state.get("pre", {})
+    address = _int(transaction.get("address") or state.get("Ia", {}).get("address"))
+    caller = _int(transaction.get("caller") or state.get("Is", {}).get("address"))
+    balances = {}
+    codes = {}
+    storage = {}
+    for account, fields in accounts.items():
+        balances[_int(account)] = _int(fields.get("balance"))
+        codes[_int(account)] = _bytes(fields.get("code"))
+        if _int(account) == address:
+            storage = dict((_int(key), _int(value)) for key, value in fields.get("storage", {}).items())
+    if state.get("Is", {}).get("balance"):
+        balances[caller] = _int(state["Is"]["balance"])
+    if state.get("Ia", {}).get("balance"):
+        balances[address] = _int(state["Ia"]["balance"])
+    if "storage" in state.get("Ia", {}):
+        storage = dict((_int(key), _int(value)) for key, value in state["Ia"]["storage"].items())
+    return {
+        "address": address,
+        "caller": caller,
+        "origin": _int(transaction.get("origin")) or caller,
+        "value": _int(transaction.get("value")),
+        "data": _bytes(transaction.get("data")),
+        "gas": _int(transaction.get("gas")) or _int(environment.get("currentGasLimit")),
+        "gas_price": _int(transaction.get("gasPrice")),
+        "code": _bytes(transaction.get("code")) or None,
+        "coinbase": _int(environment.get("currentCoinbase")),
+        "timestamp": _int(environment.get("currentTimestamp")),
+        "number": _int(environment.get("currentNumber")),
+        "difficulty": _int(environment.get("currentDifficulty")),
+        "gas_limit": _int(environment.get("currentGasLimit")),
+        "balances": balances,
+        "codes": codes,
+        "storage": storage
+    }
+
+# Raised when a transaction halts exceptionally (stack underflow, invalid jump, out of
+# gas, ...). Its changes are reverted and all its gas is consumed.
+class ExecutionError(Exception):
+    pass
+
+# Executes a single transaction of a fully concrete input state on Python integers,
+# without the solver. External calls are not executed: they succeed when the contract
+# can pay the value and return no data. Gas is charged as in the VM tests (Frontier
+# costs, without refunds). The records of the execution have the format of the records
+# of symExec, with an empty path condition: list_of_calls, list_of_sstores,
+# list_of_suicides and terminals.
+class ConcreteExecutor:
+    def __init__(self, instructions, code=None, block_starts=None):
+        self.instructions = instructions
+        self.code = {}
+        self.next_pc = {}
+        addresses = sorted(instructions)
+        for i, address in enumerate(addresses):
+            parts = instructions[address].split()
+            argument = int(parts[1], 16) if parts[0].startswith("PUSH") else None
+            self.code[address] = (parts[0], argument)
+            self.next_pc[address] = addresses[i + 1] if i + 1 < len(addresses) else address + 1
+        self.bytecode = code if code is not None else assemble(instructions)
+        self.block_starts = set(block_starts) if block_starts is not None else get_block_starts(instructions)
+        self.costs = {}
+        for name, _ in self.code.values():
+            extra = [cost for _, (extra_name, cost) in EXTRA_OPCODES.items() if extra_name == name]
+            self.costs[name] = extra[0] if extra else get_ins_cost(name)
+        self.covered = set()
+        self.transactions = 0
+        self.time = 0.0
+
+    def execute(self, state, path_id=0):
+        start = time.time()
+        execution = Execution(self, state, path_id)
+        try:
+            execution.run()
+        except ExecutionError as e:
+            execution.error = str(e)
+            execution.status = "exception"
+            execution.gas = 0
+        self.covered.update(execution.visited)
+        self.transactions += 1
+        self.time += time.time() - start
+        return execution.get_result()
+
+    def get_stats(self):
+        return {"transactions": self.transactions, "time": round(self.time, 3), "covered_instructions": len(self.covered)}
+
+# The state of one transaction executed by a ConcreteExecutor
+class Execution:
+    def __init__(self, executor, state, path_id):
+        self.executor = executor
+        self.state = state
+        self.path_id = path_id
+        self.stack = []
+        self.memory = bytearray()
+        self.mstores = set()  # offsets written by MSTORE, the keys of the memory of a call record
+        self.storage = dict(state["storage"])
+        self.balances = dict(state["balances"])
+        self.balances[state["caller"]] = self.balances.get(state["caller"], 0) - state["value"]
+        self.balances[state["address"]] = self.balances.get(state["address"], 0) + state["value"]
+        self.gas = state["gas"]
+        self.block = 0
+        self.pc = 0
+        self.visited = set()
+        self.steps = 0
+        self.status = None
+        self.error = None
+        self.output = b""
+        self.calls = []
+        self.sstores = []
+        self.suicides = []
+        self.terminals = []
+        self.function_signature = int(binascii.hexlify(state["data"][:4]), 16) if len(state["data"]) >= 4 else None
+
+    def pop(self):
+        if not self.stack:
+            raise ExecutionError("STACK underflow")
+        return self.stack.pop()
+
+    def push(self, value):
+        if len(self.stack) >= STACK_LIMIT:
+            raise ExecutionError("STACK overflow")
+        self.stack.append(value)
+
+    def use_gas(self, amount):
+        if amount > self.gas:
+            raise ExecutionError("Out of gas")
+        self.gas -= amount
+
+    def extend_memory(self, offset, size):
+        if size == 0:
+            return
+        end = offset + size
+        if end > len(self.memory):
+            words, current = (end + 31) // 32, len(self.memory) // 32
+            self.use_gas(memory_cost(words) - memory_cost(current))
+            self.memory += bytearray(words * 32 - len(self.memory))
+
+    def read_memory(self, offset, size):
+        self.extend_memory(offset, size)
+        return bytes(self.memory[offset:offset + size])
+
+    def write_memory(self, offset, data):
+        self.extend_memory(offset, len(data))
+        self.memory[offset:offset + len(data)] = data
+
+    def copy_data(self, source, memory_offset, data_offset, size):
+        self.use_gas(GCOST["Gcopy"] * ((size + 31) // 32))
+        data = bytearray(source[data_offset:data_offset + size]) if data_offset < len(source) else bytearray()
+        self.write_memory(memory_offset, data + bytearray(size - len(data)))
+
+    def record_terminal(self, opcode):
+        self.terminals.append({"opcode": opcode, "path_condition": []})
+
+    def run(self):
+        code = self.executor.code
+        next_pc = self.executor.next_pc
+        costs = self.executor.costs
+        block_starts = self.executor.block_starts
+        pc = 0
+        while True:
+            if pc not in code:
+                # running past the end of the code stops the transaction
+                self.status = "STOP"
+                self.record_terminal("STOP")
+                return
+            if pc in block_starts:
+                self.block = pc
+            self.visited.add(pc)
+            self.steps += 1
+            name, argument = code[pc]
+            self.use_gas(costs[name])
+            self.pc = pc
+            pc = next_pc[pc]
+            if argument is not None:
+                self.push(argument)
+            elif name in OPERATIONS:
+                operands, function = OPERATIONS[name]
+                if len(self.stack) < operands:
+                    raise ExecutionError("STACK underflow")
+                values = [self.stack.pop() for _ in range(operands)]
+                if name == "EXP" and values[1]:
+                    self.use_gas(GCOST["Gexpbyte"] * ((values[1].bit_length() + 7) // 8))
+                self.stack.append(function(*values) & MASK256)
+            elif name.startswith("DUP"):
+                depth = int(name[3:])
+                if len(self.stack) < depth:
+                    raise ExecutionError("STACK underflow")
+                self.push(self.stack[-depth])
+            elif name.startswith("SWAP"):
+                depth = int(name[4:]) + 1
+                if len(self.stack) < depth:
+                    raise ExecutionError("STACK underflow")
+                self.stack[-1], self.stack[-depth] = self.stack[-depth], self.stack[-1]
+            elif name == "JUMPDEST":
+                pass
+            elif name == "POP":
+                self.pop()
+            elif name == "JUMP":
+                pc = self.jump_target(self.pop())
+            elif name == "JUMPI":
+                target = self.pop()
+                if self.pop():
+                    pc = self.jump_target(target)
+            else:
+                if not self.execute(name):
+                    return
+
+    def jump_target(self, target):
+        if self.executor.code.get(target, (None, None))[0] != "JUMPDEST":
+            raise ExecutionError("Invalid jump destination " + str(target))
+        return target
+
+    # Opcodes other than the stack operations, returns False when the transaction ends
+    def execute(self, name):
+        state = self.state
+        if name == "MLOAD":
+            offset = self.pop()
+            self.push(int(binascii.hexlify(self.read_memory(offset, 32)), 16))
+        elif name == "MSTORE":
+            offset, value = self.pop(), self.pop()
+            self.write_memory(offset, binascii.unhexlify("%064x" % value))
+            self.mstores.add(offset)
+        elif name == "MSTORE8":
+            offset, value = self.pop(), self.pop()
+            self.write_memory(offset, bytearray([value & 0xff]))
+        elif name == "SLOAD":
+            self.push(self.storage.get(self.pop(), 0))
+        elif name == "SSTORE":
+            address, value = self.pop(), self.pop()
+            current = self.storage.get(address, 0)
+            self.use_gas(GCOST["Gsset"] if current == 0 and value != 0 else GCOST["Gsreset"])
+            sstore = {
+                "block": self.block,
+                "pc": self.pc,
+                "address": address,
+                "value": value,
+                "variable": current,
+                "path_condition": [],
+                "function_signature": self.function_signature
+            }
+            if sstore not in self.sstores:
+                self.sstores.append(sstore)
+            if value:
+                self.storage[address] = value
+            else:
+                self.storage.pop(address, None)
+        elif name == "SHA3":
+            offset, size = self.pop(), self.pop()
+            self.use_gas(GCOST["Gsha3word"] * ((size + 31) // 32))
+            data = self.read_memory(offset, size)
+            from keccak_cache import get_keccak_cache
+            self.push(get_keccak_cache().keccak(data))
+        elif name == "ADDRESS":
+            self.push(state["address"])
+        elif name == "BALANCE":
+            self.push(self.balances.get(self.pop() & (2**160 - 1), 0))
+        elif name == "ORIGIN":
+            self.push(state["origin"])
+        elif name == "CALLER":
+            self.push(state["caller"])
+        elif name == "CALLVALUE":
+            self.push(state["value"])
+        elif name == "CALLDATALOAD":
+            offset = self.pop()
+            data = bytearray(state["data"][offset:offset + 32]) if offset < len(state["data"]) else bytearray()
+            self.push(int(binascii.hexlify(data + bytearray(32 - len(data))), 16))
+        elif name == "CALLDATASIZE":
+            self.push(len(state["data"]))
+        elif name == "CALLDATACOPY":
+            memory_offset, data_offset, size = self.pop(), self.pop(), self.pop()
+            self.copy_data(state["data"], memory_offset, data_offset, size)
+        elif name == "CODESIZE":
+            self.push(len(self.executor.bytecode))
+        elif name == "CODECOPY":
+            memory_offset, data_offset, size = self.pop(), self.pop(), self.pop()
+            self.copy_data(self.executor.bytecode, memory_offset, data_offset, size)
+        elif name == "GASPRICE":
+            self.push(state["gas_price"])
+        elif name == "EXTCODESIZE":
+            self.push(len(state["codes"].get(self.pop() & (2**160 - 1), b"")))
+        elif name == "EXTCODECOPY":
+            address = self.pop() & (2**160 - 1)
+            memory_offset, data_offset, size = self.pop(), self.pop(), self.pop()
+            self.copy_data(state["codes"].get(address, b""), memory_offset, data_offset, size)
+        elif name == "RETURNDATASIZE":
+            self.push(0)
+        elif name == "RETURNDATACOPY":
+            memory_offset, data_offset, size = self.pop(), self.pop(), self.pop()
+            if data_offset + size > 0:
+                raise ExecutionError("Return data out of bounds")
+        elif name == "BLOCKHASH":
+            self.pop()
+            self.push(0)
+        elif name == "COINBASE":
+            self.push(state["coinbase"])
+        elif name == "TIMESTAMP":
+            self.push(state["timestamp"])
+        elif name == "NUMBER":
+            self.push(state["number"])
+        elif name == "DIFFICULTY":
+            self.push(state["difficulty"])
+        elif name == "GASLIMIT":
+            self.push(state["gas_limit"])
+        elif name == "PC":
+            self.push(self.pc)
+        elif name == "MSIZE":
+            self.push(len(self.memory))
+        elif name == "GAS":
+            self.push(self.gas)
+        elif name.startswith("LOG"):
+            offset, size = self.pop(), self.pop()
+            for _ in range(int(name[3:])):
+                self.pop()
+            self.use_gas(GCOST["Glogdata"] * size)
+            self.extend_memory(offset, size)
+        elif name in ("CALL", "CALLCODE", "DELEGATECALL", "STATICCALL"):
+            self.call(name)
+        elif name == "CREATE":
+            value, offset, size = self.pop(), self.pop(), self.pop()
+            self.extend_memory(offset, size)
+            # contracts are not created, as a call that fails
+            self.push(0)
+        elif name in ("RETURN", "REVERT"):
+            offset, size = self.pop(), self.pop()
+            self.output = self.read_memory(offset, size)
+            self.status = name
+            self.record_terminal(name)
+            return False
+        elif name == "STOP":
+            self.status = name
+            self.record_terminal(name)
+            return False
+        elif name == "SUICIDE":
+            recipient = self.pop()
+            value = self.balances.get(state["address"], 0)
+            self.suicides.append({
+                "path_condition": [],
+                "function_signature": self.function_signature,
+                "recipient": recipient,
+                "value": value,
+                "block": self.block,
+                "pc": self.pc
+            })
+            self.balances[state["address"]] = 0
+            self.balances[recipient & (2**160 - 1)] = self.balances.get(recipient & (2**160 - 1), 0) + value
+            self.status = name
+            self.record_terminal(name)
+            return False
+        elif name == "ASSERTFAIL":
+            self.record_terminal(name)
+            raise ExecutionError("Assertion failed")
+        elif name == "INVALID":
+            raise ExecutionError("Invalid instruction")
+        else:
+            raise ExecutionError("UNKNOWN INSTRUCTION: " + name)
+        return True
+
+    # Records the call as symExec does and pushes its result without executing it
+    def call(self, name):
+        outgas, recipient = self.pop(), self.pop()
+        value = self.pop() if name in ("CALL", "CALLCODE") else None
+        input_offset, input_size, output_offset, output_size = self.pop(), self.pop(), self.pop(), self.pop()
+        self.extend_memory(input_offset, input_size)
+        self.extend_memory(output_offset, output_size)
+        if value:
+            self.use_gas(GCOST["Gcallvalue"])
+        if name != "CALLCODE":
+            memory = {}
+            for offset in sorted(self.mstores):
+                memory[offset] = int(binascii.hexlify(bytes(self.memory[offset:offset + 32])), 16)
+            call = {
+                "path_condition": [],
+                "function_signature": self.function_signature,
+                "recipient": recipient,
+                "value": value,
+                "input_offset": input_offset,
+                "input_size": input_size,
+                "memory": memory,
+                "block": self.block,
+                "type": name,
+                "gas": outgas,
+                "pc": self.pc,
+                "id": self.path_id
+            }
+            if call not in self.calls:
+                self.calls.append(call)
+        balance = self.balances.get(self.state["address"], 0)
+        if value and value > balance:
+            self.push(0)
+            return
+        if value and name == "CALL":
+            self.balances[self.state["address"]] = balance - value
+            self.balances[recipient & (2**160 - 1)] = self.balances.get(recipient & (2**160 - 1), 0) + value
+        self.push(1)
+
+    def get_result(self):
+        succeeded = self.status in SUCCESS_OPCODES
+        return {
+            "status": self.status,
+            "error": self.error,
+            "output": "0x" + binascii.hexlify(self.output).decode(),
+            "gas": self.gas,
+            "gas_used": self.state["gas"] - self.gas,
+            "steps": self.steps,
+            "storage": self.storage if succeeded else dict(self.state["storage"]),
+            "balances": self.balances if succeeded else dict(self.state["balances"]),
+            "calls": self.calls,
+            "sstores": self.sstores,
+            "suicides": self.suicides,
+            "terminals": self.terminals
+        }
+
+def memory_cost(words):
+    return GCOST["Gmemory"] * words + words * words // 512
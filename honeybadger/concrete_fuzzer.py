@@ -0,0 +1,477 @@
+import time
+import random
+import logging
+import binascii
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from z3 import *
+
+from opcodes import get_opcode
+from concrete_exec import OPERATIONS, MASK256
+
+log = logging.getLogger(__name__)
+
+STACK_LIMIT = 1024
+
+# Bytes of memory of each input, an input that accesses memory beyond is stopped
+MEMORY_LIMIT = 8192
+
+# Arguments (32-byte words) after the function selector of the generated calldata
+CALLDATA_WORDS = 6
+CALLDATA_LIMIT = 4 + 32 * CALLDATA_WORDS
+
+# Inputs kept as witnesses of each branch
+MAX_WITNESSES = 4
+
+# Balance given to the caller when a witness is checked against a path condition
+WITNESS_BALANCE = 10**24
+
+CALLERS = [0xaaaa0000000000000000000000000000000000aa, 0xbbbb0000000000000000000000000000000000bb, 0xcccc0000000000000000000000000000000000cc]
+VALUES = [0, 0, 1, 10**15, 10**17, 10**18, 2 * 10**18]
+
+MASK64 = 2**64 - 1
+
+# Opcodes computed on Python integers, one input at a time: (operands, function)
+INT_OPERATIONS = dict((opcode, OPERATIONS[opcode]) for opcode in
+                      ["MUL", "DIV", "SDIV", "MOD", "SMOD", "ADDMOD", "MULMOD", "EXP", "SIGNEXTEND", "BYTE", "SHL", "SHR", "SAR"])
+
+# Opcodes that end the execution of an input
+TERMINAL_OPCODES = ["STOP", "RETURN", "REVERT", "INVALID", "ASSERTFAIL", "SUICIDE", "SELFDESTRUCT"]
+
+# Environment and block information, all zero except the inputs, as the symbolic
+# variables they stand for are when a witness is checked
+ZERO_OPCODES = ["ADDRESS", "GASPRICE", "COINBASE", "TIMESTAMP", "NUMBER", "DIFFICULTY", "GASLIMIT", "GAS", "RETURNDATASIZE"]
+
+def available():
+    return numpy is not None
+
+# 256-bit words as arrays of four uint64 limbs, the least significant first
+def to_limbs(values):
+    limbs = numpy.zeros((len(values), 4), dtype=numpy.uint64)
+    for i, value in enumerate(values):
+        for j in range(4):
+            limbs[i, j] = (value >> (64 * j)) & MASK64
+    return limbs
+
+def from_limbs(limbs):
+    return [sum(int(row[j]) << (64 * j) for j in range(4)) for row in limbs]
+
+def add_limbs(a, b):
+    result = numpy.empty_like(a)
+    carry = numpy.zeros(len(a), dtype=numpy.uint64)
+    for i in range(4):
+        partial = a[:, i] + b[:, i]
+        overflow = partial < a[:, i]
+        total = partial + carry
+        overflow |= total < partial
+        result[:, i] = total
+        carry = overflow.astype(numpy.uint64)
+    return result
+
+def sub_limbs(a, b):
+    result = numpy.empty_like(a)
+    borrow = numpy.zeros(len(a), dtype=numpy.uint64)
+    for i in range(4):
+        partial = a[:, i] - b[:, i]
+        underflow = a[:, i] < b[:, i]
+        total = partial - borrow
+        underflow |= partial < borrow
+        result[:, i] = total
+        borrow = underflow.astype(numpy.uint64)
+    return result
+
+# Unsigned a < b and a == b of each pair of words
+def compare_limbs(a, b):
+    less = numpy.zeros(len(a), dtype=bool)
+    decided = numpy.zeros(len(a), dtype=bool)
+    for i in range(3, -1, -1):
+        less |= ~decided & (a[:, i] < b[:, i])
+        decided |= a[:, i] != b[:, i]
+    return less, ~decided
+
+def flip_sign(a):
+    flipped = a.copy()
+    flipped[:, 3] ^= numpy.uint64(1 << 63)
+    return flipped
+
+def bool_limbs(flags):
+    limbs = numpy.zeros((len(flags), 4), dtype=numpy.uint64)
+    limbs[:, 0] = flags.astype(numpy.uint64)
+    return limbs
+
+# Big-endian 32-byte words to limbs, and back
+def bytes_to_limbs(data):
+    words = data.reshape(len(data), 4, 8).astype(numpy.uint64)
+    value = numpy.zeros((len(data), 4), dtype=numpy.uint64)
+    for j in range(8):
+        value = (value << numpy.uint64(8)) | words[:, :, j]
+    return value[:, ::-1].copy()
+
+def limbs_to_bytes(limbs):
+    words = limbs[:, ::-1]
+    data = numpy.empty((len(limbs), 4, 8), dtype=numpy.uint8)
+    for j in range(8):
+        data[:, :, 7 - j] = (words >> numpy.uint64(8 * j)) & numpy.uint64(0xff)
+    return data.reshape(len(limbs), 32)
+
+# Words that are small enough to be an offset below limit: (offsets, mask of the valid ones)
+def small_values(limbs, limit):
+    offsets = limbs[:, 0]
+    valid = (limbs[:, 1:] == 0).all(axis=1) & (offsets <= numpy.uint64(limit))
+    return numpy.where(valid, offsets, 0).astype(numpy.int64), valid
+
+# The state of a batch of inputs executed in lock-step, one lane per input
+class LaneBatch:
+    def __init__(self, inputs):
+        n = len(inputs)
+        self.inputs = inputs
+        self.pc = numpy.zeros(n, dtype=numpy.int64)
+        self.active = numpy.ones(n, dtype=bool)
+        self.stack = numpy.zeros((n, STACK_LIMIT, 4), dtype=numpy.uint64)
+        self.sp = numpy.zeros(n, dtype=numpy.int64)
+        self.memory = numpy.zeros((n, MEMORY_LIMIT + 32), dtype=numpy.uint8)
+        self.msize = numpy.zeros(n, dtype=numpy.int64)
+        self.storage = [{} for _ in range(n)]
+        self.calldata = numpy.zeros((n, CALLDATA_LIMIT + 32), dtype=numpy.uint8)
+        self.calldata_size = numpy.zeros(n, dtype=numpy.int64)
+        for i, data in enumerate(inputs):
+            data = bytearray(data["calldata"])
+            self.calldata[i, :len(data)] = numpy.frombuffer(bytes(data), dtype=numpy.uint8)
+            self.calldata_size[i] = len(data)
+        self.callvalue = to_limbs([data["callvalue"] for data in inputs])
+        self.caller = to_limbs([data["caller"] for data in inputs])
+
+    def pop(self, lanes):
+        self.sp[lanes] -= 1
+        return self.stack[lanes, self.sp[lanes]].copy()
+
+    def push(self, lanes, limbs):
+        self.stack[lanes, self.sp[lanes]] = limbs
+        self.sp[lanes] += 1
+
+    def peek(self, lanes, depth):
+        return self.stack[lanes, self.sp[lanes] - depth].copy()
+
+# Executes a contract concretely on batches of random and dictionary-based inputs
+# (calldata, callvalue and caller) before the symbolic execution. The inputs of a batch
+# run in lock-step: at every step, all the inputs at the same pc execute its instruction
+# at once on NumPy arrays. The branches taken are recorded with the inputs that took
+# them, as witnesses that the symbolic execution can check against a path condition
+# instead of asking the solver.
+class ConcreteFuzzer:
+    def __init__(self, instructions, branch_blocks, seed=0):
+        self.code = {}
+        self.next_pc = {}
+        self.dictionary = set([0, 1, 2, 32, MASK256] + CALLERS)
+        self.selectors = set()
+        addresses = sorted(instructions.keys())
+        for i, address in enumerate(addresses):
+            parts = instructions[address].split()
+            argument = int(parts[1], 16) if len(parts) > 1 and parts[0].startswith("PUSH") else None
+            self.code[address] = (parts[0], argument)
+            self.next_pc[address] = addresses[i + 1] if i + 1 < len(addresses) else address + 1
+            if argument is not None:
+                self.dictionary.add(argument)
+                if parts[0] == "PUSH4" and i + 1 < len(addresses) and instructions[addresses[i + 1]].split() == ["EQ"]:
+                    self.selectors.add(argument)
+        self.jumpdests = numpy.array(sorted(address for address in self.code if self.code[address][0] == "JUMPDEST"), dtype=numpy.int64)
+        self.branch_blocks = branch_blocks  # pc of the JUMPI ending a block -> start of the block
+        self.random = random.Random(seed)
+        self.covered = set()
+        self.edges = {}  # (block, successor) -> inputs that took the branch
+        self.inputs = 0
+        self.time = 0.0
+        self.lookups = 0
+        self.witnessed = 0
+
+    def generate_inputs(self, count):
+        dictionary = sorted(self.dictionary)
+        selectors = sorted(self.selectors)
+        inputs = []
+        for _ in range(count):
+            if selectors and self.random.random() < 0.9:
+                selector = self.random.choice(selectors)
+            else:
+                selector = self.random.getrandbits(32)
+            data = binascii.unhexlify('%08x' % selector)
+            for _ in range(self.random.randint(0, CALLDATA_WORDS)):
+                choice = self.random.random()
+                if choice < 0.6:
+                    word = self.random.choice(dictionary)
+                elif choice < 0.8:
+                    word = self.random.randint(0, 255)
+                else:
+                    word = self.random.getrandbits(256)
+                data += binascii.unhexlify('%064x' % word)
+            inputs.append({"calldata": data, "callvalue": self.random.choice(VALUES), "caller": self.random.choice(CALLERS)})
+        return inputs
+
+    def run(self, count, batch_size, max_steps):
+        start = time.time()
+        while self.inputs < count:
+            inputs = self.generate_inputs(min(batch_size, count - self.inputs))
+            self.run_batch(LaneBatch(inputs), max_steps)
+            self.inputs += len(inputs)
+        self.time += time.time() - start
+
+    def run_batch(self, batch, max_steps):
+        for _ in range(max_steps):
+            if not batch.active.any():
+                break
+            # the inputs at the smallest pc go first, the others catch up with them
+            pc = int(batch.pc[batch.active].min())
+            lanes = numpy.nonzero(batch.active & (batch.pc == pc))[0]
+            if pc not in self.code:
+                batch.active[lanes] = False
+                continue
+            self.covered.add(pc)
+            opcode, argument = self.code[pc]
+            try:
+                _, pops, pushes = get_opcode(opcode)
+            except ValueError:
+                batch.active[lanes] = False
+                continue
+            valid = (batch.sp[lanes] >= pops) & (batch.sp[lanes] - pops + pushes <= STACK_LIMIT)
+            batch.active[lanes[~valid]] = False
+            lanes = lanes[valid]
+            if len(lanes):
+                self.execute(batch, lanes, pc, opcode, argument)
+
+    def halt(self, batch, lanes, valid):
+        batch.active[lanes[~valid]] = False
+        return lanes[valid]
+
+    def execute(self, batch, lanes, pc, opcode, argument):
+        batch.pc[lanes] = self.next_pc[pc]
+        if opcode in TERMINAL_OPCODES:
+            batch.active[lanes] = False
+        elif opcode.startswith("PUSH"):
+            batch.push(lanes, numpy.repeat(to_limbs([argument]), len(lanes), axis=0))
+        elif opcode.startswith("DUP"):
+            batch.push(lanes, batch.peek(lanes, int(opcode[3:])))
+        elif opcode.startswith("SWAP"):
+            depth = int(opcode[4:]) + 1
+            top = batch.peek(lanes, 1)
+            batch.stack[lanes, batch.sp[lanes] - 1] = batch.peek(lanes, depth)
+            batch.stack[lanes, batch.sp[lanes] - depth] = top
+        elif opcode.startswith("LOG"):
+            batch.sp[lanes] -= int(opcode[3:]) + 2
+        elif opcode == "POP":
+            batch.sp[lanes] -= 1
+        elif opcode == "JUMPDEST":
+            pass
+        elif opcode in ("ADD", "SUB", "AND", "OR", "XOR", "LT", "GT", "SLT", "SGT", "EQ"):
+            a = batch.pop(lanes)
+            b = batch.pop(lanes)
+            if opcode == "ADD":
+                result = add_limbs(a, b)
+            elif opcode == "SUB":
+                result = sub_limbs(a, b)
+            elif opcode == "AND":
+                result = a & b
+            elif opcode == "OR":
+                result = a | b
+            elif opcode == "XOR":
+                result = a ^ b
+            elif opcode == "EQ":
+                result = bool_limbs(compare_limbs(a, b)[1])
+            else:
+                if opcode in ("SLT", "SGT"):
+                    a, b = flip_sign(a), flip_sign(b)
+                if opcode in ("GT", "SGT"):
+                    a, b = b, a
+                result = bool_limbs(compare_limbs(a, b)[0])
+            batch.push(lanes, result)
+        elif opcode == "ISZERO":
+            batch.push(lanes, bool_limbs((batch.pop(lanes) == 0).all(axis=1)))
+        elif opcode == "NOT":
+            batch.push(lanes, ~batch.pop(lanes))
+        elif opcode in INT_OPERATIONS:
+            operands, function = INT_OPERATIONS[opcode]
+            values = [from_limbs(batch.pop(lanes)) for _ in range(operands)]
+            batch.push(lanes, to_limbs([function(*arguments) & MASK256 for arguments in zip(*values)]))
+        elif opcode in ZERO_OPCODES:
+            batch.push(lanes, numpy.zeros((len(lanes), 4), dtype=numpy.uint64))
+        elif opcode in ("BALANCE", "EXTCODESIZE", "BLOCKHASH"):
+            batch.pop(lanes)
+            batch.push(lanes, numpy.zeros((len(lanes), 4), dtype=numpy.uint64))
+        elif opcode in ("CALLER", "ORIGIN"):
+            batch.push(lanes, batch.caller[lanes])
+        elif opcode == "CALLVALUE":
+            batch.push(lanes, batch.callvalue[lanes])
+        elif opcode == "CALLDATASIZE":
+            batch.push(lanes, to_limbs([int(size) for size in batch.calldata_size[lanes]]))
+        elif opcode == "PC":
+            batch.push(lanes, numpy.repeat(to_limbs([pc]), len(lanes), axis=0))
+        elif opcode == "MSIZE":
+            batch.push(lanes, to_limbs([int(size) for size in batch.msize[lanes]]))
+        elif opcode == "CALLDATALOAD":
+            offsets, valid = small_values(batch.pop(lanes), CALLDATA_LIMIT)
+            indexes = offsets[:, None] + numpy.arange(32)
+            data = batch.calldata[lanes[:, None], indexes]
+            data[~valid] = 0
+            batch.push(lanes, bytes_to_limbs(data))
+        elif opcode in ("MLOAD", "MSTORE", "MSTORE8"):
+            offsets, valid = small_values(batch.pop(lanes), MEMORY_LIMIT - 32)
+            values = batch.pop(lanes)[valid] if opcode != "MLOAD" else None
+            offsets = offsets[valid]
+            lanes = self.halt(batch, lanes, valid)
+            batch.msize[lanes] = numpy.maximum(batch.msize[lanes], (offsets + (1 if opcode == "MSTORE8" else 32) + 31) // 32 * 32)
+            if opcode == "MSTORE8":
+                batch.memory[lanes, offsets] = (values[:, 0] & numpy.uint64(0xff)).astype(numpy.uint8)
+            else:
+                indexes = offsets[:, None] + numpy.arange(32)
+                if opcode == "MLOAD":
+                    batch.push(lanes, bytes_to_limbs(batch.memory[lanes[:, None], indexes]))
+                else:
+                    batch.memory[lanes[:, None], indexes] = limbs_to_bytes(values)
+        elif opcode == "JUMP":
+            targets, valid = small_values(batch.pop(lanes), max(self.code))
+            valid &= numpy.isin(targets, self.jumpdests)
+            lanes = self.halt(batch, lanes, valid)
+            batch.pc[lanes] = targets[valid]
+        elif opcode == "JUMPI":
+            targets, valid = small_values(batch.pop(lanes), max(self.code))
+            taken = ~(batch.pop(lanes) == 0).all(axis=1)
+            valid = ~taken | (valid & numpy.isin(targets, self.jumpdests))
+            lanes = self.halt(batch, lanes, valid)
+            successors = numpy.where(taken[valid], targets[valid], self.next_pc[pc])
+            batch.pc[lanes] = successors
+            self.record_branches(batch, lanes, pc, successors)
+        else:
+            self.execute_per_input(batch, lanes, opcode)
+
+    # Instructions on variable-length data or on the storage, one input at a time
+    def execute_per_input(self, batch, lanes, opcode):
+        for lane in lanes:
+            lane_index = numpy.array([lane])
+            if opcode == "SLOAD":
+                key = from_limbs(batch.pop(lane_index))[0]
+                batch.push(lane_index, to_limbs([batch.storage[lane].get(key, 0)]))
+            elif opcode == "SSTORE":
+                key = from_limbs(batch.pop(lane_index))[0]
+                batch.storage[lane][key] = from_limbs(batch.pop(lane_index))[0]
+            elif opcode == "SHA3":
+                offset, size = [from_limbs(batch.pop(lane_index))[0] for _ in range(2)]
+                if offset + size > MEMORY_LIMIT:
+                    batch.active[lane] = False
+                    continue
+                try:
+                    from keccak_cache import get_keccak_cache
+                    value = get_keccak_cache().keccak(batch.memory[lane, offset:offset + size].tobytes())
+                except ImportError:
+                    batch.active[lane] = False
+                    continue
+                batch.push(lane_index, to_limbs([value]))
+            elif opcode in ("CALLDATACOPY", "CODECOPY", "RETURNDATACOPY", "EXTCODECOPY"):
+                if opcode == "EXTCODECOPY":
+                    batch.pop(lane_index)
+                memory_offset, data_offset, size = [from_limbs(batch.pop(lane_index))[0] for _ in range(3)]
+                if size == 0:
+                    continue
+                if opcode != "CALLDATACOPY" or memory_offset + size > MEMORY_LIMIT or data_offset > CALLDATA_LIMIT:
+                    batch.active[lane] = False
+                    continue
+                data = numpy.zeros(size, dtype=numpy.uint8)
+                available = batch.calldata[lane, data_offset:CALLDATA_LIMIT + 32][:size]
+                data[:len(available)] = available
+                batch.memory[lane, memory_offset:memory_offset + size] = data
+            elif opcode in ("CALL", "CALLCODE", "DELEGATECALL", "STATICCALL", "CREATE", "CREATE2"):
+                _, pops, _ = get_opcode(opcode)
+                batch.sp[lane] -= pops
+                # calls succeed, contracts cannot be created
+                batch.push(lane_index, to_limbs([0 if opcode.startswith("CREATE") else 1]))
+            else:
+                batch.active[lane] = False
+
+    def record_branches(self, batch, lanes, pc, successors):
+        block = self.branch_blocks.get(pc)
+        if block is None:
+            return
+        for successor in numpy.unique(successors):
+            witnesses = self.edges.setdefault((block, int(successor)), [])
+            for lane in lanes[successors == successor][:MAX_WITNESSES - len(witnesses)]:
+                witnesses.append(batch.inputs[lane])
+
+    # True when an input that took the branch from block to successor satisfies the constraints
+    def is_witnessed(self, block, successor, constraints, data_positions):
+        witnesses = self.edges.get((block, successor))
+        if not witnesses:
+            return False
+        self.lookups += 1
+        if any(constraint is False for constraint in constraints):
+            return False
+        constraints = [constraint for constraint in constraints if is_expr(constraint)]
+        if not constraints:
+            self.witnessed += 1
+            return True
+        formula = And(constraints)
+        variables = get_free_vars(formula)
+        if variables is None:
+            return False
+        for witness in witnesses:
+            substitutions = [(variable, BitVecVal(witness_value(str(variable), witness, data_positions), variable.size())) for variable in variables]
+            if is_true(simplify(substitute(formula, *substitutions))):
+                self.witnessed += 1
+                return True
+        return False
+
+    def get_stats(self):
+        return {"lookups": self.lookups, "witnessed": self.witnessed}
+
+    def merge_stats(self, stats):
+        self.lookups += stats["lookups"]
+        self.witnessed += stats["witnessed"]
+
+    def get_report(self, instructions):
+        return {
+            "inputs": self.inputs,
+            "time": str(round(self.time, 2)),
+            "covered_instructions": len(self.covered),
+            "coverage": str(round(float(len(self.covered)) / instructions * 100, 1)) if instructions else "0.0",
+            "branches": len(self.edges),
+            "witness_lookups": self.lookups,
+            "witnessed_branches": self.witnessed
+        }
+
+# Value of a symbolic variable under a witness: the inputs, a balance for the caller and
+# zero for everything else, as in the concrete execution
+def witness_value(name, witness, data_positions):
+    if name == "Iv":
+        return witness["callvalue"]
+    if name in ("Is", "tx.origin"):
+        return witness["caller"]
+    if name == "init_Is":
+        return WITNESS_BALANCE
+    if name == "Id_size":
+        return len(witness["calldata"])
+    if name in data_positions:
+        position = data_positions[name]
+        data = bytearray(witness["calldata"][position:position + 32])
+        data += bytearray(32 - len(data))
+        return int(binascii.hexlify(bytes(data)), 16)
+    return 0
+
+# Bit-vector variables of an expression, None when it has variables of other sorts
+def get_free_vars(expression):
+    variables = []
+    visited = set()
+    pending = [expression]
+    while pending:
+        current = pending.pop()
+        if current.get_id() in visited:
+            continue
+        visited.add(current.get_id())
+        if is_const(current) and current.decl().kind() == Z3_OP_UNINTERPRETED:
+            if not is_bv(current):
+                return None
+            variables.append(current)
+        elif is_app(current):
+            pending.extend(current.children())
+        else:
+            return None
+    return variables
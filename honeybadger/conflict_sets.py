@@ -0,0 +1,74 @@
+import logging
+
+from z3 import *
+
+import global_params
+
+from solver_factory import make_solver
+
+log = logging.getLogger(__name__)
+
+# Conflict sets kept for each block, the oldest are dropped first
+MAX_CONFLICTS_PER_BLOCK = 16
+
+# Conflict sets learned from the unsat cores of infeasible branches. A conflict set is a
+# small subset of the constraints of a branch that is unsatisfiable on its own, so any
+# later state whose constraints towards the same block contain it is infeasible too,
+# without asking the solver. Constraints are compared by AST id: z3 shares structurally
+# equal terms, and the conflict sets keep their terms alive so that ids are not reused.
+class ConflictSets:
+    def __init__(self):
+        self.conflicts = {}  # block -> [(ids of the conflict set, terms of the conflict set)]
+        self.learned = 0
+        self.pruned = 0
+        self.lookups = 0
+
+    # True when the constraints of a branch towards block contain a learned conflict set
+    def prune(self, block, constraints):
+        self.lookups += 1
+        if self._match(block, constraints):
+            self.pruned += 1
+            return True
+        return False
+
+    def _match(self, block, constraints):
+        if block not in self.conflicts:
+            return False
+        ids = set(constraint.get_id() for constraint in constraints if is_expr(constraint))
+        return any(conflict <= ids for conflict, _ in self.conflicts[block])
+
+    # Asks the solver for an unsat core of the constraints of an infeasible branch towards block
+    def learn(self, block, constraints):
+        constraints = [constraint for constraint in constraints if is_expr(constraint)]
+        if not constraints or self._match(block, constraints):
+            return
+        configuration = "qf_bv" if global_params.SOLVER_CONFIGURATION == "tactic" else None
+        solver = make_solver(configuration=configuration, plain=True)
+        tracked = {}
+        for i, constraint in enumerate(constraints):
+            literal = Bool("conflict_" + str(i))
+            tracked[literal.get_id()] = constraint
+            solver.assert_and_track(constraint, literal)
+        try:
+            if solver.check() != unsat:
+                return
+            core = [tracked[literal.get_id()] for literal in solver.unsat_core() if literal.get_id() in tracked]
+        except Z3Exception as e:
+            log.debug("Could not compute an unsat core: " + str(e))
+            return
+        if not core:
+            return
+        conflicts = self.conflicts.setdefault(block, [])
+        conflicts.append((frozenset(constraint.get_id() for constraint in core), core))
+        if len(conflicts) > MAX_CONFLICTS_PER_BLOCK:
+            conflicts.pop(0)
+        self.learned += 1
+
+    def get_stats(self):
+        return {"learned": self.learned, "pruned": self.pruned, "lookups": self.lookups}
+
+    # Conflict sets hold AST ids of this process, a forked worker only reports its counts
+    def merge_stats(self, stats):
+        self.learned += stats["learned"]
+        self.pruned += stats["pruned"]
+        self.lookups += stats["lookups"]
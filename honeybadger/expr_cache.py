@@ -0,0 +1,66 @@
+import logging
+import collections
+
+from z3 import *
+
+log = logging.getLogger(__name__)
+
+# Process-wide memo table of the simplified forms of z3 expressions. Expressions are
+# keyed by their AST id, which z3 keeps unique for structurally identical expressions
+# as long as they are alive: every entry holds a reference to its expression, so an id
+# cannot be reused while it is in the table. The table is bounded, the least recently
+# used entries are evicted first.
+class ExprCache:
+    def __init__(self, size):
+        self.size = size
+        self.simplified = collections.OrderedDict()  # AST id -> (expression, simplified expression)
+        self.hits = 0
+        self.misses = 0
+
+    def simplify(self, expr):
+        if not is_expr(expr):
+            return expr
+        if not self.size:
+            return simplify(expr)
+        key = expr.get_id()
+        if key in self.simplified:
+            self.hits += 1
+            entry = self.simplified.pop(key)
+        else:
+            self.misses += 1
+            entry = (expr, simplify(expr))
+            if len(self.simplified) >= self.size:
+                self.simplified.popitem(last=False)
+        self.simplified[key] = entry
+        # a simplified expression is its own simplified form
+        simplified_key = entry[1].get_id()
+        if simplified_key != key and simplified_key not in self.simplified and len(self.simplified) < self.size:
+            self.simplified[simplified_key] = (entry[1], entry[1])
+        return entry[1]
+
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def merge_stats(self, stats):
+        self.hits += stats["hits"]
+        self.misses += stats["misses"]
+
+    def hit_rate(self):
+        if not self.hits + self.misses:
+            return 0.0
+        return float(self.hits) / (self.hits + self.misses) * 100
+
+_expr_cache = None
+
+# The cache of the process, created on first use
+def get_expr_cache():
+    global _expr_cache
+
+    if _expr_cache is None:
+        import global_params
+        _expr_cache = ExprCache(global_params.EXPR_CACHE_SIZE)
+    return _expr_cache
+
+# Memoized z3 simplify(), used by the engine and the detectors
+def simplify_expr(expr):
+    return get_expr_cache().simplify(expr)
@@ -0,0 +1,123 @@
+import logging
+
+from z3 import *
+from z3.z3core import Z3_mk_numeral, Z3_mk_bvadd, Z3_mk_bvsub, Z3_mk_bvand, Z3_mk_bvor, Z3_mk_bvxor, \
+    Z3_mk_bvnot, Z3_mk_eq, Z3_mk_bvult, Z3_mk_bvugt, Z3_mk_bvslt, Z3_mk_bvsgt, Z3_mk_ite
+
+log = logging.getLogger(__name__)
+
+# Thin builders of 256-bit expressions for the hot opcodes. They call the z3 C API
+# directly instead of going through the coercions and checks of the z3.py operators.
+# Operands are 256-bit bit-vectors of the main context or Python integers. When the
+# C API rejects the operands (e.g. bit-vectors of another size), the builders fall
+# back to the z3.py operators, which raise the usual errors.
+
+# Constants that are built once
+COMMON_CONSTANTS = [0, 1, 2, 32, 0xff, 2**160 - 1, 2**256 - 1]
+# Maximum number of other constants and of variables kept
+CACHE_SIZE = 4096
+
+_ctx = None
+_sort = None
+_constants = {}
+_variables = {}
+
+def _init():
+    global _ctx
+    global _sort
+
+    _ctx = main_ctx()
+    _sort = BitVecSort(256, _ctx)
+    for value in COMMON_CONSTANTS:
+        _constants[value] = BitVecNumRef(Z3_mk_numeral(_ctx.ref(), str(value), _sort.ast), _ctx)
+
+def bv_val(value):
+    if _ctx is None:
+        _init()
+    constant = _constants.get(value)
+    if constant is None:
+        constant = BitVecNumRef(Z3_mk_numeral(_ctx.ref(), str(value), _sort.ast), _ctx)
+        if len(_constants) < CACHE_SIZE:
+            _constants[value] = constant
+    return constant
+
+# The 256-bit variable called name, the same object is returned for the same name
+def bv_var(name):
+    variable = _variables.get(name)
+    if variable is None:
+        if len(_variables) >= CACHE_SIZE:
+            _variables.clear()
+        variable = BitVec(name, 256)
+        _variables[name] = variable
+    return variable
+
+def _ast(value):
+    if isinstance(value, (int, long)):
+        return bv_val(value % 2**256).as_ast()
+    return value.as_ast()
+
+def _binary(mk, a, b, result):
+    if _ctx is None:
+        _init()
+    try:
+        return result(mk(_ctx.ref(), _ast(a), _ast(b)), _ctx)
+    except (Z3Exception, AttributeError):
+        return None
+
+def bv_add(a, b):
+    computed = _binary(Z3_mk_bvadd, a, b, BitVecRef)
+    return a + b if computed is None else computed
+
+def bv_sub(a, b):
+    computed = _binary(Z3_mk_bvsub, a, b, BitVecRef)
+    return a - b if computed is None else computed
+
+def bv_and(a, b):
+    computed = _binary(Z3_mk_bvand, a, b, BitVecRef)
+    return a & b if computed is None else computed
+
+def bv_or(a, b):
+    computed = _binary(Z3_mk_bvor, a, b, BitVecRef)
+    return a | b if computed is None else computed
+
+def bv_xor(a, b):
+    computed = _binary(Z3_mk_bvxor, a, b, BitVecRef)
+    return a ^ b if computed is None else computed
+
+# (~a) & (2**256 - 1), as built by the NOT handler
+def bv_not(a):
+    if _ctx is None:
+        _init()
+    try:
+        return BitVecRef(Z3_mk_bvand(_ctx.ref(), Z3_mk_bvnot(_ctx.ref(), _ast(a)), _constants[2**256 - 1].as_ast()), _ctx)
+    except (Z3Exception, AttributeError):
+        return (~a) & (2**256 - 1)
+
+def bv_eq(a, b):
+    computed = _binary(Z3_mk_eq, a, b, BoolRef)
+    return a == b if computed is None else computed
+
+def bv_ult(a, b):
+    computed = _binary(Z3_mk_bvult, a, b, BoolRef)
+    return ULT(a, b) if computed is None else computed
+
+def bv_ugt(a, b):
+    computed = _binary(Z3_mk_bvugt, a, b, BoolRef)
+    return UGT(a, b) if computed is None else computed
+
+def bv_slt(a, b):
+    computed = _binary(Z3_mk_bvslt, a, b, BoolRef)
+    return a < b if computed is None else computed
+
+def bv_sgt(a, b):
+    computed = _binary(Z3_mk_bvsgt, a, b, BoolRef)
+    return a > b if computed is None else computed
+
+# If(condition, 1, 0), the result of the comparison opcodes
+def bool_to_bv(condition):
+    if _ctx is None:
+        _init()
+    try:
+        return BitVecRef(Z3_mk_ite(_ctx.ref(), condition.as_ast(), _constants[1].as_ast(), _constants[0].as_ast()), _ctx)
+    except (Z3Exception, AttributeError):
+        return If(condition, BitVecVal(1, 256), BitVecVal(0, 256))
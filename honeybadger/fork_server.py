@@ -0,0 +1,227 @@
+import os
+import sys
+import errno
+import pickle
+import select
+import signal
+import time
+import logging
+
+from z3 import *
+from z3.z3util import get_vars
+
+log = logging.getLogger(__name__)
+
+# Seconds a worker is given to serialize and send its records after the global timeout
+REPORT_GRACE = 10
+
+# Size of the chunks read from (and written to) a worker pipe
+CHUNK_SIZE = 65536
+
+# Forks worker processes at JUMPI choice points. The children inherit the
+# already built CFG, the z3 context and the path state through the copy-on-write
+# pages of the parent, explore one branch and report their findings back over a
+# pipe as compact serialized records. Linux (or any POSIX system with fork) only.
+class ForkServer:
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.is_worker = False
+        self.channel = None
+        self.workers = {}   # pid -> (read fd, received chunks)
+        self.finished = []  # raw payloads of workers that have exited
+        self.forked = 0
+
+    def can_fork(self):
+        # Workers explore their subtree sequentially, only the root process forks
+        if self.is_worker or not hasattr(os, "fork"):
+            return False
+        self.poll()
+        return len(self.workers) < self.max_workers
+
+    # Returns 0 in the child and the pid of the child in the parent
+    def fork(self):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            for fd, _ in self.workers.values():
+                os.close(fd)
+            self.workers = {}
+            self.finished = []
+            self.is_worker = True
+            self.channel = write_fd
+            return 0
+        os.close(write_fd)
+        self.workers[pid] = (read_fd, [])
+        self.forked += 1
+        return pid
+
+    # Sends the records returned by collect() to the parent and terminates the worker
+    def report_and_exit(self, collect):
+        status = 0
+        try:
+            data = serialize(collect())
+            view = memoryview(data)
+            while len(view):
+                written = os.write(self.channel, view[:CHUNK_SIZE])
+                view = view[written:]
+            os.close(self.channel)
+        except Exception as e:
+            log.debug("Worker failed to report: " + str(e))
+            status = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+    # Drains every worker pipe that is readable, without blocking
+    def poll(self, timeout=0):
+        if not self.workers:
+            return
+        fds = dict((fd, pid) for pid, (fd, _) in self.workers.items())
+        try:
+            readable, _, _ = select.select(fds.keys(), [], [], timeout)
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                return
+            raise
+        for fd in readable:
+            pid = fds[fd]
+            chunk = os.read(fd, CHUNK_SIZE)
+            if chunk:
+                self.workers[pid][1].append(chunk)
+            else:
+                os.close(fd)
+                _, chunks = self.workers.pop(pid)
+                self._reap(pid)
+                if chunks:
+                    self.finished.append("".join(chunks))
+
+    # Waits for the outstanding workers, killing those that do not report in time
+    def join(self, timeout):
+        deadline = time.time() + max(timeout, 0) + REPORT_GRACE
+        while self.workers and time.time() < deadline:
+            self.poll(min(1.0, max(deadline - time.time(), 0)))
+        for pid in self.workers.keys():
+            fd, _ = self.workers.pop(pid)
+            log.debug("Killing unresponsive worker " + str(pid))
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+            os.close(fd)
+            self._reap(pid)
+
+    def _reap(self, pid):
+        try:
+            os.waitpid(pid, 0)
+        except OSError:
+            pass
+
+    # Returns the records reported by the finished workers and forgets them
+    def collect(self):
+        payloads = []
+        for data in self.finished:
+            try:
+                payloads.append(deserialize(data))
+            except Exception as e:
+                log.debug("Dropping unreadable worker records: " + str(e))
+        self.finished = []
+        return payloads
+
+########################################################
+#                 Record serialization                 #
+########################################################
+
+# z3 expressions cannot be pickled. They are replaced by an index into a table of
+# (SMT-LIB2 s-expression, sort) pairs, and all the free variables are declared once
+# per payload so that the parent can rebuild the whole table with a single parse.
+
+def _encode_sort(sort):
+    if sort.kind() == Z3_BV_SORT:
+        return ("bv", sort.size())
+    if sort.kind() == Z3_BOOL_SORT:
+        return ("bool",)
+    if sort.kind() == Z3_ARRAY_SORT:
+        return ("array", _encode_sort(sort.domain()), _encode_sort(sort.range()))
+    raise TypeError("Unsupported sort: " + str(sort))
+
+def _decode_sort(sort):
+    if sort[0] == "bv":
+        return BitVecSort(sort[1])
+    if sort[0] == "bool":
+        return BoolSort()
+    return ArraySort(_decode_sort(sort[1]), _decode_sort(sort[2]))
+
+def serialize(obj):
+    state = {"exprs": [], "index": {}, "vars": {}}
+    encoded = _encode(obj, state)
+    return pickle.dumps((encoded, state["exprs"], state["vars"]), pickle.HIGHEST_PROTOCOL)
+
+def _encode(obj, state):
+    if isinstance(obj, (int, long, float, bool, str, unicode)) or obj is None:
+        return obj
+    if is_expr(obj):
+        key = obj.get_id()
+        if key not in state["index"]:
+            for var in get_vars(obj):
+                state["vars"][var.decl().name()] = _encode_sort(var.sort())
+            state["index"][key] = len(state["exprs"])
+            state["exprs"].append((obj.sexpr(), _encode_sort(obj.sort())))
+        return ("__z3__", state["index"][key])
+    if isinstance(obj, dict):
+        return ("__dict__", [(_encode(key, state), _encode(value, state)) for key, value in obj.items()])
+    if isinstance(obj, list):
+        return ("__list__", [_encode(value, state) for value in obj])
+    if isinstance(obj, tuple):
+        return ("__tuple__", [_encode(value, state) for value in obj])
+    if isinstance(obj, (set, frozenset)):
+        return ("__set__", [_encode(value, state) for value in obj])
+    if hasattr(obj, "__dict__"):
+        return ("__obj__", obj.__class__, _encode(obj.__dict__, state))
+    raise TypeError("Cannot serialize " + str(type(obj)))
+
+def deserialize(data):
+    encoded, exprs, variables = pickle.loads(data)
+    return _decode(encoded, _parse_exprs(exprs, variables))
+
+def _parse_exprs(exprs, variables):
+    if not exprs:
+        return []
+    decls = {}
+    for name in variables:
+        decls[name] = Const(name, _decode_sort(variables[name]))
+    script = []
+    for i, (sexpr, sort) in enumerate(exprs):
+        name = "__hb_expr_" + str(i)
+        decls[name] = Const(name, _decode_sort(sort))
+        script.append("(assert (= |" + name + "| " + sexpr + "))")
+    parsed = parse_smt2_string("\n".join(script), decls=decls)
+    if isinstance(parsed, AstVector):
+        equalities = [parsed[i] for i in range(len(parsed))]
+    elif len(exprs) == 1:
+        equalities = [parsed]
+    else:
+        equalities = parsed.children()
+    return [equality.arg(1) for equality in equalities]
+
+def _decode(obj, exprs):
+    if not isinstance(obj, tuple):
+        return obj
+    tag = obj[0]
+    if tag == "__z3__":
+        return exprs[obj[1]]
+    if tag == "__dict__":
+        return dict((_decode(key, exprs), _decode(value, exprs)) for key, value in obj[1])
+    if tag == "__list__":
+        return [_decode(value, exprs) for value in obj[1]]
+    if tag == "__tuple__":
+        return tuple(_decode(value, exprs) for value in obj[1])
+    if tag == "__set__":
+        return set(_decode(value, exprs) for value in obj[1])
+    if tag == "__obj__":
+        instance = obj[1].__new__(obj[1])
+        instance.__dict__.update(_decode(obj[2], exprs))
+        return instance
+    return obj
@@ -23,6 +23,13 @@ USE_GLOBAL_BLOCKCHAIN = 0
 # Take state data from state.json to speed up the symbolic execution
 INPUT_STATE = 0
 
+# File of the input state
+STATE_FILE = "state.json"
+
+# Execute the transactions of the state file (one input state or a list of them) with
+# concrete values instead of the symbolic execution
+CONCRETE_EXECUTION = 0
+
 # CFG = 1 means that we create a control flow graph and store it as .dot file
 CFG = 0
 
@@ -31,3 +38,121 @@ RESULTS_DIR = "results/"
 
 # Analyze bytecode or source code (default is source code = 0)
 BYTECODE = 0
+
+# Number of worker processes forked at JUMPI choice points (0 = explore sequentially)
+FORK_WORKERS = 0
+
+# Number of solver threads, each with its own z3 context (0 = solve on the main thread)
+SOLVER_THREADS = 0
+
+# Split the global timeout into budgets for each function of the dispatcher
+FUNCTION_BUDGETS = 0
+
+# Total number of paths shared out between the functions when FUNCTION_BUDGETS is set (0 = unlimited)
+PATH_BUDGET = 0
+
+# Order in which the states are explored: "dfs" (depth first), "coverage" (towards uncovered code)
+# or "directed" (towards CALL, DELEGATECALL and SELFDESTRUCT)
+SEARCH_STRATEGY = "dfs"
+
+# Do not explore branches that can only end in a REVERT without touching storage or value
+PRUNE_IRRELEVANT_SINKS = 0
+
+# Model memory and storage at symbolic addresses with z3 arrays instead of fresh variables
+SYMBOLIC_ARRAYS = 0
+
+# Maximum number of values a symbolic address is concretized to when SYMBOLIC_ARRAYS is set
+CONCRETIZATION_BOUND = 4
+
+# Concretize the variables of the classes CONCRETIZABLE_VARS in the expressions larger than
+# this many terms, with their value in a model of the path condition (0 = never)
+CONCRETIZATION_SIZE = 0
+
+# Classes of variables the concretization policy may replace by a value, among gas,
+# timestamp, blockhash, coinbase, number, difficulty and gaslimit
+CONCRETIZABLE_VARS = ["gas", "timestamp", "blockhash", "coinbase"]
+
+# Maximum number of concrete Keccak-256 hashes kept in the cache shared by all the paths
+KECCAK_CACHE_SIZE = 65536
+
+# File holding the precomputed mapping slots keccak(key . slot), built on first use ("" = no table)
+KECCAK_TABLE_FILE = ""
+
+# Keys 0..KECCAK_TABLE_KEYS-1 and slots 0..KECCAK_TABLE_SLOTS-1 covered by the precomputed table
+KECCAK_TABLE_KEYS = 256
+KECCAK_TABLE_SLOTS = 32
+
+# Use the solver to refine the gas of SSTORE and CALL with symbolic operands, when the upper bound of
+# the gas of the path could exceed GAS_LIMIT (0 = always use the cost interval)
+GAS_SOLVER_REFINEMENT = 1
+
+# Analysis passes run during symbolic execution: "gas" (needed by GAS_LIMIT), "reentrancy",
+# "money_flow", "time_dependency" and "honeypot" (needed by the honeypot heuristics)
+ANALYSIS_PASSES = ["gas", "honeypot"]
+
+# Maximum number of expressions kept by the simplify() memo table (0 = no memoization)
+EXPR_CACHE_SIZE = 100000
+
+# Check queries on narrower bit-vectors for the variables that are only read through masks and extracts
+NARROW_WIDTHS = 0
+
+# Solver used for all the queries: "default" (generic z3 solver), "qf_bv" (solver for the
+# QF_BV logic) or "tactic" (the SOLVER_TACTICS pipeline)
+SOLVER_CONFIGURATION = "qf_bv"
+
+# Tactics applied in sequence by the "tactic" solver configuration
+SOLVER_TACTICS = ["simplify", "solve-eqs", "bit-blast", "sat"]
+
+# Additional parameters set on the solvers and on the tactic pipeline, e.g. {"random_seed": 0}
+SOLVER_PARAMS = {}
+
+# Directory where every query checked by a solver is written as an SMT-LIB2 file ("" = no capture)
+CAPTURE_QUERIES_DIR = ""
+
+# Race the queries that are not answered within PORTFOLIO_THRESHOLD ms across processes,
+# one per configuration of portfolio.PORTFOLIO_CONFIGURATIONS
+PORTFOLIO = 0
+
+# Timeout in ms of the first check of a query, before it is raced
+PORTFOLIO_THRESHOLD = 200
+
+# Timeout in ms of each process of a race
+PORTFOLIO_TIMEOUT = 10000
+
+# Choose the timeout of each query from the observed latency of its call site and size
+# (see adaptive_timeout.py) instead of always using TIMEOUT
+ADAPTIVE_TIMEOUTS = 0
+
+# Queries of a site and size observed before their timeout is shortened
+ADAPTIVE_WARMUP = 8
+
+# Timeout of a cheap site, as a multiple of its slowest answered query
+ADAPTIVE_FACTOR = 4
+
+# Bounds in ms of the adaptive timeouts (the budget of the heuristic sites grows up to ADAPTIVE_MAX_TIMEOUT)
+ADAPTIVE_MIN_TIMEOUT = 50
+ADAPTIVE_MAX_TIMEOUT = 16000
+
+# SQLite database caching the results of the solver queries across runs and processes ("" = no cache)
+QUERY_CACHE_FILE = ""
+
+# Maximum number of queries kept in the database, the least recently used are evicted
+QUERY_CACHE_SIZE = 1000000
+
+# Learn conflict sets from the unsat cores of infeasible branches, and decide the branches
+# whose constraints contain one of them without the solver
+UNSAT_CORES = 0
+
+# Decide the branch conditions that intervals and known bits settle without the solver
+ABSTRACT_DOMAIN = 1
+
+# Execute the contract concretely on random inputs before the symbolic execution, and use
+# the inputs as witnesses of the feasibility of the branches they took (requires NumPy)
+FUZZ_PREPASS = 0
+
+# Inputs executed by the concrete pre-pass, and inputs executed in lock-step
+FUZZ_INPUTS = 1024
+FUZZ_BATCH_SIZE = 256
+
+# Instructions executed for a batch of inputs before it is stopped
+FUZZ_MAX_STEPS = 20000
@@ -15,6 +15,9 @@ from bs4 import BeautifulSoup # For fetching source code from address.
 
 from source_map import SourceMap    # custom module for managing source code mappings or relationships between different representations of code.
 from utils import run_command       # custom module containing utility functions used throughout the program.
+from search_strategy import SEARCH_STRATEGIES   # custom module with the orders in which states can be explored.
+from analysis import ANALYSIS_PASSES            # custom module with the analyses run during symbolic execution.
+from solver_factory import SOLVER_CONFIGURATIONS  # custom module creating the solvers used for the queries.
 from HTMLParser import HTMLParser   # Provides a parser for HTML documents, allowing for parsing and extracting data from HTML strings or files.
 
 
@@ -238,6 +241,27 @@ def remove_temporary_file(path):
         except:
             pass
 
+# This function parses the name=value parameters of the solvers (e.g. random_seed=1,auto_config=false)
+def parse_solver_params(value):
+    params = {}
+    for param in value.split(","):
+        if not param.strip():
+            continue
+        if "=" not in param:
+            raise ValueError(param)
+        name, value = [part.strip() for part in param.split("=", 1)]
+        if value.lower() in ("true", "false"):
+            params[name] = value.lower() == "true"
+        else:
+            try:
+                params[name] = int(value)
+            except ValueError:
+                try:
+                    params[name] = float(value)
+                except ValueError:
+                    params[name] = value
+    return params
+
 def main():
     global args
 
@@ -273,6 +297,61 @@ def main():
             "--debug", help="Display debug information.", action="store_true")
     parser.add_argument(
         "-c", "--cfg", help="Create control flow graph and store as .dot file.", action="store_true")
+    parser.add_argument("-fw", "--fork-workers", help="Fork up to this many worker processes at JUMPI choice points (Linux only, default "+str(global_params.FORK_WORKERS)+").",
+                        action="store", dest="fork_workers", type=int)
+    parser.add_argument("-sth", "--solver-threads", help="Check independent solver queries on this many threads (default "+str(global_params.SOLVER_THREADS)+").",
+                        action="store", dest="solver_threads", type=int)
+    parser.add_argument("-fb", "--function-budgets", help="Give each function of the contract its own share of the global timeout.", action="store_true")
+    parser.add_argument("-pb", "--path-budget", help="Total number of paths shared out between the functions when function budgets are enabled (default "+str(global_params.PATH_BUDGET)+" = unlimited).",
+                        action="store", dest="path_budget", type=int)
+    parser.add_argument("-ss", "--search-strategy", help="Order in which states are explored (default "+global_params.SEARCH_STRATEGY+").",
+                        action="store", dest="search_strategy", choices=SEARCH_STRATEGIES)
+    parser.add_argument("-ps", "--prune-sinks", help="Do not explore branches that can only end in a REVERT without touching storage or value.", action="store_true")
+    parser.add_argument("-sa", "--symbolic-arrays", help="Model memory and storage at symbolic addresses with Z3 arrays.", action="store_true")
+    parser.add_argument("-cb", "--concretization-bound", help="Concretize symbolic addresses that can take at most this many values (default "+str(global_params.CONCRETIZATION_BOUND)+").",
+                        action="store", dest="concretization_bound", type=int)
+    parser.add_argument("-ngr", "--no-gas-refinement", help="Do not query the solver for the gas of SSTORE and CALL with symbolic operands, bound it with an interval instead.", action="store_true")
+    parser.add_argument("-nw", "--narrow-widths", help="Check queries on narrower bit-vectors for the variables only read through masks and extracts.", action="store_true")
+    parser.add_argument("-sc", "--solver-configuration", help="Solver used for the queries (default "+global_params.SOLVER_CONFIGURATION+").",
+                        action="store", dest="solver_configuration", choices=SOLVER_CONFIGURATIONS)
+    parser.add_argument("-stp", "--solver-tactics", help="Comma separated tactics of the tactic solver configuration (default "+",".join(global_params.SOLVER_TACTICS)+").",
+                        action="store", dest="solver_tactics", type=str)
+    parser.add_argument("-spr", "--solver-params", help="Comma separated name=value parameters set on the solvers, e.g. random_seed=1.",
+                        action="store", dest="solver_params", type=str)
+    parser.add_argument("-cq", "--capture-queries", help="Write every solver query to this directory as an SMT-LIB2 file, for replay_queries.py.",
+                        action="store", dest="capture_queries", type=str)
+    parser.add_argument("-pf", "--portfolio", help="Race the hard solver queries across processes running different configurations.", action="store_true")
+    parser.add_argument("-pft", "--portfolio-threshold", help="Time in ms after which a query is raced (default "+str(global_params.PORTFOLIO_THRESHOLD)+").",
+                        action="store", dest="portfolio_threshold", type=int)
+    parser.add_argument("-pfto", "--portfolio-timeout", help="Timeout in ms of each process of a race (default "+str(global_params.PORTFOLIO_TIMEOUT)+").",
+                        action="store", dest="portfolio_timeout", type=int)
+    parser.add_argument("-at", "--adaptive-timeouts", help="Choose the timeout of each solver query from the observed latency of its call site.", action="store_true")
+    parser.add_argument("-amt", "--adaptive-max-timeout", help="Largest timeout in ms given to the queries of the heuristics (default "+str(global_params.ADAPTIVE_MAX_TIMEOUT)+").",
+                        action="store", dest="adaptive_max_timeout", type=int)
+    parser.add_argument("-qc", "--query-cache", help="SQLite database caching the results of the solver queries across runs.",
+                        action="store", dest="query_cache", type=str)
+    parser.add_argument("-qcs", "--query-cache-size", help="Maximum number of queries kept in the query cache (default "+str(global_params.QUERY_CACHE_SIZE)+").",
+                        action="store", dest="query_cache_size", type=int)
+    parser.add_argument("-uc", "--unsat-cores", help="Learn conflict sets from the unsat cores of infeasible branches and decide later branches with them.", action="store_true")
+    parser.add_argument("-csz", "--concretization-size", help="Concretize the variables of the concretizable classes in the expressions larger than this many terms (default "+str(global_params.CONCRETIZATION_SIZE)+", 0 = never).",
+                        action="store", dest="concretization_size", type=int)
+    parser.add_argument("-cv", "--concretizable-vars", help="Comma separated classes of variables that may be concretized, among "+", ".join(sorted(symExec.CONCRETIZABLE_VARS))+" (default "+",".join(global_params.CONCRETIZABLE_VARS)+").",
+                        action="store", dest="concretizable_vars", type=str)
+    parser.add_argument("-nad", "--no-abstract-domain", help="Check every branch with the solver, even when intervals and known bits decide it.", action="store_true")
+    parser.add_argument("-fz", "--fuzz-prepass", help="Execute the contract concretely on random inputs first, to decide the branches they take without the solver (requires NumPy).", action="store_true")
+    parser.add_argument("-fzi", "--fuzz-inputs", help="Number of inputs of the concrete pre-pass (default "+str(global_params.FUZZ_INPUTS)+").",
+                        action="store", dest="fuzz_inputs", type=int)
+    parser.add_argument("-ce", "--concrete-execution", help="Execute the transactions of the state file concretely instead of symbolically (the file holds one complete input state or a list of them).", action="store_true")
+    parser.add_argument("-sf", "--state-file", help="File of the input state (default "+global_params.STATE_FILE+").",
+                        action="store", dest="state_file", type=str)
+    parser.add_argument("-ap", "--analysis-passes", help="Comma separated analysis passes to run, among "+", ".join(ANALYSIS_PASSES)+" (default "+",".join(global_params.ANALYSIS_PASSES)+").",
+                        action="store", dest="analysis_passes", type=str)
+    parser.add_argument("-ecs", "--expr-cache-size", help="Number of expressions kept by the simplify() memo table (default "+str(global_params.EXPR_CACHE_SIZE)+", 0 = no memoization).",
+                        action="store", dest="expr_cache_size", type=int)
+    parser.add_argument("-kcs", "--keccak-cache-size", help="Number of concrete Keccak-256 hashes kept in the cache (default "+str(global_params.KECCAK_CACHE_SIZE)+").",
+                        action="store", dest="keccak_cache_size", type=int)
+    parser.add_argument("-kt", "--keccak-table", help="File holding the precomputed mapping slots, built if it does not exist.",
+                        action="store", dest="keccak_table", type=str)
     
     print("")
     print("                                    ___,,___                                                        ")
@@ -303,9 +382,20 @@ def main():
     # Set global arguments for symbolic execution, based on cmd line args passed
     global_params.USE_GLOBAL_BLOCKCHAIN = 1 if args.globalblockchain else 0
     global_params.INPUT_STATE = 1 if args.state else 0
+    global_params.CONCRETE_EXECUTION = 1 if args.concrete_execution else 0
     global_params.STORE_RESULT = 1 if args.json else 0
     global_params.DEBUG_MODE = 1 if args.debug else 0
     global_params.CFG = 1 if args.cfg else 0
+    global_params.FUNCTION_BUDGETS = 1 if args.function_budgets else 0
+    global_params.PRUNE_IRRELEVANT_SINKS = 1 if args.prune_sinks else 0
+    global_params.SYMBOLIC_ARRAYS = 1 if args.symbolic_arrays else 0
+    global_params.GAS_SOLVER_REFINEMENT = 0 if args.no_gas_refinement else 1
+    global_params.NARROW_WIDTHS = 1 if args.narrow_widths else 0
+    global_params.PORTFOLIO = 1 if args.portfolio else 0
+    global_params.ADAPTIVE_TIMEOUTS = 1 if args.adaptive_timeouts else 0
+    global_params.UNSAT_CORES = 1 if args.unsat_cores else 0
+    global_params.ABSTRACT_DOMAIN = 0 if args.no_abstract_domain else 1
+    global_params.FUZZ_PREPASS = 1 if args.fuzz_prepass else 0
     global_params.BYTECODE = 1 if args.bytecode else 0
 
     if args.timeout:
@@ -318,6 +408,59 @@ def main():
         global_params.LOOP_LIMIT = args.loop_limit
     if args.global_timeout:
         global_params.GLOBAL_TIMEOUT = args.global_timeout
+    if args.fork_workers:
+        global_params.FORK_WORKERS = args.fork_workers
+    if args.solver_threads:
+        global_params.SOLVER_THREADS = args.solver_threads
+    if args.path_budget:
+        global_params.PATH_BUDGET = args.path_budget
+    if args.search_strategy:
+        global_params.SEARCH_STRATEGY = args.search_strategy
+    if args.concretization_bound:
+        global_params.CONCRETIZATION_BOUND = args.concretization_bound
+    if args.solver_configuration:
+        global_params.SOLVER_CONFIGURATION = args.solver_configuration
+    if args.solver_tactics:
+        global_params.SOLVER_TACTICS = [name.strip() for name in args.solver_tactics.split(",") if name.strip()]
+    if args.solver_params:
+        try:
+            global_params.SOLVER_PARAMS = parse_solver_params(args.solver_params)
+        except ValueError as e:
+            parser.error("solver parameter without a value: " + str(e))
+    if args.capture_queries:
+        global_params.CAPTURE_QUERIES_DIR = args.capture_queries
+    if args.portfolio_threshold:
+        global_params.PORTFOLIO_THRESHOLD = args.portfolio_threshold
+    if args.portfolio_timeout:
+        global_params.PORTFOLIO_TIMEOUT = args.portfolio_timeout
+    if args.adaptive_max_timeout:
+        global_params.ADAPTIVE_MAX_TIMEOUT = args.adaptive_max_timeout
+    if args.query_cache:
+        global_params.QUERY_CACHE_FILE = args.query_cache
+    if args.query_cache_size:
+        global_params.QUERY_CACHE_SIZE = args.query_cache_size
+    if args.concretization_size:
+        global_params.CONCRETIZATION_SIZE = args.concretization_size
+    if args.concretizable_vars:
+        global_params.CONCRETIZABLE_VARS = [name.strip() for name in args.concretizable_vars.split(",") if name.strip()]
+        for name in global_params.CONCRETIZABLE_VARS:
+            if name not in symExec.CONCRETIZABLE_VARS:
+                parser.error("unknown variable class: " + name)
+    if args.state_file:
+        global_params.STATE_FILE = args.state_file
+    if args.fuzz_inputs:
+        global_params.FUZZ_INPUTS = args.fuzz_inputs
+    if args.analysis_passes:
+        global_params.ANALYSIS_PASSES = [name.strip() for name in args.analysis_passes.split(",") if name.strip()]
+        for name in global_params.ANALYSIS_PASSES:
+            if name not in ANALYSIS_PASSES:
+                parser.error("unknown analysis pass: " + name)
+    if args.expr_cache_size is not None:
+        global_params.EXPR_CACHE_SIZE = args.expr_cache_size
+    if args.keccak_cache_size:
+        global_params.KECCAK_CACHE_SIZE = args.keccak_cache_size
+    if args.keccak_table:
+        global_params.KECCAK_TABLE_FILE = args.keccak_table
     
     # Configuring the logging system to display log messages with severity level INFO or higher to the console
     logging.basicConfig(level=logging.INFO)
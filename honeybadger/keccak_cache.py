@@ -0,0 +1,85 @@
+import os
+import sha3
+import pickle
+import logging
+import binascii
+import collections
+
+log = logging.getLogger(__name__)
+
+# Process-wide cache of the Keccak-256 hashes of concrete inputs. It is shared by all the
+# paths and all the contracts analyzed by the process. The least recently used hashes are
+# evicted first. An optional table of precomputed mapping slots keccak(key . slot) for
+# small keys and slots can be loaded from (and saved to) a file, so that the contracts of
+# a batch share it.
+class KeccakCache:
+    def __init__(self, size):
+        self.size = size
+        self.cache = collections.OrderedDict()
+        self.table = {}
+        self.hits = 0
+        self.table_hits = 0
+        self.misses = 0
+
+    def keccak(self, data):
+        if data in self.table:
+            self.table_hits += 1
+            return self.table[data]
+        if data in self.cache:
+            self.hits += 1
+            value = self.cache.pop(data)
+        else:
+            self.misses += 1
+            value = int(sha3.keccak_256(data).hexdigest(), 16)
+            if len(self.cache) >= self.size:
+                self.cache.popitem(last=False)
+        self.cache[data] = value
+        return value
+
+    def load_table(self, file_name, keys, slots):
+        if os.path.isfile(file_name):
+            try:
+                with open(file_name, 'rb') as f:
+                    table = pickle.load(f)
+                if table["keys"] >= keys and table["slots"] >= slots:
+                    self.table = table["hashes"]
+                    return
+            except Exception as e:
+                log.debug("Rebuilding the keccak table: " + str(e))
+        self.table = {}
+        for key in range(keys):
+            for slot in range(slots):
+                data = binascii.unhexlify('%064x%064x' % (key, slot))
+                self.table[data] = int(sha3.keccak_256(data).hexdigest(), 16)
+        try:
+            with open(file_name, 'wb') as f:
+                pickle.dump({"keys": keys, "slots": slots, "hashes": self.table}, f, pickle.HIGHEST_PROTOCOL)
+        except IOError as e:
+            log.debug("Could not save the keccak table: " + str(e))
+
+    def get_stats(self):
+        return {"hits": self.hits, "table_hits": self.table_hits, "misses": self.misses}
+
+    def merge_stats(self, stats):
+        self.hits += stats["hits"]
+        self.table_hits += stats["table_hits"]
+        self.misses += stats["misses"]
+
+    def hit_rate(self):
+        lookups = self.hits + self.table_hits + self.misses
+        if not lookups:
+            return 0.0
+        return float(self.hits + self.table_hits) / lookups * 100
+
+_keccak_cache = None
+
+# The cache of the process, created on first use
+def get_keccak_cache():
+    global _keccak_cache
+
+    if _keccak_cache is None:
+        import global_params
+        _keccak_cache = KeccakCache(global_params.KECCAK_CACHE_SIZE)
+        if global_params.KECCAK_TABLE_FILE:
+            _keccak_cache.load_table(global_params.KECCAK_TABLE_FILE, global_params.KECCAK_TABLE_KEYS, global_params.KECCAK_TABLE_SLOTS)
+    return _keccak_cache
@@ -0,0 +1,300 @@
+import logging
+import itertools
+
+from z3 import *
+
+log = logging.getLogger(__name__)
+
+# Number of memory addresses covered by one page
+PAGE_SIZE = 1024
+
+# Names of the arrays that replace the memory after it has been cleared
+havoc_ids = itertools.count(1)
+
+# Sparse mapping from concrete memory addresses to values, split into pages that are
+# shared between copies until one of the copies writes to them (copy-on-write)
+class Pages(object):
+    def __init__(self):
+        self.pages = {}
+        self.owned = set()  # pages that are not shared with another copy
+        self.size = 0
+
+    def copy(self):
+        pages = Pages()
+        pages.pages = dict(self.pages)
+        pages.size = self.size
+        # both copies have to copy a page before writing to it
+        self.owned = set()
+        return pages
+
+    def _writable_page(self, page_no):
+        if page_no not in self.owned:
+            self.pages[page_no] = dict(self.pages.get(page_no, {}))
+            self.owned.add(page_no)
+        return self.pages[page_no]
+
+    def __contains__(self, address):
+        page = self.pages.get(address // PAGE_SIZE)
+        return page is not None and address in page
+
+    def get(self, address, default=None):
+        page = self.pages.get(address // PAGE_SIZE)
+        if page is None:
+            return default
+        return page.get(address, default)
+
+    def set(self, address, value):
+        page = self._writable_page(address // PAGE_SIZE)
+        if address not in page:
+            self.size += 1
+        page[address] = value
+
+    def delete(self, address):
+        if address in self:
+            del self._writable_page(address // PAGE_SIZE)[address]
+            self.size -= 1
+
+    def items(self):
+        items = []
+        for page_no in sorted(self.pages):
+            items.extend(sorted(self.pages[page_no].items()))
+        return items
+
+    def clear(self):
+        self.pages = {}
+        self.owned = set()
+        self.size = 0
+
+# Memory of an execution path. Words are keyed by the address they were stored at,
+# like the dict that used to hold them, so that the heuristics can keep looking up the
+# words of the call records. Bytes written by MSTORE8 are kept in a separate layer.
+# The words that overlap a write at a concrete address are patched, and a word can also be
+# read at an address it was not stored at, as long as all of its bytes are known. Only
+# concrete words are patched, and only with concrete values: a symbolic patch would turn
+# the words the heuristics read (e.g. the function selector of a call) into
+# concatenations of extracts. The
+# addresses of the words are indexed by 32-byte slot, so that the words overlapping an
+# access are found without probing every address around it.
+# Values stored at a symbolic offset are kept apart, keyed by the offset expression:
+# they can only be read back at a structurally identical offset.
+# With the array backend, every word store is also applied to a z3 array, which is
+# shared by the copies of the memory. Once a word or a byte has been stored at a symbolic
+# offset, reads go through the array, which keeps track of the possible aliasing. The
+# array models the memory at the granularity of the words, like the rest of this class.
+# The symbolic patches are only applied to the array: the words they would change are
+# marked stale, and MLOAD reads them from the array, while the words keep the values the
+# heuristics look up.
+class Memory(object):
+    def __init__(self, array=None):
+        self.words = Pages()
+        self.slots = Pages()  # address // 32 -> addresses of the words stored in that slot
+        self.bytes = Pages()
+        self.stale = Pages()  # addresses of the words that are only up to date in the array
+        self.byte_only = 0  # number of byte addresses at which no word was stored
+        self.symbolic = {}
+        self.array = array
+        self.symbolic_stores = False
+
+    def copy(self):
+        memory = Memory(self.array)
+        memory.words = self.words.copy()
+        memory.slots = self.slots.copy()
+        memory.bytes = self.bytes.copy()
+        memory.stale = self.stale.copy()
+        memory.byte_only = self.byte_only
+        memory.symbolic = dict(self.symbolic)
+        memory.symbolic_stores = self.symbolic_stores
+        return memory
+
+    # True when a read may alias a word stored at a symbolic offset
+    def may_alias(self):
+        return self.array is not None and self.symbolic_stores
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    # dict interface, on the words
+
+    def __contains__(self, address):
+        if isinstance(address, (int, long)):
+            return address in self.words
+        return address in self.symbolic
+
+    def __getitem__(self, address):
+        if isinstance(address, (int, long)):
+            if address in self.words:
+                return self.words.get(address)
+        elif address in self.symbolic:
+            return self.symbolic[address]
+        raise KeyError(address)
+
+    def __setitem__(self, address, value):
+        if isinstance(address, (int, long)):
+            if address in self.bytes and address not in self.words:
+                self.byte_only -= 1
+            self.words.set(address, value)
+            self.stale.delete(address)
+            self._index(address)
+            self._store_in_array(address, value)
+        else:
+            self.symbolic[address] = value
+
+    # Number of addresses written to, like the keys of the dict: the bytes of MSTORE8 count
+    # unless a word was stored at the same address (memory gas is computed from it)
+    def __len__(self):
+        return self.words.size + self.byte_only + len(self.symbolic)
+
+    def keys(self):
+        return [address for address, _ in self.items()]
+
+    def items(self):
+        return self.words.items() + self.symbolic.items()
+
+    def clear(self):
+        self.words.clear()
+        self.slots.clear()
+        self.bytes.clear()
+        self.stale.clear()
+        self.byte_only = 0
+        self.symbolic = {}
+        if self.array is not None:
+            self.array = Array("mem_havoc_" + str(next(havoc_ids)), BitVecSort(256), BitVecSort(256))
+            self.symbolic_stores = False
+
+    def __eq__(self, other):
+        if not isinstance(other, Memory):
+            return False
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __str__(self):
+        return str(dict(self.items()))
+
+    __repr__ = __str__
+
+    # EVM semantics
+
+    # MSTORE: the bytes below the word and the overlapping parts of the stored words are overwritten
+    def store_word(self, address, value):
+        self._store_in_array(address, value)
+        if not isinstance(address, (int, long)):
+            self.symbolic[address] = value
+            if self.array is not None:
+                self.symbolic_stores = True
+            return
+        if self.bytes.size:
+            for byte_address in range(address, address + 32):
+                if byte_address in self.bytes:
+                    if byte_address not in self.words:
+                        self.byte_only -= 1
+                    self.bytes.delete(byte_address)
+        for word_address in self._overlapping(address, 32):
+            if word_address != address:
+                self._patch_word(word_address, value, address, 32)
+        self.words.set(address, value)
+        self.stale.delete(address)
+        self._index(address)
+
+    # MSTORE8: the least significant byte of value is stored. With the array backend, the
+    # word that starts at the byte is updated too, even if no word was stored there.
+    def store_byte(self, address, value):
+        byte = value & 0xff if isinstance(value, (int, long)) else Extract(7, 0, value)
+        if not isinstance(address, (int, long)):
+            self.symbolic[address] = value
+            if self.array is not None:
+                self.array = Store(self.array, address, self._patch(Select(self.array, address), 0, byte, 0, 1))
+                self.symbolic_stores = True
+            return
+        if address not in self.bytes and address not in self.words:
+            self.byte_only += 1
+        self.bytes.set(address, value)
+        overlapping = self._overlapping(address, 1)
+        for word_address in overlapping:
+            self._patch_word(word_address, byte, address, 1)
+        if self.array is not None and address not in overlapping:
+            self.array = Store(self.array, address, self._patch(Select(self.array, address), 0, byte, 0, 1))
+
+    # MLOAD: the word stored at address, or the word assembled from the concrete words and
+    # bytes that cover it. None when one of its bytes is unknown or symbolic.
+    def load_word(self, address):
+        if not isinstance(address, (int, long)):
+            return self.symbolic.get(address)
+        if address in self.words:
+            if address in self.stale:
+                return simplify(Select(self.array, address))
+            return self.words.get(address)
+        known = [None] * 32
+        for word_address in self._overlapping(address, 32):
+            word = self.words.get(word_address)
+            if not isinstance(word, (int, long)) or word_address in self.stale:
+                return None
+            for i in range(max(word_address, address), min(word_address, address) + 32):
+                known[i - address] = (word >> (8 * (31 - (i - word_address)))) & 0xff
+        for i in range(32 if self.bytes.size else 0):
+            byte = self.bytes.get(address + i)
+            if byte is not None:
+                if not isinstance(byte, (int, long)):
+                    return None
+                known[i] = byte & 0xff
+        if None in known:
+            return None
+        value = 0
+        for byte in known:
+            value = (value << 8) | byte
+        return value
+
+    def _index(self, address):
+        addresses = self.slots.get(address // 32, ())
+        if address not in addresses:
+            self.slots.set(address // 32, addresses + (address,))
+
+    # Addresses of the stored words that overlap the size bytes at address
+    def _overlapping(self, address, size):
+        overlapping = []
+        for slot in range(max(address - 31, 0) // 32, (address + size - 1) // 32 + 1):
+            for word_address in self.slots.get(slot, ()):
+                if address - 32 < word_address < address + size:
+                    overlapping.append(word_address)
+        return overlapping
+
+    def _store_in_array(self, address, value):
+        if self.array is not None:
+            self.array = Store(self.array, address, value)
+
+    # Overwrites the part of the word stored at word_address that the write of size bytes at address covers.
+    # When the word or the value is symbolic, the word is left as it is, and only the word of the array
+    # is patched with the backend.
+    def _patch_word(self, word_address, value, address, size):
+        word = self.words.get(word_address)
+        if isinstance(word, (int, long)) and isinstance(value, (int, long)) and word_address not in self.stale:
+            word = self._patch(word, word_address, value, address, size)
+            self.words.set(word_address, word)
+            self._store_in_array(word_address, word)
+        elif self.array is not None:
+            self._store_in_array(word_address, self._patch(Select(self.array, word_address), word_address, value, address, size))
+            self.stale.set(word_address, True)
+
+    # Overwrites the bytes of the word at word_address that overlap the size bytes of value
+    # at address. The result is symbolic when the word or the value is.
+    def _patch(self, word, word_address, value, address, size):
+        start = max(word_address, address)
+        end = min(word_address + 32, address + size)
+        if isinstance(word, (int, long)) and isinstance(value, (int, long)):
+            for i in range(start, end):
+                shift = 8 * (31 - (i - word_address))
+                byte = (value >> (8 * (size - 1 - (i - address)))) & 0xff
+                word = (word & ~(0xff << shift)) | (byte << shift)
+            return word
+        if isinstance(word, (int, long)):
+            word = BitVecVal(word, 256)
+        if isinstance(value, (int, long)):
+            value = BitVecVal(value, 8 * size)
+        parts = []
+        if start > word_address:
+            parts.append(Extract(255, 256 - 8 * (start - word_address), word))
+        parts.append(Extract(8 * (size - (start - address)) - 1, 8 * (size - (end - address)), value))
+        if end < word_address + 32:
+            parts.append(Extract(8 * (word_address + 32 - end) - 1, 0, word))
+        return simplify(Concat(*parts)) if len(parts) > 1 else simplify(parts[0])
@@ -0,0 +1,114 @@
+import logging
+import collections
+
+from z3 import *
+
+log = logging.getLogger(__name__)
+
+# Bit-width narrowing of the queries sent to the solver. A 256-bit variable whose
+# every occurrence is masked (v & 0xff..ff) or extracted (Extract(h, l, v)) only has
+# an effective width of the highest bit that is read. It is replaced by a narrower
+# variable, zero-extended back to 256 bits, which keeps the satisfiability of the
+# query while the upper bits become constants for the bit-blaster. Only the result
+# of the check is kept: models of a narrowed query are not models of the original one.
+class WidthNarrowing:
+    def __init__(self, size):
+        self.size = size
+        self.widths = collections.OrderedDict()  # constraint AST id -> (constraint, {name: (variable, width)})
+        self.queries = 0
+        self.narrowed_queries = 0
+        self.narrowed_variables = 0
+
+    def narrow(self, constraints):
+        flattened = []
+        self._flatten(constraints, flattened)
+        self.queries += 1
+        widths = {}
+        for constraint in flattened:
+            if not is_expr(constraint):
+                continue
+            for name, (variable, width) in self._constraint_widths(constraint).items():
+                if name not in widths or widths[name][1] < width:
+                    widths[name] = (variable, width)
+        substitutions = []
+        for name, (variable, width) in widths.items():
+            if width < 256:
+                substitutions.append((variable, ZeroExt(256 - width, BitVec(name + "_w" + str(width), width))))
+        if not substitutions:
+            return flattened
+        self.narrowed_queries += 1
+        self.narrowed_variables += len(substitutions)
+        return [substitute(constraint, *substitutions) if is_expr(constraint) else constraint for constraint in flattened]
+
+    # Number of low bits of each 256-bit variable that the constraint reads
+    def _constraint_widths(self, constraint):
+        if not self.size:
+            return self._infer_widths(constraint)
+        key = constraint.get_id()
+        if key in self.widths:
+            entry = self.widths.pop(key)
+        else:
+            entry = (constraint, self._infer_widths(constraint))
+            if len(self.widths) >= self.size:
+                self.widths.popitem(last=False)
+        self.widths[key] = entry
+        return entry[1]
+
+    def _infer_widths(self, constraint):
+        widths = {}
+        visited = set()
+        nodes = [constraint]
+        while nodes:
+            node = nodes.pop()
+            if not is_app(node) or node.get_id() in visited:
+                continue
+            visited.add(node.get_id())
+            kind = node.decl().kind()
+            for i in range(node.num_args()):
+                child = node.arg(i)
+                if not self._is_variable(child):
+                    nodes.append(child)
+                    continue
+                width = 256
+                if kind == Z3_OP_EXTRACT:
+                    width = node.decl().params()[0] + 1
+                elif kind == Z3_OP_BAND:
+                    masks = [node.arg(j).as_long() for j in range(node.num_args()) if j != i and is_bv_value(node.arg(j))]
+                    if masks:
+                        width = max(min(mask.bit_length() for mask in masks), 1)
+                name = child.decl().name()
+                if name not in widths or widths[name][1] < width:
+                    widths[name] = (child, width)
+        return widths
+
+    def _is_variable(self, expr):
+        return is_const(expr) and expr.decl().kind() == Z3_OP_UNINTERPRETED and is_bv(expr) and expr.size() == 256
+
+    def _flatten(self, constraints, flattened):
+        if isinstance(constraints, (list, tuple)):
+            for constraint in constraints:
+                self._flatten(constraint, flattened)
+        else:
+            flattened.append(constraints)
+
+    def get_stats(self):
+        return {"queries": self.queries, "narrowed_queries": self.narrowed_queries, "narrowed_variables": self.narrowed_variables}
+
+    def merge_stats(self, stats):
+        self.queries += stats["queries"]
+        self.narrowed_queries += stats["narrowed_queries"]
+        self.narrowed_variables += stats["narrowed_variables"]
+
+_width_narrowing = None
+
+# The narrowing of the process, created on first use
+def get_width_narrowing():
+    global _width_narrowing
+
+    if _width_narrowing is None:
+        import global_params
+        _width_narrowing = WidthNarrowing(global_params.EXPR_CACHE_SIZE)
+    return _width_narrowing
+
+def narrow_widths(constraints):
+    return get_width_narrowing().narrow(constraints)
@@ -0,0 +1,211 @@
+import Queue
+import re
+import logging
+import multiprocessing
+
+from z3 import *
+
+import global_params
+
+log = logging.getLogger(__name__)
+
+# Configurations raced on a hard query, each in its own process
+PORTFOLIO_CONFIGURATIONS = [
+    {"name": "qf_bv",          "configuration": "qf_bv",   "tactics": None, "seed": 0, "narrow": False},
+    {"name": "qf_bv-seed1",    "configuration": "qf_bv",   "tactics": None, "seed": 1, "narrow": False},
+    {"name": "qf_bv-narrowed", "configuration": "qf_bv",   "tactics": None, "seed": 0, "narrow": True},
+    {"name": "default",        "configuration": "default", "tactics": None, "seed": 0, "narrow": False},
+    {"name": "tactic",         "configuration": "tactic",  "tactics": ["simplify", "solve-eqs", "bit-blast", "sat"], "seed": 0, "narrow": False},
+]
+
+RESULTS = {"sat": sat, "unsat": unsat, "unknown": unknown}
+
+# Number of races and races won by each configuration
+stats = {"races": 0, "unknown": 0, "wins": {}}
+
+# The assertions of a parsed query: an AstVector in recent versions of z3, a conjunction
+# (or a single assertion) in older ones
+def _assertions(parsed):
+    if isinstance(parsed, AstVector):
+        return [parsed[i] for i in range(len(parsed))]
+    if is_and(parsed):
+        return parsed.children()
+    return [parsed]
+
+# The uninterpreted constants of the constraints by name, each shared term visited once
+def _constants(constraints):
+    constants = {}
+    visited = set()
+    todo = list(constraints)
+    while todo:
+        expression = todo.pop()
+        if expression.get_id() in visited:
+            continue
+        visited.add(expression.get_id())
+        if is_const(expression) and expression.decl().kind() == Z3_OP_UNINTERPRETED:
+            constants[expression.decl().name()] = expression
+        else:
+            todo.extend(expression.children())
+    return constants
+
+# The values of the constants of a model as (name, size, value), size being None for the
+# booleans, so that they can be sent to the parent process. The variables narrowed by the
+# configuration are given the name and width of the variable they replace. None when the
+# model interprets something else (e.g. an array), the parent has to search for it then.
+def _model_values(model, names):
+    values = []
+    for decl in model.decls():
+        value = model[decl]
+        if decl.arity() != 0:
+            return None
+        name = decl.name()
+        if is_bv_value(value):
+            narrowed = re.match(r"(.*)_w[0-9]+$", name)
+            if name not in names and narrowed and narrowed.group(1) in names:
+                values.append((narrowed.group(1), 256, value.as_long()))
+            else:
+                values.append((name, value.size(), value.as_long()))
+        elif is_true(value) or is_false(value):
+            values.append((name, None, is_true(value)))
+        else:
+            return None
+    return values
+
+# Runs in a forked process: checks the query under one configuration, and answers with the
+# values of the model when it is sat
+def _race(index, query, configuration, timeout, answers):
+    from solver_factory import make_solver
+    from narrowing import narrow_widths
+
+    try:
+        global_params.PORTFOLIO = 0
+        global_params.CAPTURE_QUERIES_DIR = ""
+        global_params.ADAPTIVE_TIMEOUTS = 0
+        global_params.QUERY_CACHE_FILE = ""
+        global_params.TIMEOUT = timeout
+        constraints = _assertions(parse_smt2_string(query))
+        names = _constants(constraints)
+        if configuration["narrow"]:
+            constraints = narrow_widths(constraints)
+        solver = make_solver(configuration=configuration["configuration"], tactics=configuration["tactics"])
+        if configuration["seed"] and configuration["configuration"] != "tactic":
+            solver.set("random_seed", configuration["seed"])
+        solver.add(constraints)
+        result = solver.check()
+        values = _model_values(solver.model(), names) if result == sat else None
+        answers.put((index, str(result), values))
+    except Exception:
+        answers.put((index, "unknown", None))
+
+# Builds the model of the winning process from its values, on the constants of the query
+def _make_model(values, constraints, ctx):
+    constants = _constants(constraints)
+    model = ModelRef(Z3_mk_model(ctx.ref()), ctx)
+    for name, size, value in values:
+        constant = constants.get(name)
+        if constant is None:
+            continue
+        value = BoolVal(value, ctx) if size is None else BitVecVal(value, size, ctx)
+        Z3_add_const_interp(ctx.ref(), model.model, constant.decl().ast, value.as_ast())
+    return model
+
+# Races the configurations of the portfolio on a query (SMT-LIB2 text). The first
+# configuration that answers sat or unsat wins and the other processes are killed.
+# Returns the result and, when it is sat, the values of the model of the winner.
+def race(query, timeout):
+    answers = multiprocessing.Queue()
+    processes = []
+    for index, configuration in enumerate(PORTFOLIO_CONFIGURATIONS):
+        process = multiprocessing.Process(target=_race, args=(index, query, configuration, timeout, answers))
+        process.daemon = True
+        process.start()
+        processes.append(process)
+    result = "unknown"
+    winner = None
+    values = None
+    try:
+        for _ in processes:
+            try:
+                # a process that crashed does not answer, give up a bit after the timeout
+                index, answer, values = answers.get(True, timeout / 1000.0 + 1)
+            except Queue.Empty:
+                break
+            if answer != "unknown":
+                result = answer
+                winner = PORTFOLIO_CONFIGURATIONS[index]["name"]
+                break
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+    log.debug("Portfolio race: " + result + (" from " + winner if winner else ""))
+    stats["races"] += 1
+    if winner is None:
+        stats["unknown"] += 1
+    else:
+        stats["wins"][winner] = stats["wins"].get(winner, 0) + 1
+    return RESULTS[result], values if result == "sat" else None
+
+# Solver that first checks a query with a short timeout, and races the portfolio on the
+# queries that do not finish in time. It shares the native solver of the solver it wraps.
+class PortfolioSolver(Solver):
+    def __init__(self, solver):
+        Solver.__init__(self, solver.solver, solver.ctx)
+        self.base = solver
+        self.raced = False  # the last result came from the portfolio, its model is raced_model
+        self.raced_model = None
+        self.budget = None  # timeout of the next query, chosen by an adaptive timeout policy
+
+    # Time the next check can take: the short check and then the race
+    def effective_timeout(self):
+        return self.budget or global_params.PORTFOLIO_TIMEOUT
+
+    def check(self, *assumptions):
+        self.raced = False
+        self.raced_model = None
+        budget = self.budget or global_params.PORTFOLIO_TIMEOUT
+        self.base.set("timeout", min(global_params.PORTFOLIO_THRESHOLD, budget))
+        try:
+            result = self.base.check(*assumptions)
+        finally:
+            self.base.set("timeout", global_params.TIMEOUT)
+        # a budget within the threshold has been spent by the short check already
+        if result == unknown and not assumptions and budget > global_params.PORTFOLIO_THRESHOLD:
+            result, values = race(self.to_smt2(), budget)
+            self.raced = result == sat
+            if values is not None:
+                self.raced_model = _make_model(values, self.assertions(), self.ctx)
+        return result
+
+    # None when the model of a raced query cannot be found again here
+    def model(self):
+        if self.raced and self.raced_model is not None:
+            return self.raced_model
+        if self.raced:
+            # the winning process could not hand over its model, search for it here
+            self.raced = False
+            self.base.set("timeout", global_params.PORTFOLIO_TIMEOUT)
+            try:
+                if self.base.check() != sat:
+                    return None
+            finally:
+                self.base.set("timeout", global_params.TIMEOUT)
+        return self.base.model()
+
+def get_stats():
+    return {"races": stats["races"], "unknown": stats["unknown"], "wins": dict(stats["wins"])}
+
+def merge_stats(other):
+    stats["races"] += other["races"]
+    stats["unknown"] += other["unknown"]
+    for name, wins in other["wins"].items():
+        stats["wins"][name] = stats["wins"].get(name, 0) + wins
+
+# Statistics of a forked worker, without what it inherited
+def diff_stats(current, inherited):
+    return {
+        "races": current["races"] - inherited["races"],
+        "unknown": current["unknown"] - inherited["unknown"],
+        "wins": dict((name, wins - inherited["wins"].get(name, 0)) for name, wins in current["wins"].items())
+    }
@@ -0,0 +1,198 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+from z3 import *
+
+import global_params
+
+log = logging.getLogger(__name__)
+
+# Inserts between two checks of the size of the database
+EVICTION_INTERVAL = 1000
+
+# Writes (stored results and uses of cached results) kept in memory and written in one
+# transaction, so that a check does not wait for the disk
+FLUSH_INTERVAL = 100
+
+# Fraction of the maximum size kept when the least recently used queries are evicted
+EVICTION_TARGET = 0.9
+
+# Result of a query for each result stored in the database
+RESULTS = {"sat": sat, "unsat": unsat, "unknown": unknown}
+
+# Disk-backed cache of solver results, shared by the runs and the processes of a batch.
+# A query is keyed by the hash of its sorted assertions and of a version string made of
+# the z3 version and the solver settings, so that changing them does not reuse stale
+# results. An unknown result is only reused by a check with a timeout that is not larger
+# than the one it was obtained with. The least recently used queries are evicted when
+# the database holds more than size queries. Writes are batched, flush() writes the
+# pending ones.
+class QueryCache:
+    def __init__(self, file_name, size, version):
+        self.file_name = file_name
+        self.size = size
+        self.version = version
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+        self.stored = {}  # key -> (result, timeout, time) of the results not written yet
+        self.used = {}    # key -> time of the uses not written yet
+        self.inserts = 0
+        self.hits = 0
+        self.misses = 0
+
+    # A connection cannot be shared with a forked worker, each process opens its own
+    def _connect(self):
+        if self.connection is None or self.pid != os.getpid():
+            if self.pid != os.getpid():
+                # the pending writes were inherited from the parent, which writes them itself
+                self.stored = {}
+                self.used = {}
+            self.connection = sqlite3.connect(self.file_name, timeout=30, check_same_thread=False)
+            self.pid = os.getpid()
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            # a crash can lose the last transactions, but not corrupt the database
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS queries (key TEXT PRIMARY KEY, result TEXT, timeout INTEGER, used REAL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS queries_used ON queries (used)")
+            self.connection.commit()
+        return self.connection
+
+    def key(self, assertions):
+        query = "\n".join(sorted(assertion.sexpr() for assertion in assertions))
+        return hashlib.sha1(self.version + "\n" + query).hexdigest()
+
+    def lookup(self, key, timeout):
+        with self.lock:
+            try:
+                connection = self._connect()
+                if key in self.stored:
+                    row = self.stored[key][:2]
+                else:
+                    row = connection.execute("SELECT result, timeout FROM queries WHERE key = ?", (key,)).fetchone()
+                if row is not None and (row[0] != "unknown" or row[1] >= timeout):
+                    self.used[key] = time.time()
+                    self._write_if_full(connection)
+                    self.hits += 1
+                    return RESULTS[row[0]]
+            except sqlite3.Error as e:
+                log.debug("Query cache lookup failed: " + str(e))
+            self.misses += 1
+            return None
+
+    def store(self, key, result, timeout):
+        with self.lock:
+            try:
+                connection = self._connect()
+                self.stored[key] = (str(result), timeout, time.time())
+                self._write_if_full(connection)
+            except sqlite3.Error as e:
+                log.debug("Query cache store failed: " + str(e))
+
+    # Writes the pending results and uses
+    def flush(self):
+        with self.lock:
+            if not self.stored and not self.used:
+                return
+            try:
+                self._write(self._connect())
+            except sqlite3.Error as e:
+                log.debug("Query cache flush failed: " + str(e))
+
+    def _write_if_full(self, connection):
+        if len(self.stored) + len(self.used) >= FLUSH_INTERVAL:
+            self._write(connection)
+
+    def _write(self, connection):
+        stored, used = self.stored, self.used
+        self.stored, self.used = {}, {}
+        connection.executemany("INSERT OR REPLACE INTO queries VALUES (?, ?, ?, ?)",
+                               [(key, result, timeout, used_time) for key, (result, timeout, used_time) in stored.items()])
+        connection.executemany("UPDATE queries SET used = ? WHERE key = ?", [(used_time, key) for key, used_time in used.items()])
+        connection.commit()
+        previous = self.inserts
+        self.inserts += len(stored)
+        if self.inserts // EVICTION_INTERVAL != previous // EVICTION_INTERVAL:
+            self._evict(connection)
+
+    def _evict(self, connection):
+        count = connection.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+        if count > self.size:
+            connection.execute("DELETE FROM queries WHERE key IN (SELECT key FROM queries ORDER BY used LIMIT ?)",
+                               (count - int(self.size * EVICTION_TARGET),))
+            connection.commit()
+
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def merge_stats(self, stats):
+        self.hits += stats["hits"]
+        self.misses += stats["misses"]
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return float(self.hits) / lookups * 100
+
+# Solver that answers the queries found in the cache, and stores the result of the
+# others. It shares the native solver of the solver it wraps. Unknown results are looked
+# up and stored with the timeout the wrapped solver actually gives the query, which an
+# adaptive timeout policy or the portfolio can make differ from TIMEOUT.
+class CachingSolver(Solver):
+    def __init__(self, solver, cache):
+        Solver.__init__(self, solver.solver, solver.ctx)
+        self.base = solver
+        self.cache = cache
+        self.cached = False  # the last result came from the cache, no model is available yet
+        self.site = None  # call site of the query, when it was issued by another thread
+
+    def check(self, *assumptions):
+        self.cached = False
+        if self.site and hasattr(self.base, "site"):
+            self.base.site = self.site
+        if assumptions:
+            return self.base.check(*assumptions)
+        key = self.cache.key(self.assertions())
+        timeout = get_effective_timeout(self.base)
+        result = self.cache.lookup(key, timeout)
+        if result is not None:
+            self.cached = result == sat
+            return result
+        result = self.base.check()
+        self.cache.store(key, result, getattr(self.base, "last_timeout", timeout))
+        return result
+
+    # None when the model of a cached query cannot be found within the timeout
+    def model(self):
+        if self.cached:
+            # the cache only holds results, the model is searched for here
+            self.cached = False
+            if self.base.check() != sat:
+                return None
+        return self.base.model()
+
+# Timeout of the next check of a solver, for the wrappers that choose their own
+def get_effective_timeout(solver):
+    if hasattr(solver, "effective_timeout"):
+        return solver.effective_timeout()
+    return global_params.TIMEOUT
+
+def get_version():
+    settings = [get_version_string(), global_params.SOLVER_CONFIGURATION, ",".join(global_params.SOLVER_TACTICS),
+                str(sorted(global_params.SOLVER_PARAMS.items())), str(global_params.SYMBOLIC_ARRAYS)]
+    return "|".join(settings)
+
+_query_cache = None
+
+# The cache of the process, created on first use
+def get_query_cache():
+    global _query_cache
+
+    if _query_cache is None:
+        _query_cache = QueryCache(global_params.QUERY_CACHE_FILE, global_params.QUERY_CACHE_SIZE, get_version())
+    return _query_cache
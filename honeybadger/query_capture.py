@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import hashlib
+import logging
+
+from z3 import *
+
+log = logging.getLogger(__name__)
+
+# Contract and pc of the instruction being executed, set by symExec while queries are captured
+contract = ""
+current_pc = None
+
+# Files of this module and of the helpers that only forward a check to the solver,
+# skipped when looking for the call site of a query
+FORWARDING_FILES = ("query_capture.py", "utils.py", "solver_service.py", "portfolio.py", "adaptive_timeout.py", "query_cache.py")
+FORWARDING_FUNCTIONS = ("branch_check_result", "submit_query", "check_all")
+
+# Solver that writes every query it checks to a directory as an SMT-LIB2 file. Files are
+# named by the hash of the query, so a query that is checked again is not written twice.
+# The header of a file records the contract, pc, call site, result and wall time of the
+# first check of the query.
+class CapturingSolver(Solver):
+    def __init__(self, solver, directory):
+        Solver.__init__(self, solver.solver, solver.ctx)
+        self.directory = directory
+        self.site = None  # call site of the query, when it was issued by another thread
+
+    def check(self, *assumptions):
+        start = time.time()
+        result = Solver.check(self, *assumptions)
+        elapsed = time.time() - start
+        try:
+            self.capture(result, elapsed)
+        except Exception as e:
+            log.debug("Could not capture a query: " + str(e))
+        return result
+
+    def capture(self, result, elapsed):
+        query = self.to_smt2()
+        file_name = os.path.join(self.directory, hashlib.sha1(query).hexdigest() + ".smt2")
+        if os.path.isfile(file_name):
+            return
+        header = [
+            "; contract: " + contract,
+            "; pc: " + str(current_pc),
+            "; site: " + (self.site or get_call_site()),
+            "; result: " + str(result),
+            "; time: " + str(elapsed)
+        ]
+        with open(file_name, 'w') as f:
+            f.write("\n".join(header) + "\n" + query)
+
+# Function and line that issued the query
+def get_call_site():
+    frame = sys._getframe(1)
+    while frame is not None:
+        file_name = os.path.basename(frame.f_code.co_filename)
+        if file_name not in FORWARDING_FILES and frame.f_code.co_name not in FORWARDING_FUNCTIONS:
+            return frame.f_code.co_name + ":" + str(frame.f_lineno)
+        frame = frame.f_back
+    return "unknown"
+
+# Metadata recorded in the header of a captured query
+def read_header(file_name):
+    header = {}
+    with open(file_name) as f:
+        for line in f:
+            if not line.startswith("; ") or ": " not in line[2:]:
+                break
+            key, value = line[2:].rstrip("\n").split(": ", 1)
+            header[key] = value
+    return header
@@ -0,0 +1,86 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Replays a corpus of captured solver queries (see --capture-queries) under different z3
+# settings, in parallel, and reports the latency distribution of each call site. The
+# corpus can first be captured from a directory of contracts, e.g. ../datasets/honeypots.
+#
+# Usage: python replay_queries.py [-c contracts directory] [-j processes] [-t timeout in ms] [queries directory]
+
+import os
+import sys
+import time
+import shlex
+import argparse
+import subprocess
+import multiprocessing
+
+import global_params
+
+from query_capture import read_header
+from benchmark_solver import CONFIGURATIONS, check
+
+PERCENTILES = [50, 90, 99]
+
+def capture(contracts_dir, queries_dir, global_timeout):
+    for file in sorted(os.listdir(contracts_dir)):
+        if not file.endswith(".sol") and not file.endswith(".bin"):
+            continue
+        cmd = 'python honeybadger.py -s '+os.path.join(contracts_dir, file)+' -cq '+queries_dir+' -glt '+str(global_timeout)
+        if file.endswith(".bin"):
+            cmd += ' -b'
+        print('Capturing the queries of ' + file)
+        subprocess.call(shlex.split(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+# Runs in a worker process: the result and time of one query under every configuration
+def replay(job):
+    file_name, timeout = job
+    from z3 import parse_smt2_file
+    global_params.TIMEOUT = timeout
+    query = parse_smt2_file(file_name)
+    return [check(query, configuration, tactics) for _, configuration, tactics in CONFIGURATIONS]
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("queries", nargs="?", default="queries", help="Directory of the captured queries.")
+    parser.add_argument("-c", "--contracts", help="Capture the queries of the contracts of this directory first.", dest="contracts")
+    parser.add_argument("-j", "--jobs", help="Number of processes replaying queries.", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("-t", "--timeout", help="Timeout of each query in ms (default "+str(global_params.TIMEOUT)+").", type=int, default=global_params.TIMEOUT)
+    parser.add_argument("-glt", "--global-timeout", help="Timeout of the analysis of each contract while capturing.", type=int, default=global_params.GLOBAL_TIMEOUT)
+    args = parser.parse_args()
+
+    if args.contracts:
+        if not os.path.isdir(args.queries):
+            os.makedirs(args.queries)
+        capture(args.contracts, args.queries, args.global_timeout)
+
+    files = sorted(os.path.join(args.queries, file) for file in os.listdir(args.queries) if file.endswith(".smt2"))
+    if not files:
+        print('No queries in ' + args.queries)
+        sys.exit(1)
+    sites = [read_header(file_name).get("site", "unknown") for file_name in files]
+
+    start = time.time()
+    pool = multiprocessing.Pool(args.jobs)
+    replays = pool.map(replay, [(file_name, args.timeout) for file_name in files])
+    pool.close()
+    pool.join()
+    print('%d queries replayed in %.2f s with %d processes, timeout %d ms' % (len(files), time.time() - start, args.jobs, args.timeout))
+
+    for i, (name, _, _) in enumerate(CONFIGURATIONS):
+        print('')
+        print(name)
+        print('%-36s %7s %10s %10s %10s %10s %8s' % ('Site', 'Queries', 'p50 (ms)', 'p90 (ms)', 'p99 (ms)', 'Max (ms)', 'Unknown'))
+        latencies = {}
+        unknown = {}
+        for site, results in zip(sites, replays):
+            result, elapsed = results[i]
+            latencies.setdefault(site, []).append(elapsed * 1000)
+            unknown[site] = unknown.get(site, 0) + (1 if result == "unknown" else 0)
+        for site in sorted(latencies, key=lambda site: -sum(latencies[site])):
+            values = latencies[site]
+            print('%-36s %7d %10.1f %10.1f %10.1f %10.1f %8d' % ((site, len(values)) + tuple(percentile(values, p) for p in PERCENTILES) + (max(values), unknown[site])))
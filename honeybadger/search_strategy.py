@@ -0,0 +1,167 @@
+import logging
+import collections
+
+log = logging.getLogger(__name__)
+
+# The frontier holds the states (Parameter objects) that still have to be
+# explored. The strategy decides which one is executed next.
+
+# Explores the most recently created state first. Successors are pushed in
+# reverse order of exploration, so the order is the one of the recursive DFS.
+class DepthFirstFrontier:
+    def __init__(self):
+        self.states = []
+
+    def __len__(self):
+        return len(self.states)
+
+    def push(self, params):
+        self.states.append(params)
+
+    def pop(self):
+        return self.states.pop()
+
+    def visit(self, block):
+        pass
+
+# Explores the state with the highest priority first, the priority of a state is
+# the one of its block. States are grouped by block, so a pop only evaluates the
+# distinct blocks of the frontier. Ties go to the most recent state, which keeps the
+# search depth first among states of equal priority.
+class PriorityFrontier:
+    def __init__(self, priority):
+        self.priority = priority  # block -> priority, compared with the other blocks of the frontier
+        self.states = {}   # block -> states waiting at that block
+        self.order = {}    # block -> when its latest state was pushed
+        self.size = 0
+        self.pushed = 0
+        self.covered = set()
+        self.visits = {}
+
+    def __len__(self):
+        return self.size
+
+    def push(self, params):
+        self.states.setdefault(params.block, []).append(params)
+        self.pushed += 1
+        self.order[params.block] = self.pushed
+        self.size += 1
+
+    def pop(self):
+        best = None
+        best_key = None
+        for block in self.states:
+            key = (self.priority(block), self.order[block])
+            if best is None or key > best_key:
+                best = block
+                best_key = key
+        states = self.states[best]
+        params = states.pop()
+        if not states:
+            del self.states[best]
+            del self.order[best]
+        self.size -= 1
+        return params
+
+    def visit(self, block):
+        self.visits[block] = self.visits.get(block, 0) + 1
+        if block not in self.covered:
+            self.covered.add(block)
+            self.invalidate()
+
+    # Called when a block is covered for the first time, new jump targets may have been found
+    def invalidate(self):
+        pass
+
+# Explores the state whose block can statically reach the most code that has not
+# been covered yet, down-weighted by the number of times its block has already been
+# executed.
+class CoverageGuidedFrontier(PriorityFrontier):
+    def __init__(self, successors, block_sizes):
+        PriorityFrontier.__init__(self, self.weighted_score)
+        self.successors = successors    # block -> statically known successor blocks
+        self.block_sizes = block_sizes  # block -> number of instructions
+        self.scores = {}                # block -> reachable uncovered instructions, until the coverage changes
+
+    def invalidate(self):
+        self.scores = {}
+
+    def weighted_score(self, block):
+        return float(self.score(block)) / (1 + self.visits.get(block, 0))
+
+    def score(self, block):
+        if block not in self.scores:
+            uncovered = 0
+            reached = set([block])
+            blocks = [block]
+            while blocks:
+                current = blocks.pop()
+                if current not in self.covered:
+                    uncovered += self.block_sizes.get(current, 0)
+                for successor in self.successors(current):
+                    if successor not in reached:
+                        reached.add(successor)
+                        blocks.append(successor)
+            self.scores[block] = uncovered
+        return self.scores[block]
+
+# Explores the state whose block is the closest (in CFG edges) to one of the target
+# blocks, e.g. the blocks that contain a CALL or a SELFDESTRUCT. States that cannot
+# reach a target are explored last, depth first.
+class DirectedFrontier(PriorityFrontier):
+    def __init__(self, successors, blocks, targets):
+        PriorityFrontier.__init__(self, self.negated_distance)
+        self.successors = successors  # block -> statically known successor blocks
+        self.blocks = blocks
+        self.targets = targets
+        self.distances = None         # block -> distance to the nearest target
+        self.predecessors = {}        # block -> blocks with an edge to it, as far as the distances know
+        self.known = {}               # block -> successors taken into account by the distances
+        self.executed = set()         # blocks executed since the last pop, their jumps may have new targets
+
+    def visit(self, block):
+        PriorityFrontier.visit(self, block)
+        self.executed.add(block)
+
+    def negated_distance(self, block):
+        if self.distances is None:
+            self.compute_distances()
+        elif self.executed:
+            self.update_distances()
+        return -self.distances.get(block, float("inf"))
+
+    # Breadth first search from the targets over the reversed CFG
+    def compute_distances(self):
+        for block in self.blocks:
+            self.known[block] = set(self.successors(block))
+            for successor in self.known[block]:
+                self.predecessors.setdefault(successor, []).append(block)
+        self.distances = dict((target, 0) for target in self.targets)
+        self.relax(collections.deque(self.targets))
+        self.executed = set()
+
+    # New edges can only shorten distances, so only the blocks that reach a target
+    # through a new edge and their predecessors are updated
+    def update_distances(self):
+        blocks = collections.deque()
+        for block in self.executed:
+            for successor in self.successors(block):
+                if successor in self.known.setdefault(block, set()):
+                    continue
+                self.known[block].add(successor)
+                self.predecessors.setdefault(successor, []).append(block)
+                if successor in self.distances and self.distances[successor] + 1 < self.distances.get(block, float("inf")):
+                    self.distances[block] = self.distances[successor] + 1
+                    blocks.append(block)
+        self.relax(blocks)
+        self.executed = set()
+
+    def relax(self, blocks):
+        while blocks:
+            current = blocks.popleft()
+            for predecessor in self.predecessors.get(current, []):
+                if self.distances[current] + 1 < self.distances.get(predecessor, float("inf")):
+                    self.distances[predecessor] = self.distances[current] + 1
+                    blocks.append(predecessor)
+
+SEARCH_STRATEGIES = ["dfs", "coverage", "directed"]
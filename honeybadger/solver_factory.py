@@ -0,0 +1,64 @@
+import logging
+
+from z3 import *
+
+import global_params
+
+from query_capture import CapturingSolver
+from portfolio import PortfolioSolver
+from adaptive_timeout import AdaptiveSolver
+from query_cache import CachingSolver, get_query_cache
+
+log = logging.getLogger(__name__)
+
+# All the queries of HoneyBadger are quantifier-free bit-vector formulas (with arrays when
+# the memory and storage are modeled with z3 arrays). The solvers are created here, in one
+# of these configurations:
+#   default: the generic z3 solver
+#   qf_bv:   the solver specialized for the QF_BV logic (QF_ABV with arrays)
+#   tactic:  the tactic pipeline SOLVER_TACTICS (QF_ABV solver with arrays, the bit-blaster
+#            does not handle them). Its timeout is fixed when the solver is created, so
+#            it is neither raced nor given adaptive timeouts.
+# The parameters SOLVER_PARAMS are set on every solver, or on the tactic pipeline.
+SOLVER_CONFIGURATIONS = ["default", "qf_bv", "tactic"]
+
+# A plain solver is not wrapped to capture, race, time or cache its queries, for the
+# queries that need the state of the solver itself, e.g. its unsat core
+def make_solver(ctx=None, configuration=None, tactics=None, plain=False):
+    if configuration is None:
+        configuration = global_params.SOLVER_CONFIGURATION
+    if tactics is None:
+        tactics = global_params.SOLVER_TACTICS
+    if configuration == "tactic" and not global_params.SYMBOLIC_ARRAYS:
+        pipeline = Then(*[Tactic(name, ctx) for name in tactics]) if len(tactics) > 1 else Tactic(tactics[0], ctx)
+        if global_params.SOLVER_PARAMS:
+            pipeline = With(pipeline, ctx=ctx, **global_params.SOLVER_PARAMS)
+        # the timeout of a tactic solver is set on the tactic
+        solver = TryFor(pipeline, global_params.TIMEOUT, ctx).solver()
+        return solver if plain else cache_results(capture_queries(solver))
+    if configuration in ("qf_bv", "tactic"):
+        solver = SolverFor("QF_ABV" if global_params.SYMBOLIC_ARRAYS else "QF_BV", ctx)
+    else:
+        solver = Solver(ctx=ctx)
+    solver.set("timeout", global_params.TIMEOUT)
+    for name, value in global_params.SOLVER_PARAMS.items():
+        solver.set(name, value)
+    if plain:
+        return solver
+    solver = capture_queries(solver)
+    # hard queries are raced across processes, only by the solvers of the main thread
+    if global_params.PORTFOLIO and ctx is None:
+        solver = PortfolioSolver(solver)
+    if global_params.ADAPTIVE_TIMEOUTS:
+        solver = AdaptiveSolver(solver)
+    return cache_results(solver)
+
+def capture_queries(solver):
+    if global_params.CAPTURE_QUERIES_DIR:
+        return CapturingSolver(solver, global_params.CAPTURE_QUERIES_DIR)
+    return solver
+
+def cache_results(solver):
+    if global_params.QUERY_CACHE_FILE:
+        return CachingSolver(solver, get_query_cache())
+    return solver
@@ -0,0 +1,138 @@
+import Queue
+import threading
+import logging
+
+from z3 import *
+from solver_factory import make_solver
+from query_capture import get_call_site
+
+log = logging.getLogger(__name__)
+
+# How often a waiting main thread wakes up, so that SIGALRM (global timeout) can still be delivered
+WAIT_INTERVAL = 0.05
+
+# Result of a query that has been submitted to the solver service
+class SolverFuture:
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._exception = None
+
+    def set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self._done.set()
+
+    def result(self):
+        while not self._done.is_set():
+            self._done.wait(WAIT_INTERVAL)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+# A thread that owns its own Z3 context. Z3 releases the GIL while solving, so
+# several workers can solve at the same time. A query is translated into the
+# context of a worker by the submitting thread while that worker is idle, and the
+# worker releases the translated terms before it becomes idle again, so a context
+# is never used by two threads at once.
+class SolverWorker(threading.Thread):
+    def __init__(self, service):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.service = service
+        self.ctx = Context()
+        self.solver = make_solver(self.ctx)
+        self.jobs = Queue.Queue()
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            query, future = job
+            job = None
+            try:
+                self.solver.reset()
+                self.solver.add(query)
+                result = self.solver.check()
+                self.solver.reset()
+                query = None
+                future.set_result(result)
+            except Exception as e:
+                query = None
+                future.set_exception(e)
+            self.service.idle.put(self)
+
+# Thread pool that checks independent queries concurrently, e.g. both sides of a
+# JUMPI or the independent checks of the heuristics
+class SolverService:
+    def __init__(self, num_threads):
+        self.idle = Queue.Queue()
+        self.workers = []
+        self.closed = False
+        for i in range(num_threads):
+            worker = SolverWorker(self)
+            worker.start()
+            self.workers.append(worker)
+            self.idle.put(worker)
+
+    def _acquire(self):
+        while True:
+            try:
+                return self.idle.get(True, WAIT_INTERVAL)
+            except Queue.Empty:
+                pass
+
+    # Submits a list of constraints (z3 expressions, Python booleans or nested lists of those)
+    def submit(self, constraints):
+        future = SolverFuture()
+        if self.closed:
+            # no worker will ever become idle again
+            future.set_exception(RuntimeError("The solver service is shut down"))
+            return future
+        worker = self._acquire()
+        if hasattr(worker.solver, "site"):
+            worker.solver.site = get_call_site()
+        try:
+            worker.jobs.put((self._translate(constraints, worker.ctx), future))
+        except Exception as e:
+            self.idle.put(worker)
+            future.set_exception(e)
+        return future
+
+    def submit_all(self, queries):
+        return [self.submit(query) for query in queries]
+
+    def check_all(self, queries):
+        return [future.result() for future in self.submit_all(queries)]
+
+    def _translate(self, constraints, ctx):
+        flattened = []
+        self._flatten(constraints, flattened)
+        if not flattened:
+            return BoolVal(True, ctx)
+        # translating a single conjunction shares the common subterms of the path condition
+        return And(flattened).translate(ctx)
+
+    def _flatten(self, constraints, flattened):
+        if isinstance(constraints, (list, tuple)):
+            for constraint in constraints:
+                self._flatten(constraint, flattened)
+        elif is_expr(constraints):
+            flattened.append(constraints)
+        else:
+            flattened.append(BoolVal(bool(constraints)))
+
+    def shutdown(self):
+        self.closed = True
+        for worker in self.workers:
+            worker.jobs.put(None)
+        self.workers = []
+        while True:
+            try:
+                self.idle.get_nowait()
+            except Queue.Empty:
+                break
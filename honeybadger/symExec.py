@@ -1,5 +1,4 @@
 import tokenize
-import sha3
 from tokenize import NUMBER, NAME, NEWLINE
 import re
 import math
@@ -13,6 +12,7 @@ import logging
 import os.path
 import z3
 import binascii
+import bisect
 import global_params
 
 from collections import namedtuple
@@ -20,6 +20,24 @@ from vargenerator import *
 from ethereum_data_etherscan import *
 from basicblock import BasicBlock
 from analysis import *
+from fork_server import ForkServer
+from solver_service import SolverService, SolverFuture
+from solver_factory import make_solver
+import query_capture
+from budget_scheduler import BudgetScheduler
+from memory import Memory
+from keccak_cache import get_keccak_cache
+from expr_cache import get_expr_cache, simplify_expr
+from narrowing import get_width_narrowing, narrow_widths
+import portfolio
+from adaptive_timeout import get_timeout_policy
+from query_cache import get_query_cache
+from conflict_sets import ConflictSets
+from abstract_domain import AbstractDomain
+import concrete_fuzzer
+from concrete_exec import ConcreteExecutor, load_states, parse_state
+from fast_expr import bv_var, bv_add, bv_sub, bv_and, bv_or, bv_xor, bv_not, bv_eq, bv_ult, bv_ugt, bv_slt, bv_sgt, bool_to_bv
+from search_strategy import DepthFirstFrontier, CoverageGuidedFrontier, DirectedFrontier
 
 log = logging.getLogger(__name__)
 
@@ -51,15 +69,16 @@ class Parameter:
             "func_call": -1,
             "stack": [],
             "calls": [],
-            "memory": [],
             "models": [],
             "visited": [],
             "visited_edges": {},
-            "mem": {},
+            "mem": Memory(),
             "analysis": {},
             "sha3_list": {},
             "global_state": {},
             "is_feasible": True,
+            "path_id": 0,
+            "function": None,
             "path_conditions_and_vars": {}
         }
         for (attr, default) in attr_defaults.iteritems():
@@ -71,9 +90,12 @@ class Parameter:
 
 def initGlobalVars():
     global solver
+    global solver_constraint_ids
     # Z3 solver
-    solver = Solver()
-    solver.set("timeout", global_params.TIMEOUT)
+    solver = make_solver()
+    solver_constraint_ids = []
+
+    enable_analysis_passes(global_params.ANALYSIS_PASSES)
 
     global visited_pcs
     visited_pcs = set()
@@ -172,6 +194,38 @@ def initGlobalVars():
     global total_no_of_paths
     total_no_of_paths = 0
 
+    # paths get their id when they are created at a JUMPI, the first path has id 0
+    global last_path_id
+    last_path_id = 0
+
+    # (seconds since the start, number of covered instructions) whenever the coverage grows
+    global coverage_over_time
+    coverage_over_time = []
+
+    # opcode -> [executions with concrete operands only, executions with a symbolic operand]
+    global opcode_stats
+    opcode_stats = {}
+
+    # variables replaced by a value by the concretization policy, in the order it happened
+    global concretizations
+    concretizations = []
+
+    # seconds spent checking the feasibility of branches and the queries of the heuristics
+    global solver_time
+    solver_time = 0.0
+
+    # blocks from which every path ends in a REVERT without doing anything the heuristics look at,
+    # mapped to the opcodes that end those paths
+    global irrelevant_sinks
+    irrelevant_sinks = {}
+
+    # irrelevant sinks that have been pruned instead of explored
+    global pruned_blocks
+    pruned_blocks = set()
+
+    global no_of_pruned_paths
+    no_of_pruned_paths = 0
+
     global no_of_test_cases
     no_of_test_cases = 0
 
@@ -186,6 +240,40 @@ def initGlobalVars():
     global log_file
     log_file = open(c_name + '.log', "w")
 
+    # worker processes forked at JUMPI choice points
+    global fork_server
+    fork_server = None
+    if global_params.FORK_WORKERS and hasattr(os, "fork"):
+        fork_server = ForkServer(global_params.FORK_WORKERS)
+
+    # thread pool of solvers with their own z3 contexts
+    global solver_service
+    solver_service = None
+    if global_params.SOLVER_THREADS:
+        solver_service = SolverService(global_params.SOLVER_THREADS)
+
+    # time and path budgets of the functions, created once the dispatcher is known
+    global budget_scheduler
+    budget_scheduler = None
+
+    # conflict sets learned from the unsat cores of infeasible branches
+    global conflict_sets
+    conflict_sets = ConflictSets()
+
+    # intervals and known bits of the terms, to decide branches without the solver
+    global abstract_domain
+    abstract_domain = AbstractDomain()
+
+    # concrete executions run before the symbolic execution, and the calldata offset of each Id_ variable
+    global prepass
+    prepass = None
+    global data_var_positions
+    data_var_positions = {}
+
+    # executes the transactions of the state file when the symbolic execution is replaced by a concrete one
+    global concrete_executor
+    concrete_executor = None
+
 def change_format():
     with open(c_name) as disasm_file:
         file_contents = disasm_file.readlines()
@@ -229,10 +317,163 @@ def build_cfg_and_analyze():
         collect_vertices(tokens)
         construct_bb()
         construct_static_edges()
-        full_sym_exec()  # jump targets are constructed on the fly
+        if global_params.CONCRETE_EXECUTION:
+            replay_transactions()
+        else:
+            if global_params.PRUNE_IRRELEVANT_SINKS:
+                find_irrelevant_sinks()
+            if global_params.FUZZ_PREPASS:
+                run_prepass()
+            init_budget_scheduler()
+            full_sym_exec()  # jump targets are constructed on the fly
         if global_params.CFG:
             print_cfg()
 
+def run_prepass():
+    global prepass
+
+    if not concrete_fuzzer.available():
+        log.warning("NumPy is not installed, the concrete pre-pass is skipped")
+        return
+    branch_blocks = dict((end_ins_dict[block], block) for block in vertices if jump_type[block] == "conditional")
+    prepass = concrete_fuzzer.ConcreteFuzzer(instructions, branch_blocks)
+    prepass.run(global_params.FUZZ_INPUTS, global_params.FUZZ_BATCH_SIZE, global_params.FUZZ_MAX_STEPS)
+    log.info("Concrete pre-pass covered %d of %d instructions with %d inputs", len(prepass.covered), len(instructions), prepass.inputs)
+
+# Executes the transactions of the state file concretely instead of symbolically, each one
+# as a path of its own, and keeps their calls, storage writes and terminals as records
+def replay_transactions():
+    global concrete_executor
+    global total_no_of_paths
+
+    concrete_executor = ConcreteExecutor(instructions, block_starts=vertices.keys())
+    results["transactions"] = {}
+    for path_id, (name, state) in enumerate(load_states(global_params.STATE_FILE)):
+        result = concrete_executor.execute(parse_state(state), path_id)
+        if result["calls"]:
+            list_of_calls[path_id] = result["calls"]
+        for sstore in result["sstores"]:
+            if not sstore in list_of_sstores:
+                list_of_sstores.append(sstore)
+        for suicide in result["suicides"]:
+            if not suicide in list_of_suicides:
+                list_of_suicides.append(suicide)
+        terminals.extend(result["terminals"])
+        results["transactions"][name] = {
+            "status": result["status"],
+            "error": result["error"],
+            "gas_used": result["gas_used"],
+            "output": result["output"],
+            "storage": dict((hex(key).rstrip("L"), hex(value).rstrip("L")) for key, value in result["storage"].items())
+        }
+        total_no_of_paths += 1
+    visited_pcs.update(concrete_executor.covered)
+
+def init_budget_scheduler():
+    global budget_scheduler
+
+    if global_params.FUNCTION_BUDGETS:
+        budget_scheduler = BudgetScheduler(get_dispatcher_signatures(), start_time + global_params.GLOBAL_TIMEOUT, global_params.PATH_BUDGET)
+
+# Function signatures compared against by the dispatcher (PUSH4 <signature> followed by EQ)
+def get_dispatcher_signatures():
+    signatures = set()
+    addresses = sorted(instructions.keys())
+    for i in range(len(addresses) - 1):
+        instruction = instructions[addresses[i]].split()
+        if len(instruction) == 2 and instruction[0] == "PUSH4" and instructions[addresses[i+1]].split() == ["EQ"]:
+            signatures.add(int(instruction[1], 16))
+    return signatures
+
+########################################################
+#               Irrelevant sink pruning                #
+########################################################
+
+# Instructions that leave records the heuristics look at. BALANCE and CALLDATALOAD have no effect
+# on the chain, but the records they leave outlive a REVERT: BALANCE of the contract itself sets
+# account_balance, which detect_hidden_transfer compares the call values with, and a CALLDATALOAD
+# at a constant position adds a parameter to list_of_functions, which detect_skip_empty_string_literal
+# compares with the input size of the calls.
+RELEVANT_INSTRUCTIONS = ["SSTORE", "CALL", "CALLCODE", "DELEGATECALL", "STATICCALL", "CREATE", "CREATE2",
+                         "SUICIDE", "SELFDESTRUCT", "BALANCE", "CALLDATALOAD"]
+
+# Static backward analysis: a block is an irrelevant sink when it contains no relevant instruction
+# and either ends in REVERT, or all of its successors are irrelevant sinks. Blocks that can reach
+# ASSERTFAIL (INVALID) are never sinks: detect_cash_flow counts their terminals, with the full path
+# condition of every path into them. Blocks that end with a jump to a computed address are never
+# sinks either, their successors are unknown.
+def find_irrelevant_sinks():
+    global irrelevant_sinks
+
+    candidates = []
+    for block in vertices:
+        if not any(str.split(instr, ' ')[0] in RELEVANT_INSTRUCTIONS for instr in vertices[block].get_instructions()):
+            candidates.append(block)
+    changed = True
+    while changed:
+        changed = False
+        for block in candidates:
+            if block in irrelevant_sinks:
+                continue
+            if jump_type[block] == "terminal":
+                opcode = str.split(vertices[block].get_instructions()[-1], ' ')[0]
+                if opcode == "REVERT":
+                    irrelevant_sinks[block] = set([opcode])
+                    changed = True
+                continue
+            successors = get_constant_successors(block)
+            if successors and all(successor in irrelevant_sinks for successor in successors):
+                irrelevant_sinks[block] = set().union(*[irrelevant_sinks[successor] for successor in successors])
+                changed = True
+    log.debug("Found %d irrelevant sink blocks", len(irrelevant_sinks))
+
+# Successors of a block that does not jump to a computed address, None otherwise
+def get_constant_successors(block):
+    successors = []
+    if jump_type[block] == "falls_to" or jump_type[block] == "conditional":
+        successors.append(vertices[block].get_falls_to())
+    if jump_type[block] == "unconditional" or jump_type[block] == "conditional":
+        block_ins = vertices[block].get_instructions()
+        if len(block_ins) < 2:
+            return None
+        instr_parts = block_ins[-2].split()
+        if len(instr_parts) != 2 or not instr_parts[0].startswith("PUSH"):
+            return None
+        successors.append(int(instr_parts[1], 16))
+    return successors
+
+# Records a cheap terminal for a branch into an irrelevant sink instead of exploring it
+def record_pruned_path(path_conditions_and_vars, block, branch_expression):
+    global no_of_pruned_paths
+
+    no_of_pruned_paths += 1
+    pruned_blocks.add(block)
+    terminal = {}
+    # all the paths into the sink revert, detect_cash_flow ignores them whatever their path condition
+    terminal["opcode"] = "REVERT"
+    terminal["path_condition"] = path_conditions_and_vars["path_condition"] + [branch_expression]
+    terminals.append(terminal)
+    if global_params.DEBUG_MODE:
+        print("Pruned the irrelevant sink at block " + hex(block))
+
+# Instructions of the pruned sinks that have not been explored by any other path
+def get_pruned_code():
+    pruned_code = set()
+    addresses = sorted(instructions)
+    reached = set(pruned_blocks)
+    blocks = list(pruned_blocks)
+    while blocks:
+        block = blocks.pop()
+        i = bisect.bisect_left(addresses, vertices[block].get_start_address())
+        while i < len(addresses) and addresses[i] <= vertices[block].get_end_address():
+            pruned_code.add(addresses[i])
+            i += 1
+        for successor in get_constant_successors(block) or []:
+            if successor in irrelevant_sinks and successor not in reached:
+                reached.add(successor)
+                blocks.append(successor)
+    return pruned_code - visited_pcs
+
 def print_cfg():
     dot_file_path = c_name.replace('datasets/honeypots/', 'outputs/').replace('.evm', '').replace('.disasm', '').replace(':', '-') + '.dot'
     png_file_path = c_name.replace('datasets/honeypots/', 'outputs/').replace('.evm', '').replace('.disasm', '').replace(':', '-') + '.png'
@@ -259,11 +500,11 @@ def print_cfg():
             if len(edges[block.get_start_address()]) > 1:
                 true_branch = block.get_branch_expression()
                 if is_expr(true_branch):
-                    true_branch = simplify(true_branch)
+                    true_branch = simplify_expr(true_branch)
                 f.write('"'+hex(block.get_start_address())+'" -> "'+hex(edges[block.get_start_address()][1])+'" [color="green" label=" '+str(true_branch)+'"];\n')
                 false_branch = Not(block.get_branch_expression())
                 if is_expr(false_branch):
-                    false_branch = simplify(false_branch)
+                    false_branch = simplify_expr(false_branch)
                 f.write('"'+hex(block.get_start_address())+'" -> "'+hex(edges[block.get_start_address()][0])+'" [color="red" label=" '+str(false_branch)+'"];\n')
             else:
                 f.write('"'+hex(block.get_start_address())+'" -> "UNKNOWN_TARGET" [color="black" label=" UNKNOWN_BRANCH_EXPR"];\n')
@@ -462,7 +703,7 @@ def get_init_global_state(path_conditions_and_vars):
     init_is = init_ia = deposited_value = sender_address = receiver_address = gas_price = origin = currentCoinbase = currentNumber = currentDifficulty = currentGasLimit = callData = None
 
     if global_params.INPUT_STATE:
-        with open('state.json') as f:
+        with open(global_params.STATE_FILE) as f:
             state = json.loads(f.read())
             if state["Is"]["balance"]:
                 init_is = int(state["Is"]["balance"], 16)
@@ -550,6 +791,9 @@ def get_init_global_state(path_conditions_and_vars):
     # the state of the current current contract
     if "Ia" not in global_state:
         global_state["Ia"] = {}
+    if global_params.SYMBOLIC_ARRAYS:
+        # every SSTORE, and the initial value of every slot that is read, as an array term
+        global_state["storage_array"] = Array(gen.gen_owner_store_array(), BitVecSort(256), BitVecSort(256))
     global_state["miu_i"] = 0
     global_state["value"] = deposited_value
     global_state["sender_address"] = sender_address
@@ -571,11 +815,78 @@ def full_sym_exec():
     global_state = get_init_global_state(path_conditions_and_vars)
     analysis = init_analysis()
     params = Parameter(path_conditions_and_vars=path_conditions_and_vars, global_state=global_state, analysis=analysis)
-    execution_paths[total_no_of_paths] = []
-    return sym_exec_block(params)
-
-
-# Symbolically executing a block from the start address
+    if global_params.SYMBOLIC_ARRAYS:
+        params.mem = Memory(Array(gen.gen_mem_array(), BitVecSort(256), BitVecSort(256)))
+    execution_paths[params.path_id] = []
+    return explore(params)
+
+def create_frontier():
+    if global_params.SEARCH_STRATEGY == "coverage":
+        block_sizes = dict((block, len(vertices[block].get_instructions())) for block in vertices)
+        return CoverageGuidedFrontier(get_static_successors, block_sizes)
+    if global_params.SEARCH_STRATEGY == "directed":
+        return DirectedFrontier(get_static_successors, vertices.keys(), get_money_flow_blocks())
+    return DepthFirstFrontier()
+
+# Blocks that can move ether: the targets of the directed search
+def get_money_flow_blocks():
+    blocks = []
+    for block in vertices:
+        for instr in vertices[block].get_instructions():
+            if str.split(instr, ' ')[0] in ["CALL", "CALLCODE", "DELEGATECALL", "SUICIDE", "SELFDESTRUCT"]:
+                blocks.append(block)
+                break
+    return blocks
+
+# Successors of a block known so far, including the targets of jumps to a pushed constant that have not been taken yet
+def get_static_successors(block):
+    successors = list(edges.get(block, []))
+    if jump_type.get(block) == "unconditional" or jump_type.get(block) == "conditional":
+        block_ins = vertices[block].get_instructions()
+        if len(block_ins) > 1:
+            instr_parts = block_ins[-2].split()
+            if len(instr_parts) == 2 and instr_parts[0].startswith("PUSH"):
+                target = int(instr_parts[1], 16)
+                if target not in successors:
+                    successors.append(target)
+    return successors
+
+# Explores every state reachable from params, in the order chosen by the search strategy
+def explore(params):
+    frontier = create_frontier()
+    frontier.push(params)
+    while len(frontier):
+        params = frontier.pop()
+        block_start_time = time.time()
+        try:
+            successors = sym_exec_block(params)
+        except Exception as e:
+            successors = []
+            log_file.write(str(e))
+            if global_params.DEBUG_MODE:
+                traceback.print_exc()
+            if str(e) == "timeout":
+                raise e
+        if budget_scheduler:
+            budget_scheduler.charge(params.function, time.time() - block_start_time)
+        if params.block in visited_pcs:
+            frontier.visit(params.block)
+        if not coverage_over_time or coverage_over_time[-1][1] != len(visited_pcs):
+            coverage_over_time.append((time.time() - start_time, len(visited_pcs)))
+        # successors are returned in the order in which a depth first search explores them
+        for successor in reversed(successors):
+            frontier.push(successor)
+
+# Id of a new path, which starts with the instructions executed so far by the path path_id
+def new_path_id(path_id):
+    global last_path_id
+
+    last_path_id += 1
+    execution_paths[last_path_id] = execution_paths[path_id][:]
+    return last_path_id
+
+
+# Symbolically executing a block from the start address, returns the states of its successors
 def sym_exec_block(params):
     global solver
     #global visited_edges
@@ -593,7 +904,6 @@ def sym_exec_block(params):
     depth = params.depth
     stack = params.stack
     mem = params.mem
-    memory = params.memory
     global_state = params.global_state
     sha3_list = params.sha3_list
     path_conditions_and_vars = params.path_conditions_and_vars
@@ -605,7 +915,7 @@ def sym_exec_block(params):
     Edge = namedtuple("Edge", ["v1", "v2"]) # Factory Function for tuples is used as dictionary key
     if block < 0:
         log.debug("UNKNOWN JUMP ADDRESS. TERMINATING THIS PATH")
-        return ["ERROR"]
+        return []
 
     if global_params.DEBUG_MODE:
         print("Reach block address " + hex(block))
@@ -622,13 +932,20 @@ def sym_exec_block(params):
         if jump_type[pre_block] == "conditional" and vertices[pre_block].get_falls_to() == block:
             if global_params.DEBUG_MODE:
                 print("!!! Overcome a number of loop limit. Terminating this path ... !!!")
-            return stack
+            return []
 
     current_gas_used = analysis["gas"]
     if current_gas_used > global_params.GAS_LIMIT:
         if global_params.DEBUG_MODE:
             print("!!! Run out of gas. Terminating this path ... !!!")
-        return stack
+        return []
+
+    if budget_scheduler:
+        budget_scheduler.start(params.function)
+    if budget_scheduler and budget_scheduler.exhausted(params.function):
+        if global_params.DEBUG_MODE:
+            print("!!! Function budget exhausted. Terminating this path ... !!!")
+        return []
 
     # Execute every instruction, one at a time
     try:
@@ -636,7 +953,16 @@ def sym_exec_block(params):
     except KeyError:
         if global_params.DEBUG_MODE:
             print("This path results in an exception, possibly an invalid jump address")
-        return ["ERROR"]
+        return []
+
+    # the static part of the gas of the block is charged upfront, only dynamic costs are computed per instruction
+    charge_block_gas(analysis, vertices[block])
+
+    # the instructions check their conditions against the path condition on the global solver
+    sync_solver(path_conditions_and_vars["path_condition"])
+
+    if budget_scheduler:
+        budget_scheduler.visit(params.function, block, len(block_ins))
 
     for instr in block_ins:
         if global_params.DEBUG_MODE:
@@ -686,10 +1012,13 @@ def sym_exec_block(params):
     depth += 1
 
     # Go to next Basic Block(s)
+    successors = []
     if jump_type[block] == "terminal" or depth > global_params.DEPTH_LIMIT:
         global total_no_of_paths
 
         total_no_of_paths += 1
+        if budget_scheduler:
+            budget_scheduler.count_path(params.function)
 
         terminal = {}
         terminal["opcode"] = block_ins = vertices[block].get_instructions()[-1].replace(" ", "")
@@ -719,7 +1048,7 @@ def sym_exec_block(params):
             source_code = source_map.find_source_code(global_state["pc"])
             if source_code in source_map.func_call_names:
                 new_params.func_call = global_state["pc"]
-        sym_exec_block(new_params)
+        successors.append(new_params)
     elif jump_type[block] == "falls_to":  # just follow to the next basic block
         successor = vertices[block].get_falls_to()
         new_params = params.copy()
@@ -728,20 +1057,51 @@ def sym_exec_block(params):
         new_params.pre_block = block
         new_params.visited_edges = visited_edges
         new_params.global_state["pc"] = successor
-        sym_exec_block(new_params)
+        successors.append(new_params)
     elif jump_type[block] == "conditional":  # executing "JUMPI"
-        # A choice point, we proceed with depth first search
+        # A choice point, the search strategy decides which branch is explored first
 
         updated_count_number = visited_edges[current_edge] - 1
         visited_edges.update({current_edge: updated_count_number})
 
-        current_execution_path = copy.deepcopy(execution_paths[total_no_of_paths])
-
         branch_expression = vertices[block].get_branch_expression()
         negated_branch_expression = Not(branch_expression)
 
-        solver.reset()
-        solver.add(path_conditions_and_vars["path_condition"])
+        # branches that can only end in a REVERT without doing anything of interest are not explored
+        right_branch_pruned = vertices[block].get_falls_to() in irrelevant_sinks
+        left_branch_pruned = vertices[block].get_jump_target() in irrelevant_sinks
+
+        # a branch condition that the abstract domain decides makes one branch infeasible. The other
+        # branch is still checked, the path condition itself may have become unsatisfiable.
+        right_branch_check = left_branch_check = None
+        decision = None
+        if global_params.ABSTRACT_DOMAIN and is_expr(branch_expression):
+            decision = abstract_domain.decide_branch(path_conditions_and_vars["path_condition"], branch_expression)
+            if decision is True:
+                right_branch_check = known_result(unsat)
+            elif decision is False:
+                left_branch_check = known_result(unsat)
+
+        # branches that contain a learned conflict set are infeasible without asking the solver
+        if global_params.UNSAT_CORES:
+            if not right_branch_pruned and right_branch_check is None and conflict_sets.prune(vertices[block].get_falls_to(), path_conditions_and_vars["path_condition"] + [negated_branch_expression]):
+                right_branch_check = known_result(unsat)
+            if not left_branch_pruned and left_branch_check is None and conflict_sets.prune(vertices[block].get_jump_target(), path_conditions_and_vars["path_condition"] + [branch_expression]):
+                left_branch_check = known_result(unsat)
+
+        # branches taken by an input of the concrete pre-pass that satisfies their constraints are feasible
+        if prepass:
+            if not right_branch_pruned and right_branch_check is None and prepass.is_witnessed(block, vertices[block].get_falls_to(), path_conditions_and_vars["path_condition"] + [negated_branch_expression], data_var_positions):
+                right_branch_check = known_result(sat)
+            if not left_branch_pruned and left_branch_check is None and prepass.is_witnessed(block, vertices[block].get_jump_target(), path_conditions_and_vars["path_condition"] + [branch_expression], data_var_positions):
+                left_branch_check = known_result(sat)
+
+        # check both branches at once on the solver threads, narrowed queries are checked apart from the global solver
+        if solver_service or global_params.NARROW_WIDTHS:
+            if not right_branch_pruned and right_branch_check is None:
+                right_branch_check = submit_query(path_conditions_and_vars["path_condition"] + [negated_branch_expression])
+            if not left_branch_pruned and left_branch_check is None:
+                left_branch_check = submit_query(path_conditions_and_vars["path_condition"] + [branch_expression])
 
         if global_params.DEBUG_MODE:
             print("Negated branch expression: " + remove_line_break_space(negated_branch_expression))
@@ -749,49 +1109,51 @@ def sym_exec_block(params):
         if not negated_branch_expression in list_of_comparisons:
             list_of_comparisons[negated_branch_expression] = get_function_signature_from_path_condition(path_conditions_and_vars["path_condition"])
 
-        solver.add(negated_branch_expression)
-
-        isRightBranchFeasible = True
+        if right_branch_pruned:
+            record_pruned_path(path_conditions_and_vars, vertices[block].get_falls_to(), negated_branch_expression)
+        else:
+            isRightBranchFeasible = True
 
-        try:
             try:
-                if solver.check() == unsat and not (negated_branch_expression == True or negated_branch_expression == False or negated_branch_expression == Not(True) or negated_branch_expression == Not(False)):
+                try:
+                    if branch_check_result(right_branch_check, path_conditions_and_vars["path_condition"], negated_branch_expression) == unsat and not (negated_branch_expression == True or negated_branch_expression == False or negated_branch_expression == Not(True) or negated_branch_expression == Not(False)):
+                        isRightBranchFeasible = False
+                except:
                     isRightBranchFeasible = False
-            except:
-                isRightBranchFeasible = False
-            if not isRightBranchFeasible:
-                if not vertices[block].get_falls_to() in feasible_blocks:
-                    infeasible_blocks.append(vertices[block].get_falls_to())
+                if not isRightBranchFeasible:
+                    if global_params.UNSAT_CORES and decision is not True:
+                        conflict_sets.learn(vertices[block].get_falls_to(), path_conditions_and_vars["path_condition"] + [negated_branch_expression])
+                    if not vertices[block].get_falls_to() in feasible_blocks:
+                        infeasible_blocks.append(vertices[block].get_falls_to())
+                    if global_params.DEBUG_MODE:
+                        print("RIGHT BRANCH IS INFEASIBLE ("+str(branch_check_result(right_branch_check, path_conditions_and_vars["path_condition"], negated_branch_expression))+")")
+                else:
+                    if vertices[block].get_falls_to() in infeasible_blocks:
+                        infeasible_blocks.remove(vertices[block].get_falls_to())
+                        for heuristic in heuristics:
+                            if heuristic["block"] == vertices[block].get_falls_to():
+                                heuristics.remove(heuristic)
+                    feasible_blocks.append(vertices[block].get_falls_to())
+                right_branch = vertices[block].get_falls_to()
+                new_params = params.copy()
+                new_params.depth = depth
+                new_params.block = right_branch
+                new_params.pre_block = block
+                new_params.visited_edges = visited_edges
+                new_params.global_state["pc"] = right_branch
+                new_params.is_feasible = isRightBranchFeasible
+                new_params.path_conditions_and_vars["path_condition"].append(negated_branch_expression)
+                if fork_server and fork_server.can_fork():
+                    new_params.path_id = new_path_id(params.path_id)
+                    sym_exec_block_in_worker(new_params)
+                else:
+                    successors.append(new_params)
+            except Exception as e:
+                log_file.write(str(e))
                 if global_params.DEBUG_MODE:
-                    print("RIGHT BRANCH IS INFEASIBLE ("+str(solver.check())+")")
-            else:
-                if vertices[block].get_falls_to() in infeasible_blocks:
-                    infeasible_blocks.remove(vertices[block].get_falls_to())
-                    for heuristic in heuristics:
-                        if heuristic["block"] == vertices[block].get_falls_to():
-                            heuristics.remove(heuristic)
-                feasible_blocks.append(vertices[block].get_falls_to())
-            right_branch = vertices[block].get_falls_to()
-            new_params = params.copy()
-            new_params.depth = depth
-            new_params.block = right_branch
-            new_params.pre_block = block
-            new_params.visited_edges = visited_edges
-            new_params.global_state["pc"] = right_branch
-            new_params.is_feasible = isRightBranchFeasible
-            new_params.path_conditions_and_vars["path_condition"].append(negated_branch_expression)
-            sym_exec_block(new_params)
-        except Exception as e:
-            log_file.write(str(e))
-            if global_params.DEBUG_MODE:
-                traceback.print_exc()
-            if str(e) == "timeout":
-                raise e
-
-        execution_paths[total_no_of_paths] = current_execution_path
-
-        solver.reset()
-        solver.add(path_conditions_and_vars["path_condition"])
+                    traceback.print_exc()
+                if str(e) == "timeout":
+                    raise e
 
         if global_params.DEBUG_MODE:
             print("Branch expression: " + remove_line_break_space(branch_expression))
@@ -799,49 +1161,363 @@ def sym_exec_block(params):
         if not branch_expression in list_of_comparisons:
             list_of_comparisons[branch_expression] = get_function_signature_from_path_condition(path_conditions_and_vars["path_condition"])
 
-        solver.add(branch_expression)
-
-        isLeftBranchFeasible = True
+        if left_branch_pruned:
+            record_pruned_path(path_conditions_and_vars, vertices[block].get_jump_target(), branch_expression)
+        else:
+            isLeftBranchFeasible = True
 
-        try:
             try:
-                if solver.check() == unsat and not (branch_expression == True or branch_expression == False or branch_expression == Not(True) or branch_expression == Not(False)):
+                try:
+                    if branch_check_result(left_branch_check, path_conditions_and_vars["path_condition"], branch_expression) == unsat and not (branch_expression == True or branch_expression == False or branch_expression == Not(True) or branch_expression == Not(False)):
+                        isLeftBranchFeasible = False
+                except:
                     isLeftBranchFeasible = False
-            except:
-                isLeftBranchFeasible = False
-            if not isLeftBranchFeasible:
-                if not vertices[block].get_jump_target() in feasible_blocks:
-                    infeasible_blocks.append(vertices[block].get_jump_target())
+                if not isLeftBranchFeasible:
+                    if global_params.UNSAT_CORES and decision is not False:
+                        conflict_sets.learn(vertices[block].get_jump_target(), path_conditions_and_vars["path_condition"] + [branch_expression])
+                    if not vertices[block].get_jump_target() in feasible_blocks:
+                        infeasible_blocks.append(vertices[block].get_jump_target())
+                    if global_params.DEBUG_MODE:
+                        print("LEFT BRANCH IS INFEASIBLE ("+str(branch_check_result(left_branch_check, path_conditions_and_vars["path_condition"], branch_expression))+")")
+                else:
+                    if vertices[block].get_jump_target() in infeasible_blocks:
+                        infeasible_blocks.remove(vertices[block].get_jump_target())
+                        for heuristic in heuristics:
+                            if heuristic["block"] == vertices[block].get_jump_target():
+                                heuristics.remove(heuristic)
+                    feasible_blocks.append(vertices[block].get_jump_target())
+                left_branch = vertices[block].get_jump_target()
+                new_params = params.copy()
+                new_params.depth = depth
+                new_params.block = left_branch
+                new_params.pre_block = block
+                new_params.visited_edges = visited_edges
+                new_params.global_state["pc"] = left_branch
+                new_params.is_feasible = isLeftBranchFeasible
+                new_params.path_conditions_and_vars["path_condition"].append(branch_expression)
+                new_params.path_id = new_path_id(params.path_id)
+                # taking a branch of the dispatcher enters a function
+                if params.function is None:
+                    new_params.function = get_function_signature_from_path_condition([branch_expression])
+                successors.append(new_params)
+            except Exception as e:
+                log_file.write(str(e))
                 if global_params.DEBUG_MODE:
-                    print("LEFT BRANCH IS INFEASIBLE ("+str(solver.check())+")")
-            else:
-                if vertices[block].get_jump_target() in infeasible_blocks:
-                    infeasible_blocks.remove(vertices[block].get_jump_target())
-                    for heuristic in heuristics:
-                        if heuristic["block"] == vertices[block].get_jump_target():
-                            heuristics.remove(heuristic)
-                feasible_blocks.append(vertices[block].get_jump_target())
-            left_branch = vertices[block].get_jump_target()
-            new_params = params.copy()
-            new_params.depth = depth
-            new_params.block = left_branch
-            new_params.pre_block = block
-            new_params.visited_edges = visited_edges
-            new_params.global_state["pc"] = left_branch
-            new_params.is_feasible = isLeftBranchFeasible
-            new_params.path_conditions_and_vars["path_condition"].append(branch_expression)
-            sym_exec_block(new_params)
-        except Exception as e:
-            log_file.write(str(e))
-            if global_params.DEBUG_MODE:
-                traceback.print_exc()
-            if str(e) == "timeout":
-                raise e
+                    traceback.print_exc()
+                if str(e) == "timeout":
+                    raise e
     else:
         updated_count_number = visited_edges[current_edge] - 1
         visited_edges.update({current_edge: updated_count_number})
         raise Exception('Unknown Jump-Type')
 
+    return successors
+
+# Result of a branch feasibility check, either submitted to the solver service or run on
+# the global solver, with the branch expression pushed on top of the path condition
+def branch_check_result(pending_check, path_condition, branch_expression):
+    global solver_time
+
+    start = time.time()
+    try:
+        if pending_check:
+            return pending_check.result()
+        sync_solver(path_condition)
+        solver.push()
+        try:
+            solver.add(branch_expression)
+            return solver.check()
+        finally:
+            solver.pop()
+    finally:
+        solver_time += time.time() - start
+
+# Makes the global solver hold the path condition. When the constraints it holds are a
+# prefix of the path condition, as on the successors of the state it was last synced on,
+# only the constraints that follow are added. Otherwise it is reset.
+def sync_solver(path_condition):
+    global solver_constraint_ids
+
+    ids = [constraint.get_id() if is_expr(constraint) else ("value", constraint) for constraint in path_condition]
+    held = len(solver_constraint_ids)
+    if held > len(ids) or ids[:held] != solver_constraint_ids:
+        solver.reset()
+        held = 0
+    if held < len(path_condition):
+        solver.add(path_condition[held:])
+    solver_constraint_ids = ids
+
+# Adds a constraint to the path condition, and to the global solver that holds it
+def add_path_constraint(path_conditions_and_vars, constraint):
+    path_conditions_and_vars["path_condition"].append(constraint)
+    sync_solver(path_conditions_and_vars["path_condition"])
+
+# Submits a query to the solver service, or checks it right away on a separate solver
+def submit_query(constraints):
+    global solver_time
+
+    if global_params.NARROW_WIDTHS:
+        constraints = narrow_widths(constraints)
+    if solver_service:
+        return solver_service.submit(constraints)
+    future = SolverFuture()
+    start = time.time()
+    try:
+        s = make_solver()
+        s.add(constraints)
+        future.set_result(s.check())
+    except Exception as e:
+        future.set_exception(e)
+    solver_time += time.time() - start
+    return future
+
+# A pending check whose result is already known
+def known_result(result):
+    future = SolverFuture()
+    future.set_result(result)
+    return future
+
+# Check independent sets of constraints, in parallel when the solver service is enabled
+def check_all(queries):
+    global solver_time
+
+    if global_params.NARROW_WIDTHS:
+        queries = [narrow_widths(query) for query in queries]
+    start = time.time()
+    try:
+        if solver_service:
+            return solver_service.check_all(queries)
+        results = []
+        for query in queries:
+            s = make_solver()
+            s.add(query)
+            results.append(s.check())
+        return results
+    finally:
+        solver_time += time.time() - start
+
+########################################################
+#                Concrete and symbolic values           #
+########################################################
+
+# Number of stack operands of each opcode
+operand_counts = {}
+
+def record_operand_kinds(opcode, stack):
+    if opcode not in operand_counts:
+        try:
+            operand_counts[opcode] = get_opcode(opcode)[1]
+        except ValueError:
+            operand_counts[opcode] = 0
+    stats = opcode_stats.setdefault(opcode, [0, 0])
+    if isAllReal(*stack[:operand_counts[opcode]]):
+        stats[0] += 1
+    else:
+        stats[1] += 1
+
+# Executions of each opcode with concrete operands only and with a symbolic operand
+def get_opcode_report():
+    report = {}
+    for opcode, (concrete, symbolic) in opcode_stats.items():
+        report[opcode] = {
+            "concrete": concrete,
+            "symbolic": symbolic,
+            "concrete_ratio": str(round(float(concrete) / (concrete + symbolic) * 100, 1))
+        }
+    return report
+
+########################################################
+#                Concretization policy                 #
+########################################################
+
+# Names (or prefixes of names) of the variables of each class the policy may concretize
+CONCRETIZABLE_VARS = {
+    "gas":        ("gas_", "tx.gasprice"),
+    "timestamp":  ("IH_s",),
+    "blockhash":  ("IH_blockhash",),
+    "coinbase":   ("IH_c",),
+    "number":     ("IH_i",),
+    "difficulty": ("IH_d",),
+    "gaslimit":   ("IH_l",)
+}
+
+# Tree size of the expressions seen so far by AST id, with the expression so that its id is not reused
+expression_sizes = {}
+MAX_EXPRESSION_SIZES = 100000
+
+# Size of an expression once printed, shared subterms are counted at each occurrence
+def get_expression_size(expression):
+    pending = [expression]
+    while pending:
+        current = pending[-1]
+        if current.get_id() in expression_sizes:
+            pending.pop()
+            continue
+        children = [child for child in current.children() if child.get_id() not in expression_sizes]
+        if children:
+            pending.extend(children)
+            continue
+        pending.pop()
+        if len(expression_sizes) >= MAX_EXPRESSION_SIZES:
+            expression_sizes.clear()
+        expression_sizes[current.get_id()] = (current, 1 + sum(get_expression_size(child) for child in current.children()))
+    return expression_sizes[expression.get_id()][1]
+
+def is_concretizable(name):
+    return any(name.startswith(prefix) for var_class in global_params.CONCRETIZABLE_VARS for prefix in CONCRETIZABLE_VARS.get(var_class, ()))
+
+# Variables of the concretizable classes in an expression, each shared subterm is visited once
+def get_concretizable_vars(expression):
+    variables = []
+    visited = set()
+    pending = [expression]
+    while pending:
+        current = pending.pop()
+        if current.get_id() in visited:
+            continue
+        visited.add(current.get_id())
+        if is_const(current) and current.decl().kind() == Z3_OP_UNINTERPRETED:
+            if is_bv(current) and is_concretizable(str(current)):
+                variables.append(current)
+        else:
+            pending.extend(current.children())
+    return variables
+
+# Replaces the variables of the concretizable classes in the expression on top of the
+# stack by their value in a model of the path condition, when the expression is larger
+# than CONCRETIZATION_SIZE. The equalities are added to the path condition, so the other
+# terms that hold these variables stay consistent with the value.
+def apply_concretization_policy(stack, path_conditions_and_vars, pc, opcode):
+    size = get_expression_size(stack[0])
+    if size <= global_params.CONCRETIZATION_SIZE:
+        return
+    variables = get_concretizable_vars(stack[0])
+    if not variables:
+        return
+    s = make_solver()
+    s.add(path_conditions_and_vars["path_condition"])
+    if check_solver(s) != sat:
+        return
+    model = s.model()
+    # the sat result came from a race or the query cache, and the model could not be found again
+    if model is None:
+        return
+    substitutions = []
+    for variable in variables:
+        value = model.eval(variable, model_completion=True)
+        constraint = (variable == value)
+        if constraint not in path_conditions_and_vars["path_condition"]:
+            add_path_constraint(path_conditions_and_vars, constraint)
+        substitutions.append((variable, value))
+    stack[0] = normalize(substitute(stack[0], *substitutions))
+    new_size = get_expression_size(stack[0]) if is_expr(stack[0]) else 1
+    for variable, value in substitutions:
+        concretizations.append({"pc": pc, "opcode": opcode, "variable": str(variable), "value": value.as_long(), "size": size, "new_size": new_size})
+
+########################################################
+#           Symbolic memory and storage arrays          #
+########################################################
+
+# Values found by concretize, by AST ids of the expression and of the path condition, with
+# the terms so that their ids are not reused
+concretized_values = {}
+MAX_CONCRETIZED_VALUES = 10000
+
+# The values an expression can take under the path condition, None when there are more
+# than bound (CONCRETIZATION_BOUND by default) of them or when the solver cannot tell.
+# The first two checks tell whether the value is unique, the enumeration only goes on
+# for the expressions that can take several values.
+def concretize(expression, path_condition, bound=None):
+    if bound is None:
+        bound = global_params.CONCRETIZATION_BOUND
+    key = (expression.get_id(), bound) + tuple(constraint.get_id() if is_expr(constraint) else constraint for constraint in path_condition)
+    if key in concretized_values:
+        return concretized_values[key][0]
+    values = enumerate_values(expression, path_condition, bound)
+    if len(concretized_values) >= MAX_CONCRETIZED_VALUES:
+        concretized_values.clear()
+    concretized_values[key] = (values, expression, list(path_condition))
+    return values
+
+def enumerate_values(expression, path_condition, bound):
+    s = make_solver()
+    s.add(path_condition)
+    values = []
+    while len(values) <= bound:
+        result = check_solver(s)
+        if result == unsat:
+            break
+        if result != sat:
+            return None
+        model = s.model()
+        if model is None:
+            return None
+        value = model.eval(expression, model_completion=True).as_long()
+        values.append(value)
+        s.add(expression != value)
+    if not values or len(values) > bound:
+        return None
+    return values
+
+# The only value of an expression under the path condition, or the expression itself
+def concretize_if_unique(expression, path_condition):
+    values = concretize(expression, path_condition, 1)
+    if values is not None and len(values) == 1:
+        return values[0]
+    return expression
+
+# A storage slot at a concrete address, or at an address that is looked up as is. The slot is
+# not read from the array, even after a store at a symbolic address: the heuristics match the
+# Ia_store_ variables of the slots in the path conditions and the values of the calls.
+def load_storage(address, global_state, path_conditions_and_vars):
+    if address in global_state["Ia"]:
+        return global_state["Ia"][address]
+    new_var_name = gen.gen_owner_store_var(address)
+    if not new_var_name in path_conditions_and_vars:
+        if address.__class__.__name__ == "BitVecNumRef":
+            address = address.as_long()
+        else:
+            path_conditions_and_vars[new_var_name] = bv_var(new_var_name)
+    new_var = path_conditions_and_vars[new_var_name]
+    global_state["Ia"][address] = new_var
+    if global_params.SYMBOLIC_ARRAYS:
+        # the initial value of the slot, no store so far can alias it
+        global_state["storage_array"] = Store(global_state["storage_array"], address, new_var)
+    return new_var
+
+# A storage slot at a symbolic address: the address is concretized when it can only take a few
+# values, otherwise the slot is read from the storage array
+def load_symbolic_storage(address, global_state, path_conditions_and_vars):
+    values = concretize(address, path_conditions_and_vars["path_condition"])
+    if values is None:
+        return simplify_expr(Select(global_state["storage_array"], address))
+    value = load_storage(values[-1], global_state, path_conditions_and_vars)
+    for concrete_address in reversed(values[:-1]):
+        value = If(address == concrete_address, load_storage(concrete_address, global_state, path_conditions_and_vars), value)
+    return value
+
+# A memory word at a symbolic address, concretized like the storage addresses
+def load_symbolic_memory(address, mem, path_conditions_and_vars):
+    values = concretize(address, path_conditions_and_vars["path_condition"])
+    if values is None:
+        return simplify_expr(Select(mem.array, address))
+    value = load_memory(values[-1], mem, path_conditions_and_vars)
+    for concrete_address in reversed(values[:-1]):
+        value = If(address == concrete_address, load_memory(concrete_address, mem, path_conditions_and_vars), value)
+    return value
+
+def load_memory(address, mem, path_conditions_and_vars):
+    if mem.may_alias():
+        return simplify_expr(Select(mem.array, address))
+    value = mem.load_word(address)
+    if value is None:
+        new_var_name = gen.gen_mem_var(address)
+        if not new_var_name in path_conditions_and_vars:
+            path_conditions_and_vars[new_var_name] = BitVec(new_var_name, 256)
+        value = path_conditions_and_vars[new_var_name]
+        mem.store_word(address, value)
+    return value
+
 # Symbolically executing an instruction
 def sym_exec_ins(params):
     global visited_pcs
@@ -860,7 +1536,6 @@ def sym_exec_ins(params):
     instr = params.instr
     stack = params.stack
     mem = params.mem
-    memory = params.memory
     global_state = params.global_state
     sha3_list = params.sha3_list
     path_conditions_and_vars = params.path_conditions_and_vars
@@ -873,12 +1548,16 @@ def sym_exec_ins(params):
 
     instr_parts = str.split(instr, ' ')
 
-    execution_paths[total_no_of_paths].append(global_state["pc"])
+    execution_paths[params.path_id].append(global_state["pc"])
 
     # collecting the analysis result by calling this skeletal function
     # this should be done before symbolically executing the instruction,
     # since SE will modify the stack and mem
     update_analysis(analysis, instr_parts[0], stack, mem, global_state, path_conditions_and_vars, solver)
+    record_operand_kinds(instr_parts[0], stack)
+    pc = global_state["pc"]
+    if global_params.CAPTURE_QUERIES_DIR:
+        query_capture.current_pc = global_state["pc"]
 
     log.debug("==============================")
     log.debug("EXECUTING: " + instr)
@@ -894,17 +1573,13 @@ def sym_exec_ins(params):
             first = stack.pop(0)
             second = stack.pop(0)
             # Type conversion is needed when they are mismatched
-            if isReal(first) and isSymbolic(second):
-                first = BitVecVal(first, 256)
-                computed = first + second
-            elif isSymbolic(first) and isReal(second):
-                second = BitVecVal(second, 256)
-                computed = first + second
+            if isReal(first) != isReal(second):
+                computed = bv_add(first, second)
             else:
                 # both are real and we need to manually modulus with 2 ** 256
                 # if both are symbolic z3 takes care of modulus automatically
                 computed = (first + second) % (2 ** 256)
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = normalize(computed)
             if isReal(computed):
                 if not global_state["pc"] in list_of_additions:
                     list_of_additions[global_state["pc"]] = []
@@ -923,7 +1598,7 @@ def sym_exec_ins(params):
             elif isSymbolic(first) and isReal(second):
                 second = BitVecVal(second, 256)
             computed = first * second & UNSIGNED_BOUND_NUMBER
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = normalize(computed)
             if isReal(computed):
                 if not global_state["pc"] in list_of_multiplications:
                     list_of_multiplications[global_state["pc"]] = []
@@ -938,15 +1613,11 @@ def sym_exec_ins(params):
             global_state["pc"] = global_state["pc"] + 1
             first = stack.pop(0)
             second = stack.pop(0)
-            if isReal(first) and isSymbolic(second):
-                first = BitVecVal(first, 256)
-                computed = first - second
-            elif isSymbolic(first) and isReal(second):
-                second = BitVecVal(second, 256)
-                computed = first - second
+            if isReal(first) != isReal(second):
+                computed = bv_sub(first, second)
             else:
                 computed = (first - second) % (2 ** 256)
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -962,6 +1633,9 @@ def sym_exec_ins(params):
                     first = to_unsigned(first)
                     second = to_unsigned(second)
                     computed = first / second
+            elif isReal(second):
+                # a concrete divisor needs no solver query
+                computed = 0 if second == 0 else UDiv(first, to_symbolic(second))
             else:
                 first = to_symbolic(first)
                 second = to_symbolic(second)
@@ -972,7 +1646,7 @@ def sym_exec_ins(params):
                 else:
                     computed = UDiv(first, second)
                 solver.pop()
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1004,8 +1678,7 @@ def sym_exec_ins(params):
                     if check_solver(solver) == unsat:
                         computed = -2**255
                     else:
-                        s = Solver()
-                        s.set("timeout", global_params.TIMEOUT)
+                        s = make_solver()
                         s.add(first / second < 0)
                         sign = -1 if check_solver(s) == sat else 1
                         z3_abs = lambda x: If(x >= 0, x, -x)
@@ -1014,7 +1687,7 @@ def sym_exec_ins(params):
                         computed = sign * (first / second)
                     solver.pop()
                 solver.pop()
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1030,6 +1703,8 @@ def sym_exec_ins(params):
                     first = to_unsigned(first)
                     second = to_unsigned(second)
                     computed = first % second & UNSIGNED_BOUND_NUMBER
+            elif isReal(second):
+                computed = 0 if second == 0 else URem(first, to_symbolic(second))
             else:
                 first = to_symbolic(first)
                 second = to_symbolic(second)
@@ -1041,7 +1716,7 @@ def sym_exec_ins(params):
                 else:
                     computed = URem(first, second)
                 solver.pop()
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1077,7 +1752,7 @@ def sym_exec_ins(params):
                     second = z3_abs(second)
                     computed = sign * (first % second)
                 solver.pop()
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1107,7 +1782,7 @@ def sym_exec_ins(params):
                     computed = (first + second) % third
                     computed = Extract(255, 0, computed)
                 solver.pop()
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1137,8 +1812,7 @@ def sym_exec_ins(params):
                     computed = URem(first * second, third)
                     computed = Extract(255, 0, computed)
                 solver.pop()
-            computed = simplify(computed) if is_expr(computed) else computed
-            instruction_object.data_out = [computed]
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1155,7 +1829,7 @@ def sym_exec_ins(params):
                 # not supported in bit-vector theory
                 new_var_name = gen.gen_arbitrary_var()
                 computed = BitVec(new_var_name, 256)
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1190,8 +1864,7 @@ def sym_exec_ins(params):
                         computed = second & ((1 << signbit_index_from_right) - 1)
                     solver.pop()
                 solver.pop()
-            computed = simplify(computed) if is_expr(computed) else computed
-            instruction_object.data_out = [computed]
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1211,8 +1884,8 @@ def sym_exec_ins(params):
                 else:
                     computed = 0
             else:
-                computed = If(ULT(first, second), BitVecVal(1, 256), BitVecVal(0, 256))
-            computed = simplify(computed) if is_expr(computed) else computed
+                computed = bool_to_bv(bv_ult(first, second))
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1229,8 +1902,8 @@ def sym_exec_ins(params):
                 else:
                     computed = 0
             else:
-                computed = If(UGT(first, second), BitVecVal(1, 256), BitVecVal(0, 256))
-            computed = simplify(computed) if is_expr(computed) else computed
+                computed = bool_to_bv(bv_ugt(first, second))
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1247,8 +1920,8 @@ def sym_exec_ins(params):
                 else:
                     computed = 0
             else:
-                computed = If(first < second, BitVecVal(1, 256), BitVecVal(0, 256))
-            computed = simplify(computed) if is_expr(computed) else computed
+                computed = bool_to_bv(bv_slt(first, second))
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1265,8 +1938,8 @@ def sym_exec_ins(params):
                 else:
                     computed = 0
             else:
-                computed = If(first > second, BitVecVal(1, 256), BitVecVal(0, 256))
-            computed = simplify(computed) if is_expr(computed) else computed
+                computed = bool_to_bv(bv_sgt(first, second))
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1281,8 +1954,8 @@ def sym_exec_ins(params):
                 else:
                     computed = 0
             else:
-                computed = If(first == second, BitVecVal(1, 256), BitVecVal(0, 256))
-            computed = simplify(computed) if is_expr(computed) else computed
+                computed = bool_to_bv(bv_eq(first, second))
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1299,8 +1972,8 @@ def sym_exec_ins(params):
                 else:
                     computed = 0
             else:
-                computed = If(flag == 0, BitVecVal(1, 256), BitVecVal(0, 256))
-            computed = simplify(computed) if is_expr(computed) else computed
+                computed = bool_to_bv(bv_eq(flag, 0))
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1308,8 +1981,8 @@ def sym_exec_ins(params):
         if len(stack) > 1:
             first = stack.pop(0)
             second = stack.pop(0)
-            computed = first & second
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = bv_and(first, second) if isSymbolic(first) or isSymbolic(second) else first & second
+            computed = normalize(computed)
             if (isReal(first) and hex(first) == "0xff") or (isReal(second) and hex(second) == "0xff"):
                 if not global_state["pc"] in list_of_vars:
                      list_of_vars[global_state["pc"]] = []
@@ -1326,8 +1999,8 @@ def sym_exec_ins(params):
             global_state["pc"] = global_state["pc"] + 1
             first = stack.pop(0)
             second = stack.pop(0)
-            computed = first | second
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = bv_or(first, second) if isSymbolic(first) or isSymbolic(second) else first | second
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1336,8 +2009,8 @@ def sym_exec_ins(params):
             global_state["pc"] = global_state["pc"] + 1
             first = stack.pop(0)
             second = stack.pop(0)
-            computed = first ^ second
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = bv_xor(first, second) if isSymbolic(first) or isSymbolic(second) else first ^ second
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1345,8 +2018,8 @@ def sym_exec_ins(params):
         if len(stack) > 0:
             global_state["pc"] = global_state["pc"] + 1
             first = stack.pop(0)
-            computed = (~first) & UNSIGNED_BOUND_NUMBER
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = bv_not(first) if isSymbolic(first) else (~first) & UNSIGNED_BOUND_NUMBER
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1363,6 +2036,13 @@ def sym_exec_ins(params):
                 else:
                     computed = second & (255 << (8 * byte_index))
                     computed = computed >> (8 * byte_index)
+            elif isReal(first):
+                # a concrete index needs no solver query
+                if first >= 32 or first < 0:
+                    computed = 0
+                else:
+                    computed = second & (255 << (8 * byte_index))
+                    computed = computed >> (8 * byte_index)
             else:
                 first = to_symbolic(first)
                 second = to_symbolic(second)
@@ -1374,7 +2054,7 @@ def sym_exec_ins(params):
                     computed = second & (255 << (8 * byte_index))
                     computed = computed >> (8 * byte_index)
                 solver.pop()
-            computed = simplify(computed) if is_expr(computed) else computed
+            computed = normalize(computed)
             stack.insert(0, computed)
         else:
             raise ValueError('STACK underflow')
@@ -1396,27 +2076,24 @@ def sym_exec_ins(params):
                         symbolic = True
                     else:
                         input += binascii.unhexlify('%064x' % value)
-                if input in sha3_list:
+                if not symbolic:
+                    # concrete hashes are cached for the whole process instead of for each path
+                    stack.insert(0, get_keccak_cache().keccak(input))
+                elif input in sha3_list:
                     stack.insert(0, sha3_list[input])
                 else:
-                    if symbolic:
-                        new_var_name = ""
-                        for i in reversed(range(s1/32)):
-                            if is_expr(mem[s0+i*32]):
-                                new_var_name += str(get_vars(mem[s0+i*32])[0])
-                            else:
-                                new_var_name += str(mem[s0+i*32])
-                            if i != 0:
-                                new_var_name += "_"
-                        new_var = BitVec(new_var_name, 256)
-                        sha3_list[input] = new_var
-                        path_conditions_and_vars[new_var_name] = new_var
-                        stack.insert(0, new_var)
-                    else:
-                        hash = sha3.keccak_256(input).hexdigest()
-                        new_var = int(hash, 16)
-                        sha3_list[input] = new_var
-                        stack.insert(0, new_var)
+                    new_var_name = ""
+                    for i in reversed(range(s1/32)):
+                        if is_expr(mem[s0+i*32]):
+                            new_var_name += str(get_vars(mem[s0+i*32])[0])
+                        else:
+                            new_var_name += str(mem[s0+i*32])
+                        if i != 0:
+                            new_var_name += "_"
+                    new_var = BitVec(new_var_name, 256)
+                    sha3_list[input] = new_var
+                    path_conditions_and_vars[new_var_name] = new_var
+                    stack.insert(0, new_var)
             else:
                 new_var_name = gen.gen_arbitrary_var()
                 new_var = BitVec(new_var_name, 256)
@@ -1444,7 +2121,7 @@ def sym_exec_ins(params):
                 if new_var_name in path_conditions_and_vars:
                     balance = path_conditions_and_vars[new_var_name]
                 else:
-                    balance = BitVec(new_var_name, 256)
+                    balance = bv_var(new_var_name)
                     path_conditions_and_vars[new_var_name] = balance
                     if path_conditions_and_vars["Ia"] in get_vars(address):
                         path_conditions_and_vars["path_condition"].append(balance > 0)
@@ -1504,6 +2181,8 @@ def sym_exec_ins(params):
             else:
                 new_var = BitVec(new_var_name, 256)
                 path_conditions_and_vars[new_var_name] = new_var
+            if isReal(position):
+                data_var_positions[new_var_name] = position
             stack.insert(0, new_var)
             global_state["pc"] = global_state["pc"] + 1
         else:
@@ -1544,7 +2223,7 @@ def sym_exec_ins(params):
             current_miu_i = global_state["miu_i"]
 
             if isAllReal(mem_location, current_miu_i, code_from, no_bytes):
-                temp = long(math.ceil((mem_location + no_bytes) / float(32)))
+                temp = ceil32(mem_location + no_bytes) // 32
                 if temp > current_miu_i:
                     current_miu_i = temp
 
@@ -1557,7 +2236,7 @@ def sym_exec_ins(params):
                     start = code_from * 2
                     end = start + no_bytes * 2
                     code = evm[start: end]
-                mem[mem_location] = int(code, 16)
+                mem.store_word(mem_location, int(code, 16))
             else:
                 new_var_name = gen.gen_code_var("Ia", code_from, no_bytes)
                 if new_var_name in path_conditions_and_vars:
@@ -1575,7 +2254,7 @@ def sym_exec_ins(params):
                     current_miu_i = If(expression, temp, current_miu_i)
                 solver.pop()
                 mem.clear() # very conservative
-                mem[str(mem_location)] = new_var
+                mem.store_word(mem_location, new_var)
             global_state["miu_i"] = current_miu_i
         else:
             raise ValueError('STACK underflow')
@@ -1610,7 +2289,7 @@ def sym_exec_ins(params):
             current_miu_i = global_state["miu_i"]
 
             if isAllReal(address, mem_location, current_miu_i, code_from, no_bytes) and USE_GLOBAL_BLOCKCHAIN:
-                temp = long(math.ceil((mem_location + no_bytes) / float(32)))
+                temp = ceil32(mem_location + no_bytes) // 32
                 if temp > current_miu_i:
                     current_miu_i = temp
 
@@ -1618,7 +2297,7 @@ def sym_exec_ins(params):
                 start = code_from * 2
                 end = start + no_bytes * 2
                 code = evm[start: end]
-                mem[mem_location] = int(code, 16)
+                mem.store_word(mem_location, int(code, 16))
             else:
                 new_var_name = gen.gen_code_var(address, code_from, no_bytes)
                 if new_var_name in path_conditions_and_vars:
@@ -1636,7 +2315,7 @@ def sym_exec_ins(params):
                     current_miu_i = If(expression, temp, current_miu_i)
                 solver.pop()
                 mem.clear() # very conservative
-                mem[str(mem_location)] = new_var
+                mem.store_word(mem_location, new_var)
             global_state["miu_i"] = current_miu_i
         else:
             raise ValueError('STACK underflow')
@@ -1698,11 +2377,11 @@ def sym_exec_ins(params):
             global_state["pc"] = global_state["pc"] + 1
             address = stack.pop(0)
             current_miu_i = global_state["miu_i"]
-            if isAllReal(address, current_miu_i) and address in mem:
-                temp = long(math.ceil((address + 32) / float(32)))
+            value = mem.load_word(address) if isAllReal(address, current_miu_i) and not mem.may_alias() else None
+            if value is not None:
+                temp = ceil32(address + 32) // 32
                 if temp > current_miu_i:
                     current_miu_i = temp
-                value = mem[address]
                 stack.insert(0, value)
                 log.debug("temp: " + str(temp))
                 log.debug("current_miu_i: " + str(current_miu_i))
@@ -1716,7 +2395,11 @@ def sym_exec_ins(params):
                     # this means that it is possibly that current_miu_i < temp
                 #    current_miu_i = If(expression,temp,current_miu_i)
                 #solver.pop()
-                if address in mem:
+                if mem.array is not None and isSymbolic(address):
+                    stack.insert(0, load_symbolic_memory(address, mem, path_conditions_and_vars))
+                elif mem.may_alias():
+                    stack.insert(0, simplify_expr(Select(mem.array, address)))
+                elif address in mem:
                     value = mem[address]
                     stack.insert(0, value)
                 else:
@@ -1725,7 +2408,7 @@ def sym_exec_ins(params):
                         path_conditions_and_vars[new_var_name] = BitVec(new_var_name, 256)
                     new_var = path_conditions_and_vars[new_var_name]
                     stack.insert(0, new_var)
-                    mem[address] = new_var
+                    mem.store_word(address, new_var)
                 log.debug("temp: " + str(temp))
                 log.debug("current_miu_i: " + str(current_miu_i))
             global_state["miu_i"] = current_miu_i
@@ -1737,21 +2420,13 @@ def sym_exec_ins(params):
             stored_address = stack.pop(0)
             stored_value = stack.pop(0)
             current_miu_i = global_state["miu_i"]
-            if isReal(stored_address):
-                # preparing data for hashing later
-                old_size = len(memory) // 32
-                new_size = ceil32(stored_address + 32) // 32
-                mem_extend = (new_size - old_size) * 32
-                memory.extend([0] * mem_extend)
-                value = stored_value
-                for i in range(31, -1, -1):
-                    memory[stored_address + i] = value % 256
-                    value /= 256
+            if mem.array is not None and isSymbolic(stored_address):
+                stored_address = concretize_if_unique(stored_address, path_conditions_and_vars["path_condition"])
             if isAllReal(stored_address, current_miu_i):
-                temp = long(math.ceil((stored_address + 32) / float(32)))
+                temp = ceil32(stored_address + 32) // 32
                 if temp > current_miu_i:
                     current_miu_i = temp
-                mem[stored_address] = stored_value  # note that the stored_value could be symbolic
+                mem.store_word(stored_address, stored_value)  # note that the stored_value could be symbolic
                 log.debug("temp: " + str(temp))
                 log.debug("current_miu_i: " + str(current_miu_i))
             else:
@@ -1767,7 +2442,7 @@ def sym_exec_ins(params):
                 #    current_miu_i = If(expression,temp,current_miu_i)
                 #solver.pop()
                 #mem.clear()  # very conservative
-                mem[stored_address] = stored_value
+                mem.store_word(stored_address, stored_value)
                 log.debug("temp: " + str(temp))
                 log.debug("current_miu_i: " + str(current_miu_i))
             global_state["miu_i"] = current_miu_i
@@ -1780,11 +2455,13 @@ def sym_exec_ins(params):
             temp_value = stack.pop(0)
             stored_value = temp_value % 256  # get the least byte
             current_miu_i = global_state["miu_i"]
+            if mem.array is not None and isSymbolic(stored_address):
+                stored_address = concretize_if_unique(stored_address, path_conditions_and_vars["path_condition"])
             if isAllReal(stored_address, current_miu_i):
-                temp = long(math.ceil((stored_address + 1) / float(32)))
+                temp = ceil32(stored_address + 1) // 32
                 if temp > current_miu_i:
                     current_miu_i = temp
-                mem[stored_address] = stored_value  # note that the stored_value could be symbolic
+                mem.store_byte(stored_address, stored_value)  # note that the stored_value could be symbolic
             else:
                 temp = (stored_address / 32) + 1
                 if isReal(current_miu_i):
@@ -1796,7 +2473,7 @@ def sym_exec_ins(params):
                     # this means that it is possibly that current_miu_i < temp
                     current_miu_i = If(expression,temp,current_miu_i)
                 solver.pop()
-                mem[stored_address] = stored_value
+                mem.store_byte(stored_address, stored_value)
                 #mem.clear()  # very conservative
             global_state["miu_i"] = current_miu_i
         else:
@@ -1805,20 +2482,11 @@ def sym_exec_ins(params):
         if len(stack) > 0:
             address = stack.pop(0)
             if is_expr(address):
-                address = simplify(address)
-            if address in global_state["Ia"]:
-                value = global_state["Ia"][address]
-                stack.insert(0, value)
+                address = simplify_expr(address)
+            if global_params.SYMBOLIC_ARRAYS and is_expr(address) and not is_bv_value(address):
+                stack.insert(0, load_symbolic_storage(address, global_state, path_conditions_and_vars))
             else:
-                new_var_name = gen.gen_owner_store_var(address)
-                if not new_var_name in path_conditions_and_vars:
-                    if address.__class__.__name__ == "BitVecNumRef":
-                        address = address.as_long()
-                    else:
-                        path_conditions_and_vars[new_var_name] = BitVec(new_var_name, 256)
-                new_var = path_conditions_and_vars[new_var_name]
-                stack.insert(0, new_var)
-                global_state["Ia"][address] = new_var
+                stack.insert(0, load_storage(address, global_state, path_conditions_and_vars))
             global_state["pc"] = global_state["pc"] + 1
         else:
             raise ValueError('STACK underflow')
@@ -1827,21 +2495,26 @@ def sym_exec_ins(params):
         if len(stack) > 1:
             stored_address = stack.pop(0)
             stored_value = stack.pop(0)
-            sstore = {}
-            sstore["block"]              = params.block
-            sstore["pc"]                 = global_state["pc"]
-            sstore["address"]            = stored_address
-            sstore["value"]              = stored_value
-            if stored_address in global_state["Ia"]:
-                sstore["variable"]       = global_state["Ia"][stored_address]
-            else:
-                sstore["variable"]       = BitVec(gen.gen_owner_store_var(stored_address), 256)
-            sstore["path_condition"]     = path_conditions_and_vars["path_condition"]
-            sstore["function_signature"] = get_function_signature_from_path_condition(sstore["path_condition"])
-            if not sstore in list_of_sstores:
-                list_of_sstores.append(sstore)
+            if global_params.SYMBOLIC_ARRAYS and is_expr(stored_address) and not is_bv_value(stored_address):
+                stored_address = concretize_if_unique(stored_address, path_conditions_and_vars["path_condition"])
+            if is_pass_enabled("honeypot"):
+                sstore = {}
+                sstore["block"]              = params.block
+                sstore["pc"]                 = global_state["pc"]
+                sstore["address"]            = stored_address
+                sstore["value"]              = stored_value
+                if stored_address in global_state["Ia"]:
+                    sstore["variable"]       = global_state["Ia"][stored_address]
+                else:
+                    sstore["variable"]       = bv_var(gen.gen_owner_store_var(stored_address))
+                sstore["path_condition"]     = path_conditions_and_vars["path_condition"]
+                sstore["function_signature"] = get_function_signature_from_path_condition(sstore["path_condition"])
+                if not sstore in list_of_sstores:
+                    list_of_sstores.append(sstore)
             global_state["pc"] = global_state["pc"] + 1
             global_state["Ia"][stored_address] = stored_value
+            if global_params.SYMBOLIC_ARRAYS:
+                global_state["storage_array"] = Store(global_state["storage_array"], stored_address, stored_value)
         else:
             raise ValueError('STACK underflow')
     elif instr_parts[0] == "JUMP":
@@ -1849,7 +2522,7 @@ def sym_exec_ins(params):
             target_address = stack.pop(0)
             if isSymbolic(target_address):
                 try:
-                    target_address = int(str(simplify(target_address)))
+                    target_address = int(str(simplify_expr(target_address)))
                 except:
                     raise TypeError("Target address must be an integer: "+str(target_address))
             vertices[start].set_jump_target(target_address)
@@ -1863,7 +2536,7 @@ def sym_exec_ins(params):
             target_address = stack.pop(0)
             if isSymbolic(target_address):
                 try:
-                    target_address = int(str(simplify(target_address)))
+                    target_address = int(str(simplify_expr(target_address)))
                 except:
                     raise TypeError("Target address must be an integer: "+str(target_address))
             vertices[start].set_jump_target(target_address)
@@ -1975,23 +2648,24 @@ def sym_exec_ins(params):
             size_data_input = stack.pop(0)
             start_data_output = stack.pop(0)
             size_data_ouput = stack.pop(0)
-            call = {}
-            call["path_condition"]     = copy.deepcopy(path_conditions_and_vars["path_condition"])
-            call["function_signature"] = get_function_signature_from_path_condition(call["path_condition"])
-            call["recipient"]          = recipient
-            call["value"]              = transfer_amount
-            call["input_offset"]       = start_data_input
-            call["input_size"]         = size_data_input
-            call["memory"]             = mem
-            call["block"]              = params.block
-            call["type"]               = "CALL"
-            call["gas"]                = outgas
-            call["pc"]                 = global_state["pc"]
-            call["id"]                 = len(list_of_calls)
-            if not total_no_of_paths in list_of_calls:
-                list_of_calls[total_no_of_paths] = []
-            if call not in list_of_calls[total_no_of_paths]:
-                list_of_calls[total_no_of_paths].append(call)
+            if is_pass_enabled("honeypot"):
+                call = {}
+                call["path_condition"]     = copy.deepcopy(path_conditions_and_vars["path_condition"])
+                call["function_signature"] = get_function_signature_from_path_condition(call["path_condition"])
+                call["recipient"]          = recipient
+                call["value"]              = transfer_amount
+                call["input_offset"]       = start_data_input
+                call["input_size"]         = size_data_input
+                call["memory"]             = mem.copy()
+                call["block"]              = params.block
+                call["type"]               = "CALL"
+                call["gas"]                = outgas
+                call["pc"]                 = global_state["pc"]
+                call["id"]                 = len(list_of_calls)
+                if not params.path_id in list_of_calls:
+                    list_of_calls[params.path_id] = []
+                if call not in list_of_calls[params.path_id]:
+                    list_of_calls[params.path_id].append(call)
             # in the paper, it is shaky when the size of data output is
             # min of stack[6] and the | o |
             if isReal(transfer_amount) and transfer_amount == 0:
@@ -2010,10 +2684,10 @@ def sym_exec_ins(params):
                     # the execution is possibly okay
                     stack.insert(0, 1)   # x = 1
                     solver.pop()
-                    solver.add(is_enough_fund)
-                    path_conditions_and_vars["path_condition"].append(is_enough_fund)
+                    add_path_constraint(path_conditions_and_vars, is_enough_fund)
                     last_idx = len(path_conditions_and_vars["path_condition"]) - 1
-                    analysis["time_dependency_bug"][last_idx] = global_state["pc"] - 1
+                    if is_pass_enabled("time_dependency"):
+                        analysis["time_dependency_bug"][last_idx] = global_state["pc"] - 1
                     new_balance_ia = (balance_ia - transfer_amount)
                     global_state["balance"]["Ia"] = new_balance_ia
                     address_is = path_conditions_and_vars["Is"]
@@ -2035,8 +2709,7 @@ def sym_exec_ins(params):
                         old_balance = BitVec(old_balance_name, 256)
                         path_conditions_and_vars[old_balance_name] = old_balance
                         constraint = (old_balance >= 0)
-                        solver.add(constraint)
-                        path_conditions_and_vars["path_condition"].append(constraint)
+                        add_path_constraint(path_conditions_and_vars, constraint)
                         new_balance = (old_balance + transfer_amount)
                         global_state["balance"][new_address_name] = new_balance
             global_state["pc"] = global_state["pc"] + 1
@@ -2074,10 +2747,10 @@ def sym_exec_ins(params):
                 # the execution is possibly okay
                 stack.insert(0, 1)   # x = 1
                 solver.pop()
-                solver.add(is_enough_fund)
-                path_conditions_and_vars["path_condition"].append(is_enough_fund)
+                add_path_constraint(path_conditions_and_vars, is_enough_fund)
                 last_idx = len(path_conditions_and_vars["path_condition"]) - 1
-                analysis["time_dependency_bug"][last_idx]
+                if is_pass_enabled("time_dependency"):
+                    analysis["time_dependency_bug"][last_idx] = global_state["pc"] - 1
         else:
             raise ValueError('STACK underflow')
     elif instr_parts[0] == "DELEGATECALL" or instr_parts[0] == "STATICCALL":
@@ -2089,23 +2762,24 @@ def sym_exec_ins(params):
             size_data_input = stack.pop(0)
             start_data_output = stack.pop(0)
             size_data_ouput = stack.pop(0)
-            call = {}
-            call["path_condition"]     = path_conditions_and_vars["path_condition"]
-            call["function_signature"] = get_function_signature_from_path_condition(call["path_condition"])
-            call["recipient"]          = recipient
-            call["value"]              = None
-            call["input_offset"]       = start_data_input
-            call["input_size"]         = size_data_input
-            call["memory"]             = mem
-            call["block"]              = params.block
-            call["type"]               = instr_parts[0]
-            call["gas"]                = outgas
-            call["pc"]                 = global_state["pc"]
-            call["id"]                 = len(list_of_calls)
-            if not total_no_of_paths in list_of_calls:
-                list_of_calls[total_no_of_paths] = []
-            if not call in list_of_calls[total_no_of_paths]:
-                list_of_calls[total_no_of_paths].append(call)
+            if is_pass_enabled("honeypot"):
+                call = {}
+                call["path_condition"]     = path_conditions_and_vars["path_condition"]
+                call["function_signature"] = get_function_signature_from_path_condition(call["path_condition"])
+                call["recipient"]          = recipient
+                call["value"]              = None
+                call["input_offset"]       = start_data_input
+                call["input_size"]         = size_data_input
+                call["memory"]             = mem.copy()
+                call["block"]              = params.block
+                call["type"]               = instr_parts[0]
+                call["gas"]                = outgas
+                call["pc"]                 = global_state["pc"]
+                call["id"]                 = len(list_of_calls)
+                if not params.path_id in list_of_calls:
+                    list_of_calls[params.path_id] = []
+                if not call in list_of_calls[params.path_id]:
+                    list_of_calls[params.path_id].append(call)
             new_var_name = gen.gen_arbitrary_var()
             new_var = BitVec(new_var_name, 256)
             stack.insert(0, new_var)
@@ -2125,15 +2799,16 @@ def sym_exec_ins(params):
         suicidal = True
         recipient = stack.pop(0)
         transfer_amount = global_state["balance"]["Ia"]
-        suicide = {}
-        suicide["path_condition"]     = path_conditions_and_vars["path_condition"]
-        suicide["function_signature"] = get_function_signature_from_path_condition(suicide["path_condition"])
-        suicide["recipient"]          = recipient
-        suicide["value"]              = transfer_amount
-        suicide["block"]              = params.block
-        suicide["pc"]                 = global_state["pc"]
-        if suicide not in list_of_suicides:
-            list_of_suicides.append(suicide)
+        if is_pass_enabled("honeypot"):
+            suicide = {}
+            suicide["path_condition"]     = path_conditions_and_vars["path_condition"]
+            suicide["function_signature"] = get_function_signature_from_path_condition(suicide["path_condition"])
+            suicide["recipient"]          = recipient
+            suicide["value"]              = transfer_amount
+            suicide["block"]              = params.block
+            suicide["pc"]                 = global_state["pc"]
+            if suicide not in list_of_suicides:
+                list_of_suicides.append(suicide)
         global_state["balance"]["Ia"] = 0
         if isReal(recipient):
             new_address_name = "concrete_address_" + str(recipient)
@@ -2143,8 +2818,7 @@ def sym_exec_ins(params):
         old_balance = BitVec(old_balance_name, 256)
         path_conditions_and_vars[old_balance_name] = old_balance
         constraint = (old_balance >= 0)
-        solver.add(constraint)
-        path_conditions_and_vars["path_condition"].append(constraint)
+        add_path_constraint(path_conditions_and_vars, constraint)
         new_balance = (old_balance + transfer_amount)
         global_state["balance"][new_address_name] = new_balance
         global_state["pc"] = global_state["pc"] + 1
@@ -2156,11 +2830,199 @@ def sym_exec_ins(params):
         print("UNKNOWN INSTRUCTION: " + instr_parts[0])
         raise Exception('UNKNOWN INSTRUCTION: ' + instr_parts[0])
 
+    if global_params.CONCRETIZATION_SIZE and stack and is_expr(stack[0]):
+        apply_concretization_policy(stack, path_conditions_and_vars, pc, instr_parts[0])
+
     try:
         print_state(stack, mem, global_state)
     except:
         log.debug("Error: Debugging states")
 
+########################################################
+#                     Fork server                      #
+########################################################
+
+# Explores a branch in a forked worker process, the parent returns immediately
+def sym_exec_block_in_worker(params):
+    global solver_service
+
+    log_file.flush()
+    mark = snapshot_records(params.path_id)
+    if fork_server.fork():
+        return
+    # the threads of the solver service do not survive the fork
+    solver_service = None
+    if budget_scheduler:
+        budget_scheduler.fork()
+    try:
+        # pending alarms are not inherited by the child
+        if hasattr(signal, 'SIGALRM'):
+            remaining = global_params.GLOBAL_TIMEOUT - (time.time() - start_time)
+            signal.alarm(max(1, int(math.ceil(remaining))))
+        explore(params)
+    except Exception as e:
+        log_file.write(str(e))
+        if global_params.DEBUG_MODE:
+            traceback.print_exc()
+    finally:
+        if callable(getattr(signal, "alarm", None)):
+            signal.alarm(0)
+        log_file.flush()
+        fork_server.report_and_exit(lambda: collect_records(mark))
+
+# Remember how many records exist before forking, so that a worker only reports what it found.
+# The worker starts with the path first_path_id, every path it creates gets a larger id.
+def snapshot_records(first_path_id):
+    return {
+        "path_id":        first_path_id,
+        "paths":          total_no_of_paths,
+        "pruned_paths":   no_of_pruned_paths,
+        "terminals":      len(terminals),
+        "sstores":        len(list_of_sstores),
+        "suicides":       len(list_of_suicides),
+        "structs":        len(list_of_structs),
+        "calls":          dict((index, len(list_of_calls[index])) for index in list_of_calls),
+        "functions":      dict((signature, len(list_of_functions[signature])) for signature in list_of_functions),
+        "vars":           dict((pc, len(list_of_vars[pc])) for pc in list_of_vars),
+        "keccak":         get_keccak_cache().get_stats(),
+        "expr_cache":     get_expr_cache().get_stats(),
+        "opcode_stats":   dict((opcode, list(stats)) for opcode, stats in opcode_stats.items()),
+        "solver_time":    solver_time,
+        "narrowing":      get_width_narrowing().get_stats(),
+        "portfolio":      portfolio.get_stats(),
+        "timeouts":       get_timeout_policy().get_stats(),
+        "query_cache":    get_query_cache().get_stats(),
+        "conflict_sets":  conflict_sets.get_stats(),
+        "concretizations": len(concretizations),
+        "abstract_domain": abstract_domain.get_stats(),
+        "prepass":        prepass.get_stats() if prepass else None
+    }
+
+def collect_records(mark):
+    # the results the worker stored in the query cache are written before it exits
+    get_query_cache().flush()
+    return {
+        "first_path":        mark["path_id"],
+        "paths":             total_no_of_paths - mark["paths"],
+        "terminals":         terminals[mark["terminals"]:],
+        "sstores":           list_of_sstores[mark["sstores"]:],
+        "suicides":          list_of_suicides[mark["suicides"]:],
+        "structs":           list_of_structs[mark["structs"]:],
+        "calls":             dict((index, list_of_calls[index][mark["calls"].get(index, 0):]) for index in list_of_calls if index >= mark["path_id"]),
+        "execution_paths":   dict((index, execution_paths[index]) for index in execution_paths if index >= mark["path_id"]),
+        "functions":         dict((signature, list_of_functions[signature][mark["functions"].get(signature, 0):]) for signature in list_of_functions),
+        "vars":              dict((pc, list_of_vars[pc][mark["vars"].get(pc, 0):]) for pc in list_of_vars),
+        "comparisons":       list_of_comparisons,
+        "multiplications":   list_of_multiplications,
+        "additions":         list_of_additions,
+        "visited_pcs":       visited_pcs,
+        "feasible_blocks":   feasible_blocks,
+        "infeasible_blocks": infeasible_blocks,
+        "edges":             edges,
+        "account_balance":   account_balance,
+        "suicidal":          suicidal,
+        "timeout":           g_timeout,
+        "pruned_blocks":     pruned_blocks,
+        "pruned_paths":      no_of_pruned_paths - mark["pruned_paths"],
+        "budgets":           budget_scheduler.get_worker_stats() if budget_scheduler else {},
+        "keccak":            dict((key, value - mark["keccak"][key]) for key, value in get_keccak_cache().get_stats().items()),
+        "expr_cache":        dict((key, value - mark["expr_cache"][key]) for key, value in get_expr_cache().get_stats().items()),
+        "opcode_stats":      dict((opcode, [stats[i] - mark["opcode_stats"].get(opcode, [0, 0])[i] for i in range(2)]) for opcode, stats in opcode_stats.items()),
+        "solver_time":       solver_time - mark["solver_time"],
+        "narrowing":         dict((key, value - mark["narrowing"][key]) for key, value in get_width_narrowing().get_stats().items()),
+        "portfolio":         portfolio.diff_stats(portfolio.get_stats(), mark["portfolio"]),
+        "timeouts":          get_timeout_policy().diff_stats(mark["timeouts"]),
+        "query_cache":       dict((key, value - mark["query_cache"][key]) for key, value in get_query_cache().get_stats().items()),
+        "conflict_sets":     dict((key, value - mark["conflict_sets"][key]) for key, value in conflict_sets.get_stats().items()),
+        "concretizations":   concretizations[mark["concretizations"]:],
+        "abstract_domain":   dict((key, value - mark["abstract_domain"][key]) for key, value in abstract_domain.get_stats().items()),
+        "prepass":           dict((key, value - mark["prepass"][key]) for key, value in prepass.get_stats().items()) if prepass else None
+    }
+
+# Merge the records of a worker, its paths are renumbered after all the paths known so far
+def merge_worker_records(records):
+    global total_no_of_paths
+    global solver_time
+    global last_path_id
+    global no_of_pruned_paths
+    global account_balance
+    global suicidal
+    global g_timeout
+
+    base = max([last_path_id] + execution_paths.keys() + list_of_calls.keys()) + 1
+    offset = base - records["first_path"]
+
+    for index in records["execution_paths"]:
+        execution_paths[index + offset] = records["execution_paths"][index]
+        last_path_id = max(last_path_id, index + offset)
+    for index in records["calls"]:
+        if records["calls"][index]:
+            list_of_calls.setdefault(index + offset, []).extend(records["calls"][index])
+            last_path_id = max(last_path_id, index + offset)
+    total_no_of_paths += records["paths"]
+    no_of_pruned_paths += records["pruned_paths"]
+    pruned_blocks.update(records["pruned_blocks"])
+
+    terminals.extend(records["terminals"])
+    for sstore in records["sstores"]:
+        if not sstore in list_of_sstores:
+            list_of_sstores.append(sstore)
+    for suicide in records["suicides"]:
+        if not suicide in list_of_suicides:
+            list_of_suicides.append(suicide)
+    for struct in records["structs"]:
+        if not struct in list_of_structs:
+            list_of_structs.append(struct)
+    for signature in records["functions"]:
+        list_of_functions.setdefault(signature, []).extend(records["functions"][signature])
+    for pc in records["vars"]:
+        list_of_vars.setdefault(pc, []).extend(records["vars"][pc])
+    for comparison in records["comparisons"]:
+        if not comparison in list_of_comparisons:
+            list_of_comparisons[comparison] = records["comparisons"][comparison]
+    for (merged, reported) in [(list_of_multiplications, records["multiplications"]), (list_of_additions, records["additions"])]:
+        for pc in reported:
+            for value in reported[pc]:
+                if not value in merged.setdefault(pc, []):
+                    merged[pc].append(value)
+
+    visited_pcs.update(records["visited_pcs"])
+    for block in records["infeasible_blocks"]:
+        if not block in feasible_blocks and not block in infeasible_blocks:
+            infeasible_blocks.append(block)
+    for block in records["feasible_blocks"]:
+        if block in infeasible_blocks:
+            infeasible_blocks.remove(block)
+        if not block in feasible_blocks:
+            feasible_blocks.append(block)
+    for block in records["edges"]:
+        for target in records["edges"][block]:
+            if target not in edges.setdefault(block, []):
+                edges[block].append(target)
+
+    if records["account_balance"]:
+        account_balance = records["account_balance"]
+    suicidal = suicidal or records["suicidal"]
+    g_timeout = g_timeout or records["timeout"]
+    if budget_scheduler:
+        budget_scheduler.merge_stats(records["budgets"])
+    get_keccak_cache().merge_stats(records["keccak"])
+    get_expr_cache().merge_stats(records["expr_cache"])
+    for opcode in records["opcode_stats"]:
+        stats = opcode_stats.setdefault(opcode, [0, 0])
+        stats[0] += records["opcode_stats"][opcode][0]
+        stats[1] += records["opcode_stats"][opcode][1]
+    solver_time += records["solver_time"]
+    get_width_narrowing().merge_stats(records["narrowing"])
+    portfolio.merge_stats(records["portfolio"])
+    get_timeout_policy().merge_stats(records["timeouts"])
+    get_query_cache().merge_stats(records["query_cache"])
+    conflict_sets.merge_stats(records["conflict_sets"])
+    concretizations.extend(records["concretizations"])
+    abstract_domain.merge_stats(records["abstract_domain"])
+    if prepass:
+        prepass.merge_stats(records["prepass"])
+
 ########################################################
 #                      Heuristics                      #
 ########################################################
@@ -2171,14 +3033,13 @@ def sym_exec_ins(params):
 def detect_cash_flow():
     # Check if money could potentially go in
     money_flow_in = False
+    queries = []
     for terminal in terminals:
         if terminal["opcode"] != "REVERT":
-            s = Solver()
-            s.set("timeout", global_params.TIMEOUT)
-            s.add(terminal["path_condition"])
-            s.add(message_value > 0)
-            if s.check() == sat:
-                money_flow_in = True
+            queries.append(terminal["path_condition"] + [message_value > 0])
+    for result in check_all(queries):
+        if result == sat:
+            money_flow_in = True
 
     # Check if money could potentially go out
     money_flow_out = False
@@ -2252,7 +3113,7 @@ def detect_inheritance_disorder():
             if call["input_size"] == 0 and is_expr(call["value"]):
                 for condition in call["path_condition"]:
                     if is_expr(condition) and "==" in str(condition):
-                        separated_condition = remove_line_break_space(simplify(condition)).split("==")
+                        separated_condition = remove_line_break_space(simplify_expr(condition)).split("==")
                         if (("Ia_store" in separated_condition[0] or "0" in separated_condition[0]) and "Is" in separated_condition[1]) \
                         or (("Ia_store" in separated_condition[1] or "0" in separated_condition[1]) and "Is" in separated_condition[0]):
                             matches = re.compile("Ia_store_([0-9]+)\)").findall(remove_line_break_space(condition))
@@ -2367,8 +3228,8 @@ def detect_uninitialised_structs():
 #              H5: Type Deduction Overflow             #
 ########################################################
 def detect_type_deduction_overflow():
-    s = Solver()
-    s.set("timeout", global_params.TIMEOUT)
+    candidates = []
+    queries = []
     for index in list_of_calls:
         for call in list_of_calls[index]:
             if "Is" in str(call["recipient"]) and call["input_size"] == 0 and not is_expr(call["value"]) and call["value"] > 0:
@@ -2393,18 +3254,17 @@ def detect_type_deduction_overflow():
                                 path_conditions = copy.deepcopy(call["path_condition"])
                                 if False in path_conditions:
                                     path_conditions.remove(False)
-                                s.reset()
-                                s.add(path_conditions)
-                                s.add(message_value > 0)
-                                s.add(message_value != 0)
-                                if s.check() == sat:
-                                    heuristic = {}
-                                    heuristic["function_signature"] = call["function_signature"]
-                                    heuristic["block"]              = call["block"]
-                                    heuristic["type"]               = HeuristicTypes.TYPE_DEDUCTION_OVERFLOW
-                                    heuristic["pc"]                 = add_pc
-                                    if not heuristic in heuristics:
-                                        heuristics.append(heuristic)
+                                candidates.append((call, add_pc))
+                                queries.append(path_conditions + [message_value > 0, message_value != 0])
+    for (call, add_pc), result in zip(candidates, check_all(queries)):
+        if result == sat:
+            heuristic = {}
+            heuristic["function_signature"] = call["function_signature"]
+            heuristic["block"]              = call["block"]
+            heuristic["type"]               = HeuristicTypes.TYPE_DEDUCTION_OVERFLOW
+            heuristic["pc"]                 = add_pc
+            if not heuristic in heuristics:
+                heuristics.append(heuristic)
 
 ########################################################
 #             H6: Skip Empty String Literal            #
@@ -2432,6 +3292,8 @@ def detect_skip_empty_string_literal():
 #                H7: Hidden State Update               #
 ########################################################
 def detect_hidden_state_update():
+    candidates = []
+    queries = []
     for index in list_of_calls:
         for call in list_of_calls[index]:
             if call["input_size"] == 0 and "Is" in str(call["recipient"]) and (isReal(call["value"]) or str(call["value"]) == "balance_Ia"):
@@ -2439,11 +3301,11 @@ def detect_hidden_state_update():
                 for condition in call["path_condition"]:
                     if not any(value in str(condition) for value in ["balance_Ia > 0", "balance_Ia == balance_Ia + Iv"]):
                         new_path_conditions.append(condition)
-                s = Solver()
-                s.set("timeout", global_params.TIMEOUT)
-                s.add(new_path_conditions)
-                if s.check() == sat:
-                    check_if_path_conditions_depend_on_storage(call, [], 0)
+                candidates.append(call)
+                queries.append(new_path_conditions)
+    for call, result in zip(candidates, check_all(queries)):
+        if result == sat:
+            check_if_path_conditions_depend_on_storage(call, [], 0)
 
 def get_function_signature_from_path_condition(path_condition):
     for condition in path_condition:
@@ -2455,7 +3317,7 @@ def get_function_signature_from_path_condition(path_condition):
 
 def extract_storage_location_range(condition, variable):
     if is_expr(condition):
-        matches = re.compile("Extract\((.+?), (.+?), "+str(variable)+"\)").findall(str(simplify(condition)))
+        matches = re.compile("Extract\((.+?), (.+?), "+str(variable)+"\)").findall(str(simplify_expr(condition)))
         if matches:
             return matches[0]
     return None
@@ -2465,8 +3327,7 @@ def check_if_path_conditions_depend_on_storage(origin, visitedx, depth):
     for condition in origin["path_condition"]:
         if "Iv" in str(condition) and not any(value in str(condition) for value in ["Iv >= 0", "init_Is >= Iv", "balance_Ia == balance_Ia + Iv", "init_Ia + Iv", "If(Iv == 0, 1, 0) != 0"]):
             message_value_comparison.append(condition)
-    s = Solver()
-    s.set("timeout", global_params.TIMEOUT)
+    s = make_solver()
     if message_value_comparison:
         if not any([True for comparison in message_value_comparison if is_expr(comparison) and any([True for var in get_vars(comparison) if not "Iv" == str(var) and not "Ia_store_" in str(var)])]):
             for condition in origin["path_condition"]:
@@ -2799,11 +3660,20 @@ def detect_bugs():
         log.info("\t EVM code coverage: \t %s%%", round(evm_code_coverage, 1))
         results["evm_code_coverage"] = str(round(evm_code_coverage, 1))
 
-        dead_code = list(set(instructions.keys()) - set(visited_pcs))
+        pruned_code = get_pruned_code()
+        if global_params.PRUNE_IRRELEVANT_SINKS:
+            pruned_code_coverage = float(len(pruned_code)) / len(instructions.keys()) * 100
+            log.info("\t EVM code pruned: \t %s%% (%s paths)", round(pruned_code_coverage, 1), no_of_pruned_paths)
+            results["pruned_code_coverage"] = str(round(pruned_code_coverage, 1))
+            results["pruned_paths"] = str(no_of_pruned_paths)
+
+        dead_code = list(set(instructions.keys()) - set(visited_pcs) - pruned_code)
         for pc in dead_code:
             results["dead_code"].append(instructions[pc])
 
-        detect_honeypots()
+        # the heuristics ask the solver about the path conditions, replayed transactions have none
+        if not concrete_executor:
+            detect_honeypots()
 
         stop_time = time.time()
         results["execution_time"] = str(stop_time-start_time)
@@ -2811,6 +3681,77 @@ def detect_bugs():
 
         results["execution_paths"] = str(total_no_of_paths)
         results["timeout"] = g_timeout
+
+        keccak_cache = get_keccak_cache()
+        results["keccak_cache"] = keccak_cache.get_stats()
+        results["keccak_cache"]["hit_rate"] = str(round(keccak_cache.hit_rate(), 1))
+        log.info("\t Keccak cache hit rate:  %s%%", results["keccak_cache"]["hit_rate"])
+
+        expr_cache = get_expr_cache()
+        results["expr_cache"] = expr_cache.get_stats()
+        results["expr_cache"]["hit_rate"] = str(round(expr_cache.hit_rate(), 1))
+        log.info("\t Simplify cache hit rate: %s%%", results["expr_cache"]["hit_rate"])
+
+        results["solver_time"] = str(round(solver_time, 2))
+        log.info("\t Solver time: \t\t %s seconds", results["solver_time"])
+        if global_params.NARROW_WIDTHS:
+            results["narrowing"] = get_width_narrowing().get_stats()
+            log.info("\t Narrowed queries: \t %s of %s", results["narrowing"]["narrowed_queries"], results["narrowing"]["queries"])
+        if global_params.PORTFOLIO:
+            results["portfolio"] = portfolio.get_stats()
+            log.info("\t Raced queries: \t %s (%s unknown)", results["portfolio"]["races"], results["portfolio"]["unknown"])
+            for name, wins in sorted(results["portfolio"]["wins"].items(), key=lambda item: -item[1]):
+                log.info("\t   %s: \t %s wins", name, wins)
+        if concrete_executor:
+            results["concrete_execution"] = concrete_executor.get_stats()
+            log.info("\t Replayed transactions: \t %s in %s seconds", results["concrete_execution"]["transactions"], results["concrete_execution"]["time"])
+        if prepass:
+            results["prepass"] = prepass.get_report(len(instructions))
+            log.info("\t Pre-pass coverage: \t %s%%", results["prepass"]["coverage"])
+            log.info("\t Witnessed branches: \t %s of %s", results["prepass"]["witnessed_branches"], results["prepass"]["witness_lookups"])
+        if global_params.ABSTRACT_DOMAIN:
+            results["abstract_domain"] = abstract_domain.get_stats()
+            results["abstract_domain"]["decided_ratio"] = str(round(abstract_domain.decided_ratio(), 1))
+            log.info("\t Branches decided without the solver: %s%%", results["abstract_domain"]["decided_ratio"])
+        if global_params.CONCRETIZATION_SIZE:
+            results["concretizations"] = concretizations
+            log.info("\t Concretized variables:  %s", len(concretizations))
+        if global_params.UNSAT_CORES:
+            results["conflict_sets"] = conflict_sets.get_stats()
+            log.info("\t Pruned by conflict sets: %s of %s branches (%s learned)", results["conflict_sets"]["pruned"], results["conflict_sets"]["lookups"], results["conflict_sets"]["learned"])
+        if global_params.QUERY_CACHE_FILE:
+            query_cache = get_query_cache()
+            query_cache.flush()
+            results["query_cache"] = query_cache.get_stats()
+            results["query_cache"]["hit_rate"] = str(round(query_cache.hit_rate(), 1))
+            log.info("\t Query cache hit rate:   %s%%", results["query_cache"]["hit_rate"])
+        if global_params.ADAPTIVE_TIMEOUTS:
+            results["solver_sites"] = get_timeout_policy().get_report()
+            for site, report in sorted(results["solver_sites"].items(), key=lambda item: -item[1]["time"]):
+                log.info("\t Queries of %s: \t %s (%s unknown, %s s)", site, report["queries"], report["unknown"], report["time"])
+
+        results["opcode_stats"] = get_opcode_report()
+        concrete = sum(stats[0] for stats in opcode_stats.values())
+        executed = sum(stats[0] + stats[1] for stats in opcode_stats.values())
+        log.info("\t Concrete instructions:  %s%%", round(float(concrete) / executed * 100, 1) if executed else 0.0)
+        if global_params.DEBUG_MODE:
+            for opcode in sorted(results["opcode_stats"]):
+                print(opcode + ": " + results["opcode_stats"][opcode]["concrete_ratio"] + "% concrete")
+
+        if not coverage_over_time or coverage_over_time[-1][1] != len(visited_pcs):
+            coverage_over_time.append((stop_time - start_time, len(visited_pcs)))
+        results["coverage_over_time"] = [[round(seconds, 2), round(float(covered) / len(instructions.keys()) * 100, 1)] for (seconds, covered) in coverage_over_time]
+        if global_params.DEBUG_MODE:
+            for (seconds, coverage) in results["coverage_over_time"]:
+                print(str(seconds) + " s: " + str(coverage) + "%")
+
+        if budget_scheduler:
+            results["functions"] = budget_scheduler.report()
+            for method in sorted(results["functions"]):
+                function = results["functions"][method]
+                log.info("\t Function %s: \t %s instructions, %s paths, %s of %s seconds%s", method,
+                         function["covered_instructions"], function["paths"], function["time"], function["time_budget"],
+                         " (budget exhausted)" if function["exhausted"] else "")
     else:
         log.info("\t EVM code coverage: \t 0.0")
         log.info("\t Money flow: \t False")
@@ -2882,6 +3823,7 @@ def handler(signum, frame):
     raise Exception("timeout")
 
 def main(contract, contract_sol, _source_map = None):
+    global solver_service
     global c_name
     global c_name_sol
     global source_map
@@ -2893,6 +3835,10 @@ def main(contract, contract_sol, _source_map = None):
 
     initGlobalVars()
     set_cur_file(c_name[4:] if len(c_name) > 5 else c_name)
+    if global_params.CAPTURE_QUERIES_DIR:
+        if not os.path.isdir(global_params.CAPTURE_QUERIES_DIR):
+            os.makedirs(global_params.CAPTURE_QUERIES_DIR)
+        query_capture.contract = c_name
     start_time = time.time()
     if hasattr(signal, 'SIGALRM'):
         signal.signal(signal.SIGALRM, handler)
@@ -2915,9 +3861,22 @@ def main(contract, contract_sol, _source_map = None):
     if callable(getattr(signal, "alarm", None)):
         signal.alarm(0)
 
+    if fork_server:
+        fork_server.join(global_params.GLOBAL_TIMEOUT - (time.time() - start_time))
+        for records in fork_server.collect():
+            merge_worker_records(records)
+        if global_params.DEBUG_MODE:
+            print("Merged the records of " + str(fork_server.forked) + " worker processes")
+
     log.info("\t============ Results ===========")
 
     detect_bugs()
+
+    # the heuristics of detect_bugs check their queries on the solver threads too
+    if solver_service:
+        solver_service.shutdown()
+        solver_service = None
+
     closing_message()
 
 if __name__ == '__main__':
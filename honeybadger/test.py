@@ -269,6 +269,31 @@ if __name__ == '__main__':
     print("-------------------------------------------------------")
 
 
+    print("Testing 'DividendDistributor.bin' with symbolic arrays...")
+    p = subprocess.Popen(shlex.split("python honeybadger.py -s ../honeypots/DividendDistributor.bin -b -sa -j -glt "+str(global_timeout)+" -ll "+str(loop_limit)), stdout=subprocess.PIPE, stderr=FNULL)
+    if "======= error =======" in p.communicate()[0]:
+        print("\033[91m!!! FAILED !!!\033[0m")
+    else:
+        with open('results/DividendDistributor.json', 'r') as f:
+            results = json.load(f)
+        print("Code coverage: "+results["evm_code_coverage"])
+        print("Execution time: "+results["execution_time"])
+        if (float(results["evm_code_coverage"]) >= min_code_coverage
+        and results["money_flow"]
+        and not results["balance_disorder"]
+        and not results["hidden_transfer"]
+        and not results["inheritance_disorder"]
+        and not results["uninitialised_struct"]
+        and not results["type_deduction_overflow"]
+        and results["skip_empty_string_literal"]
+        and not results["hidden_state_update"]
+        and not results["straw_man_contract"]):
+            print("\033[92mPASSED\033[0m")
+        else:
+            print("\033[91m!!! FAILED !!!\033[0m")
+    print("-------------------------------------------------------")
+
+
     print("Testing 'For_Test.sol'...")
     p = subprocess.Popen(shlex.split("python honeybadger.py -s ../honeypots/For_Test.sol -j -glt "+str(global_timeout)+" -ll "+str(loop_limit)), stdout=subprocess.PIPE, stderr=FNULL)
     if "======= error =======" in p.communicate()[0]:
@@ -0,0 +1,182 @@
+#!/usr/bin/env python2
+
+# Unit tests of the transfer functions of the abstract domain and of the branch
+# decisions it takes from the facts of a path condition.
+#
+#   python test_evm/abstract_domain_test.py
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from z3 import *
+
+from abstract_domain import *
+
+def bounds(value):
+    return (value.lo, value.hi)
+
+class AbstractValueTest(unittest.TestCase):
+    def test_known_bits_bound_the_interval(self):
+        value = AbstractValue(8, 0, 255, zeros=0xf0, ones=0x01)
+        self.assertEqual(bounds(value), (1, 15))
+
+    def test_interval_fixes_common_leading_bits(self):
+        value = AbstractValue(8, 0x40, 0x4f)
+        self.assertEqual(value.ones, 0x40)
+        self.assertEqual(value.zeros, 0xb0)
+
+    def test_meet_of_disjoint_values_is_empty(self):
+        self.assertTrue(AbstractValue(8, 0, 10).meet(AbstractValue(8, 20, 30)).is_empty())
+        self.assertTrue(constant(8, 1).meet(constant(8, 2)).is_empty())
+
+    def test_join(self):
+        value = constant(8, 4).join(constant(8, 6))
+        self.assertEqual(bounds(value), (4, 6))
+        self.assertEqual(value.ones, 4)
+
+    def test_is_negative(self):
+        self.assertTrue(is_negative(constant(8, 0x80)))
+        self.assertFalse(is_negative(AbstractValue(8, 0, 0x7f)))
+        self.assertEqual(is_negative(AbstractValue(8, 0x70, 0x90)), None)
+
+class TransferFunctionTest(unittest.TestCase):
+    def test_add(self):
+        self.assertEqual(bounds(bv_add(AbstractValue(8, 1, 10), AbstractValue(8, 2, 20))), (3, 30))
+        self.assertEqual(bounds(bv_add(AbstractValue(8, 1, 200), AbstractValue(8, 2, 100))), (0, 255))
+
+    def test_sub(self):
+        self.assertEqual(bounds(bv_sub(AbstractValue(8, 50, 60), AbstractValue(8, 10, 20))), (30, 50))
+        self.assertEqual(bounds(bv_sub(AbstractValue(8, 0, 60), AbstractValue(8, 10, 20))), (0, 255))
+
+    def test_mul(self):
+        self.assertEqual(bounds(bv_mul(AbstractValue(8, 2, 3), AbstractValue(8, 4, 5))), (8, 15))
+        self.assertEqual(bounds(bv_mul(AbstractValue(8, 2, 30), AbstractValue(8, 4, 50))), (0, 255))
+
+    def test_udiv(self):
+        self.assertEqual(bounds(bv_udiv(AbstractValue(8, 10, 100), AbstractValue(8, 2, 5))), (2, 50))
+        self.assertEqual(bounds(bv_udiv(AbstractValue(8, 10, 100), AbstractValue(8, 0, 5))), (0, 255))
+
+    def test_urem(self):
+        self.assertEqual(bounds(bv_urem(AbstractValue(8, 0, 255), constant(8, 10))), (0, 9))
+        self.assertEqual(bounds(bv_urem(AbstractValue(8, 0, 5), constant(8, 10))), (0, 5))
+
+    def test_and(self):
+        value = bv_and(top(8), constant(8, 0x0f))
+        self.assertEqual(bounds(value), (0, 15))
+        self.assertEqual(value.zeros, 0xf0)
+
+    def test_or(self):
+        value = bv_or(top(8), constant(8, 0x80))
+        self.assertEqual(bounds(value), (0x80, 0xff))
+        self.assertEqual(value.ones, 0x80)
+
+    def test_xor(self):
+        value = bv_xor(constant(8, 0x0f), constant(8, 0x3c))
+        self.assertEqual(bounds(value), (0x33, 0x33))
+        self.assertEqual(bv_xor(top(8), constant(8, 1)).ones, 0)
+
+    def test_not(self):
+        value = bv_not(AbstractValue(8, 0, 0x0f))
+        self.assertEqual(bounds(value), (0xf0, 0xff))
+
+    def test_concat(self):
+        value = bv_concat(constant(8, 1), AbstractValue(8, 0, 255))
+        self.assertEqual(bounds(value), (0x100, 0x1ff))
+        self.assertEqual(value.width, 16)
+
+    def test_shifts(self):
+        self.assertEqual(bounds(bv_shl(AbstractValue(8, 1, 3), constant(8, 2))), (4, 12))
+        self.assertEqual(bounds(bv_shl(AbstractValue(8, 1, 128), constant(8, 2))), (0, 255))
+        self.assertEqual(bounds(bv_lshr(AbstractValue(8, 16, 64), constant(8, 4))), (1, 4))
+        self.assertEqual(bounds(bv_lshr(AbstractValue(8, 16, 64), top(8))), (0, 255))
+
+    def test_shifts_by_the_width_or_more(self):
+        self.assertEqual(bounds(bv_shl(AbstractValue(256, 1, 3), constant(256, 256))), (0, 0))
+        self.assertEqual(bounds(bv_shl(top(256), constant(256, 2 ** 64))), (0, 0))
+        self.assertEqual(bounds(bv_lshr(top(256), constant(256, 2 ** 64))), (0, 0))
+        self.assertEqual(bounds(bv_shl(top(8), AbstractValue(8, 8, 255))), (0, 0))
+
+    def test_extract(self):
+        self.assertEqual(bounds(extract(AbstractValue(16, 0, 100), 7, 0)), (0, 100))
+        value = extract(constant(16, 0xab00), 15, 8)
+        self.assertEqual(bounds(value), (0xab, 0xab))
+
+    def test_compare_equal(self):
+        self.assertTrue(compare_equal(constant(8, 3), constant(8, 3)))
+        self.assertFalse(compare_equal(AbstractValue(8, 0, 10), AbstractValue(8, 11, 20)))
+        self.assertFalse(compare_equal(bv_or(top(8), constant(8, 1)), bv_and(top(8), constant(8, 0xfe))))
+        self.assertEqual(compare_equal(AbstractValue(8, 0, 10), AbstractValue(8, 5, 20)), None)
+
+class DecideBranchTest(unittest.TestCase):
+    def setUp(self):
+        self.domain = AbstractDomain()
+        self.x = BitVec("x", 256)
+        self.y = BitVec("y", 256)
+
+    def test_constant_conditions(self):
+        self.assertTrue(self.domain.decide_branch([], BoolVal(True)))
+        self.assertFalse(self.domain.decide_branch([], BoolVal(False)))
+
+    def test_unknown_without_facts(self):
+        self.assertEqual(self.domain.decide_branch([], ULT(self.x, 10)), None)
+
+    def test_facts_of_comparisons(self):
+        path_condition = [ULT(self.x, 10)]
+        self.assertTrue(self.domain.decide_branch(path_condition, ULT(self.x, 20)))
+        self.assertFalse(self.domain.decide_branch(path_condition, UGT(self.x, 10)))
+        self.assertEqual(self.domain.decide_branch(path_condition, ULT(self.x, 5)), None)
+        # constants on the left are swapped
+        self.assertTrue(self.domain.decide_branch([UGT(10, self.x)], ULT(self.x, 10)))
+
+    def test_facts_of_negated_conditions(self):
+        path_condition = [Not(UGE(self.x, 10))]
+        self.assertTrue(self.domain.decide_branch(path_condition, self.x != 10))
+        self.assertTrue(self.domain.decide_branch([self.x != 0], self.x != 0))
+
+    def test_facts_of_equalities(self):
+        path_condition = [self.x == 5]
+        self.assertTrue(self.domain.decide_branch(path_condition, self.x + 1 == 6))
+        self.assertFalse(self.domain.decide_branch(path_condition, ULT(self.x * 2, 10)))
+
+    def test_facts_of_comparison_flags(self):
+        # JUMPI on ISZERO(LT(x, 10)) compares If(ULT(x, 10), 1, 0) with 0
+        flag = If(ULT(self.x, 10), BitVecVal(1, 256), BitVecVal(0, 256))
+        self.assertTrue(self.domain.decide_branch([flag != 0], ULT(self.x, 100)))
+        self.assertTrue(self.domain.decide_branch([flag == 0], UGE(self.x, 10)))
+
+    def test_facts_of_conjunctions(self):
+        path_condition = [And(UGE(self.x, 5), ULE(self.x, 7))]
+        self.assertTrue(self.domain.decide_branch(path_condition, And(ULT(self.x, 8), self.x != 4)))
+        self.assertFalse(self.domain.decide_branch(path_condition, Or(self.x == 1, UGT(self.x, 7))))
+
+    def test_masks(self):
+        address = self.x & 0xffffffffffffffffffffffffffffffffffffffff
+        self.assertTrue(self.domain.decide_branch([], ULE(address, 2 ** 160 - 1)))
+        self.assertFalse(self.domain.decide_branch([], Extract(7, 0, self.x & 0xf0) == 1))
+
+    def test_large_shifts(self):
+        path_condition = [ULT(self.x, 10)]
+        self.assertTrue(self.domain.decide_branch(path_condition, ULT(self.x << 2 ** 64, 5)))
+        self.assertTrue(self.domain.decide_branch(path_condition, LShR(self.x, 256) == 0))
+
+    def test_signed_comparisons(self):
+        path_condition = [ULT(self.x, 10), ULT(self.y, 5)]
+        self.assertTrue(self.domain.decide_branch(path_condition, self.y < self.x + 5))
+        self.assertEqual(self.domain.decide_branch([], self.x < 0), None)
+
+    def test_unsatisfiable_path_condition_is_inconclusive(self):
+        # the solver decides the branches of a path that is infeasible
+        self.assertEqual(self.domain.decide_branch([ULT(self.x, 10), UGT(self.x, 20)], self.x == 15), None)
+        self.assertEqual(self.domain.decide_branch([self.x == 1, self.x == 2], self.x == 1), None)
+
+    def test_stats(self):
+        self.domain.decide_branch([], BoolVal(True))
+        self.domain.decide_branch([], ULT(self.x, 10))
+        self.assertEqual(self.domain.get_stats(), {"branches": 2, "decided": 1})
+        self.assertEqual(self.domain.decided_ratio(), 50.0)
+
+if __name__ == '__main__':
+    unittest.main()
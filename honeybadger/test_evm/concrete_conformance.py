@@ -0,0 +1,64 @@
+#!/usr/bin/env python2
+
+# Runs the VM tests of test_data with the concrete execution mode and compares the
+# storage, the remaining gas and the output with the expected post state. A test
+# without a post state expects an exceptional halt.
+#
+#   python test_evm/concrete_conformance.py [test_data/vmArithmeticTest.json ...]
+
+import os
+import sys
+import glob
+import json
+import binascii
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from concrete_exec import ConcreteExecutor, ExecutionError, disassemble, parse_state, SUCCESS_OPCODES
+from global_test_params import PASS, FAIL, EXCEPTION, INCORRECT_GAS
+
+TEST_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_data")
+
+def run_test(data):
+    code = data["exec"]["code"][2:]
+    executor = ConcreteExecutor(disassemble(code), binascii.unhexlify(code))
+    result = executor.execute(parse_state(data))
+    if "post" not in data:
+        return PASS if result["status"] not in SUCCESS_OPCODES else FAIL
+    if result["status"] not in SUCCESS_OPCODES:
+        return EXCEPTION
+    if data["exec"]["address"] in data["post"]:
+        post = data["post"][data["exec"]["address"]]
+        storage = dict((int(key, 16), int(value, 16)) for key, value in post["storage"].items() if int(value, 16))
+        if result["storage"] != storage:
+            return FAIL
+    elif result["status"] != "SUICIDE":
+        # only a contract that destructs itself is missing from the post state
+        return FAIL
+    if result["output"] != data["out"]:
+        return FAIL
+    if result["gas"] != int(data["gas"], 16):
+        return INCORRECT_GAS
+    return PASS
+
+if __name__ == '__main__':
+    files = sys.argv[1:] or sorted(glob.glob(os.path.join(TEST_DATA, "*.json")))
+    failures = []
+    total = 0
+    for file_name in files:
+        with open(file_name) as f:
+            tests = json.load(f)
+        for name in sorted(tests):
+            total += 1
+            try:
+                status = run_test(tests[name])
+            except (ExecutionError, ValueError, KeyError) as e:
+                print(name + ": " + str(e))
+                status = EXCEPTION
+            if status != PASS:
+                failures.append((name, status))
+    for name, status in failures:
+        print("FAILED " + name + " (" + {FAIL: "wrong result", EXCEPTION: "exception", INCORRECT_GAS: "incorrect gas"}[status] + ")")
+    print(str(total - len(failures)) + " of " + str(total) + " tests passed")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python2
+
+# Unit tests of the memory model: MSTORE, MSTORE8 and MLOAD at aligned and unaligned
+# addresses, with and without the z3 array backend.
+#
+#   python test_evm/memory_test.py
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from z3 import *
+
+from memory import Memory
+
+def word(*parts):
+    value = 0
+    for part in parts:
+        value = (value << 8) | part
+    return value
+
+def proved(expression):
+    solver = Solver()
+    solver.add(Not(expression))
+    return solver.check() == unsat
+
+class MemoryTest(unittest.TestCase):
+    def setUp(self):
+        self.mem = Memory()
+        self.v = BitVec("v", 256)
+
+    def test_aligned_word(self):
+        self.mem.store_word(64, 5)
+        self.assertEqual(self.mem.load_word(64), 5)
+        self.assertEqual(self.mem[64], 5)
+        self.assertEqual(self.mem.load_word(96), None)
+
+    def test_unaligned_load_across_two_words(self):
+        self.mem.store_word(0, word(*range(1, 33)))
+        self.mem.store_word(32, word(*range(33, 65)))
+        self.assertEqual(self.mem.load_word(16), word(*range(17, 49)))
+        self.assertEqual(self.mem.load_word(1), word(*range(2, 34)))
+        # the last byte is not known
+        self.assertEqual(self.mem.load_word(40), None)
+
+    def test_unaligned_store_patches_overlapping_words(self):
+        self.mem.store_word(0, 0)
+        self.mem.store_word(32, 0)
+        self.mem.store_word(10, (1 << 256) - 1)
+        self.assertEqual(self.mem.load_word(0), (1 << (8 * 22)) - 1)
+        self.assertEqual(self.mem.load_word(32), ((1 << 80) - 1) << (8 * 22))
+        self.assertEqual(self.mem.load_word(10), (1 << 256) - 1)
+        self.assertEqual(self.mem.load_word(20), ((1 << 176) - 1) << 80)
+
+    def test_overwritten_word_at_same_address(self):
+        self.mem.store_word(0, 1)
+        self.mem.store_word(0, 2)
+        self.assertEqual(self.mem.load_word(0), 2)
+        self.assertEqual(len(self.mem), 1)
+
+    def test_symbolic_value_leaves_overlapping_words(self):
+        self.mem.store_word(0, 0)
+        self.mem.store_word(16, self.v)
+        self.assertEqual(self.mem.load_word(0), 0)
+        self.assertEqual(self.mem.load_word(8), None)
+        self.assertTrue(proved(self.mem.load_word(16) == self.v))
+
+    def test_selector_survives_arguments(self):
+        # the call data of a call: the selector, then the arguments at offset + 4, as H6 reads it
+        selector = 0xa9059cbb
+        self.mem.store_word(128, selector << 224)
+        self.mem.store_word(132, self.v)
+        self.mem.store_word(164, BitVec("w", 256))
+        self.assertTrue(128 in self.mem)
+        function_signature = self.mem[128]/26959946667150639794667015087019630673637144422540572481103610249216L
+        self.assertTrue(isinstance(function_signature, (int, long)))
+        self.assertEqual(function_signature, selector)
+
+    def test_bytes(self):
+        for i in range(32):
+            self.mem.store_byte(100 + i, i + 1)
+        self.assertEqual(self.mem.load_word(100), word(*range(1, 33)))
+        self.assertEqual(self.mem.load_word(101), None)
+        # a word stored over the bytes hides them
+        self.mem.store_word(100, 7)
+        self.assertEqual(self.mem.load_word(100), 7)
+        self.mem.store_byte(132, 9)
+        self.assertEqual(self.mem.load_word(101), (7 << 8) | 9)
+
+    def test_length_counts_bytes(self):
+        self.mem.store_word(0, 1)
+        self.mem.store_byte(0, 2)
+        self.mem.store_byte(40, 3)
+        self.mem.store_byte(41, 4)
+        self.assertEqual(len(self.mem), 3)
+        # the word hides the bytes below it
+        self.mem.store_word(40, 5)
+        self.assertEqual(len(self.mem), 2)
+        self.mem.store_byte(100, 6)
+        self.mem[100] = 7
+        self.assertEqual(len(self.mem), 3)
+        self.assertEqual(len(self.mem.copy()), 3)
+
+    def test_byte_patches_overlapping_words(self):
+        self.mem.store_word(0, 0)
+        self.mem.store_word(32, 0)
+        self.mem.store_byte(31, 0xaa)
+        self.assertEqual(self.mem.load_word(0), 0xaa)
+        self.assertEqual(self.mem.load_word(31), 0xaa << 248)
+        # a symbolic byte is only kept in the byte layer
+        self.mem.store_byte(32, self.v)
+        self.assertEqual(self.mem.load_word(32), 0)
+        self.assertTrue(self.mem.bytes.get(32) is self.v)
+
+    def test_symbolic_offsets(self):
+        p = BitVec("p", 256)
+        self.mem.store_word(p + 32, self.v)
+        self.assertTrue(proved(self.mem.load_word(p + 32) == self.v))
+        self.assertEqual(self.mem.load_word(p + 64), None)
+        self.assertFalse(self.mem.may_alias())
+
+    def test_copy_on_write(self):
+        self.mem.store_word(0, 1)
+        self.mem.store_word(2048, 2)
+        self.mem.store_byte(4096, 3)
+        copy = self.mem.copy()
+        copy.store_word(0, 10)
+        copy.store_word(16, 11)
+        copy.store_byte(4096, 12)
+        self.mem.store_word(2048, 20)
+        self.assertEqual(self.mem.load_word(0), 1)
+        self.assertEqual(self.mem.load_word(16), None)
+        self.assertEqual(self.mem.bytes.get(4096), 3)
+        self.assertEqual(self.mem.load_word(2048), 20)
+        self.assertEqual(copy.load_word(0), 0)  # the high half of 11 overwrote the low half of 10
+        self.assertEqual(copy.load_word(16), 11)
+        self.assertEqual(copy.bytes.get(4096), 12)
+        self.assertEqual(copy.load_word(2048), 2)
+        # a copy of a copy shares the pages until either writes
+        second = copy.copy()
+        second.store_word(0, 30)
+        self.assertEqual(copy.load_word(0), 0)
+        self.assertEqual(second.load_word(0), 30)
+
+    def test_clear(self):
+        self.mem.store_word(0, 1)
+        self.mem.store_byte(40, 1)
+        copy = self.mem.copy()
+        self.mem.clear()
+        self.assertEqual(len(self.mem), 0)
+        self.assertEqual(self.mem.load_word(0), None)
+        self.assertEqual(copy.load_word(0), 1)
+
+class ArrayMemoryTest(unittest.TestCase):
+    def setUp(self):
+        self.mem = Memory(Array("mem", BitVecSort(256), BitVecSort(256)))
+        self.p = BitVec("p", 256)
+        self.v = BitVec("v", 256)
+
+    def select(self, address):
+        return Select(self.mem.array, address)
+
+    def test_word_stores_are_applied_to_the_array(self):
+        self.mem.store_word(0, 7)
+        self.mem.store_word(self.p, self.v)
+        self.assertTrue(self.mem.may_alias())
+        self.assertTrue(proved(self.select(self.p) == self.v))
+        self.assertTrue(proved(Implies(self.p != 0, self.select(0) == 7)))
+
+    def test_symbolic_value_patches_overlapping_words(self):
+        self.mem.store_word(0, 0)
+        self.mem.store_word(16, self.v)
+        self.assertTrue(proved(self.mem.load_word(0) == LShR(self.v, 128)))
+        self.assertTrue(proved(self.select(0) == LShR(self.v, 128)))
+        self.assertTrue(proved(self.mem.load_word(16) == self.v))
+        # the word the heuristics look up is left as it was
+        self.assertEqual(self.mem[0], 0)
+
+    def test_selector_survives_arguments(self):
+        selector = 0x60468a18
+        self.mem.store_word(96, selector << 224)
+        self.mem.store_word(100, self.v)
+        function_signature = self.mem[96]/26959946667150639794667015087019630673637144422540572481103610249216L
+        self.assertEqual(function_signature, selector)
+        self.assertTrue(proved(Extract(255, 224, self.mem.load_word(96)) == selector))
+        self.assertTrue(proved(Extract(223, 0, self.mem.load_word(96)) == Extract(255, 32, self.v)))
+
+    def test_byte_at_symbolic_address_may_alias(self):
+        self.mem.store_word(0, 0)
+        self.assertFalse(self.mem.may_alias())
+        self.mem.store_byte(self.p, 0xab)
+        self.assertTrue(self.mem.may_alias())
+        self.assertTrue(proved(Extract(255, 248, self.select(self.p)) == 0xab))
+        # the other bytes of the word at the symbolic address are left as they were
+        self.assertTrue(proved(Implies(self.p == 0, self.select(0) == 0xab << 248)))
+
+    def test_byte_inside_concrete_word(self):
+        self.mem.store_word(0, 0)
+        self.mem.store_byte(5, 0xff)
+        expected = 0xff << (8 * 26)
+        self.assertEqual(self.mem.load_word(0), expected)
+        self.assertTrue(proved(self.select(0) == expected))
+
+    def test_byte_inside_symbolic_word(self):
+        self.mem.store_word(32, self.v)
+        self.mem.store_byte(33, 0x11)
+        self.assertTrue(proved(self.select(32) == self.mem.load_word(32)))
+        self.assertTrue(proved(Extract(247, 240, self.select(32)) == 0x11))
+        self.assertTrue(proved(Extract(255, 248, self.select(32)) == Extract(255, 248, self.v)))
+        self.assertTrue(proved(Extract(239, 0, self.select(32)) == Extract(239, 0, self.v)))
+
+    def test_symbolic_byte_inside_concrete_word(self):
+        self.mem.store_word(0, 0)
+        self.mem.store_byte(31, self.v)
+        self.assertTrue(proved(self.select(0) == ZeroExt(248, Extract(7, 0, self.v))))
+        self.assertTrue(proved(self.mem.load_word(0) == ZeroExt(248, Extract(7, 0, self.v))))
+        self.assertEqual(self.mem[0], 0)
+        # a concrete word stored over it is up to date again
+        self.mem.store_word(0, 5)
+        self.assertEqual(self.mem.load_word(0), 5)
+        self.mem.store_byte(31, 6)
+        self.assertEqual(self.mem.load_word(0), 6)
+
+    def test_byte_without_stored_word(self):
+        self.mem.store_byte(64, 0x22)
+        self.assertTrue(proved(Extract(255, 248, self.select(64)) == 0x22))
+
+    def test_concrete_load_after_symbolic_byte(self):
+        self.mem.store_word(0, 0)
+        self.mem.store_byte(self.p, 1)
+        # the array is read instead of the stale word
+        self.assertTrue(self.mem.may_alias())
+        self.assertFalse(proved(self.select(0) == 0))
+        self.assertTrue(proved(Implies(self.p == 0, self.select(0) == 1 << 248)))
+
+    def test_clear_havocs_the_array(self):
+        self.mem.store_byte(self.p, 1)
+        self.mem.clear()
+        self.assertFalse(self.mem.may_alias())
+        self.assertFalse(proved(Extract(255, 248, self.select(self.p)) == 1))
+
+if __name__ == '__main__':
+    unittest.main()
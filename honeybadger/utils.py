@@ -13,6 +13,7 @@ import copy
 
 from z3 import *
 from z3.z3util import get_vars
+from expr_cache import simplify_expr
 
 def ceil32(x):
     return x if x % 32 == 0 else x + 32 - (x % 32)
@@ -40,6 +41,18 @@ def to_symbolic(number):
         return BitVecVal(number, 256)
     return number
 
+# Canonical form of a 256-bit value: a Python int in [0, 2**256) when it is concrete, so
+# that concrete computations never reach z3, a simplified expression otherwise
+def normalize(value):
+    if isReal(value):
+        return value & (2**256 - 1)
+    if not is_expr(value):
+        return value
+    value = simplify_expr(value)
+    if is_bv_value(value):
+        return value.as_long()
+    return value
+
 def to_unsigned(number):
     if number < 0:
         return number + 2**256
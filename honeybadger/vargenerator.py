@@ -22,6 +22,9 @@ class Generator:
     def gen_mem_var(self, address):
         return "mem_[" + str(address) + "]"
 
+    def gen_mem_array(self):
+        return "mem"
+
     def gen_arbitrary_var(self):
         self.count += 1
         return "some_var_" + str(self.count)
@@ -37,6 +40,9 @@ class Generator:
     def gen_owner_store_var(self, position):
         return "Ia_store_" + str(position)
 
+    def gen_owner_store_array(self):
+        return "Ia_store"
+
     def gen_gas_var(self):
         self.count += 1
         return "gas_" + str(self.count)